@@ -0,0 +1,120 @@
+import logging
+from typing import Dict
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRouter
+from adapters.api.schemas import (
+    ECGRequestSchema,
+    ECGResponseSchema,
+    ECGInsightResponseSchema,
+)
+from adapters.api.encodings import (
+    BINARY_RESPONSES,
+    JSON,
+    binary_response,
+    json_response,
+    negotiate_media_type,
+)
+from adapters.api.ecg_router import queue_full_exception, signal_query
+from services.async_ecg_service import AsyncECGService
+from adapters.api.dependencies import (
+    get_async_ecg_service,
+    verify_user_async,
+)
+from adapters.database.models import User
+from adapters.tasks.tasks import BackgroundTaskQueueFull
+
+logger = logging.getLogger(__name__)
+
+# Async versions of the routes of ecg_router, enabled with DATABASE_ASYNC.
+# They are included first so they take precedence over the sync ones.
+router = APIRouter(
+    prefix="/ecg",
+    tags=["ecg"],
+)
+
+
+@router.get(
+    "/{ecg_id}",
+    response_model=ECGResponseSchema,
+    status_code=status.HTTP_200_OK,
+    responses=BINARY_RESPONSES,
+)
+async def get_ecg_async(
+    ecg_id: str,
+    request: Request,
+    query: Dict = Depends(signal_query),
+    current_user: User = Depends(verify_user_async),
+    ecg_service: AsyncECGService = Depends(get_async_ecg_service),
+):
+    """
+    Endpoint to retrieve an ECG by ID.
+    A subset of the leads and a window of samples can be requested, and
+    the signals downsampled to the min/max envelope of buckets of samples.
+    Signals are sent as JSON, compressed with zstd or gzip when accepted,
+    or in a binary format negotiated with the Accept header. The response
+    is serialized from the stored data without validating it again, the
+    response model only documents it.
+    """
+    media_type = negotiate_media_type(request.headers.get("accept"))
+
+    ecg = await ecg_service.get(ecg_id=ecg_id, **query)
+
+    if ecg is None or ecg.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="ECG not found"
+        )
+
+    # Serializing and compressing the signals is CPU-bound
+    if media_type != JSON:
+        return await run_in_threadpool(binary_response, ecg, media_type)
+
+    return await run_in_threadpool(
+        json_response, ecg, request.headers.get("accept-encoding")
+    )
+
+
+@router.get(
+    "/{ecg_id}/insights",
+    response_model=ECGInsightResponseSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def get_ecg_insights_async(
+    ecg_id: str,
+    current_user: User = Depends(verify_user_async),
+    ecg_service: AsyncECGService = Depends(get_async_ecg_service),
+):
+    """
+    Endpoint to retrieve the insights of a particular ECG.
+    """
+
+    insights = await ecg_service.get_insights(ecg_id=ecg_id)
+
+    if insights is None or insights["user_id"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="ECG not found"
+        )
+
+    return {"leads": insights["leads"]}
+
+
+@router.post("", status_code=status.HTTP_201_CREATED)
+async def upload_ecg_async(
+    ecg_data: ECGRequestSchema,
+    current_user: User = Depends(verify_user_async),
+    ecg_service: AsyncECGService = Depends(get_async_ecg_service),
+):
+    """
+    Endpoint to upload ECG data for processing and storage.
+    """
+    try:
+        ecg_id = await ecg_service.process(
+            leads=[lead.model_dump() for lead in ecg_data.leads],
+            user_id=current_user.id,
+        )
+        return {"ecg_id": ecg_id}
+    except BackgroundTaskQueueFull as e:
+        raise queue_full_exception() from e
+    except Exception as e:
+        logger.exception("Failed to upload ECG data")
+        raise HTTPException(status_code=500, detail="Failed to upload ECG data") from e
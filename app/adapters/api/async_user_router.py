@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.security import HTTPBasicCredentials
+from adapters.api.schemas import PasswordUpdate, RoleUpdate, UserCreate
+from adapters.api.dependencies import (
+    get_async_auth_service,
+    verify_admin_async,
+    verify_user_async,
+)
+from adapters.database.models import User
+from services.async_auth_service import AsyncAuthService
+
+# Async versions of the routes of user_router, enabled with DATABASE_ASYNC
+router = APIRouter(prefix="/users", tags=["users"])
+
+
+@router.post("", status_code=status.HTTP_201_CREATED)
+async def create_user_async(
+    user_data: UserCreate,
+    admin: User = Depends(verify_admin_async),
+    auth_service: AsyncAuthService = Depends(get_async_auth_service),
+):
+    """
+    Only admins can create new users
+    """
+
+    user = await auth_service.create_user(user_data.username, user_data.password)
+    return {
+        "message": f"User {user.username} with role {user.role} created successfully"
+    }
+
+
+@router.put("/me/password", status_code=status.HTTP_200_OK)
+async def update_password_async(
+    password_data: PasswordUpdate,
+    user: User = Depends(verify_user_async),
+    auth_service: AsyncAuthService = Depends(get_async_auth_service),
+):
+    """
+    Change the password of the current user, who must confirm the current
+    one. Refresh tokens issued before the change are refused.
+    """
+
+    await auth_service.authenticate_user(
+        HTTPBasicCredentials(
+            username=user.username, password=password_data.current_password
+        )
+    )
+    await auth_service.update_password(user.username, password_data.new_password)
+    return {"message": f"Password of user {user.username} updated successfully"}
+
+
+@router.put("/{username}/role", status_code=status.HTTP_200_OK)
+async def update_role_async(
+    username: str,
+    role_data: RoleUpdate,
+    admin: User = Depends(verify_admin_async),
+    auth_service: AsyncAuthService = Depends(get_async_auth_service),
+):
+    """
+    Only admins can change the role of a user
+    """
+
+    user = await auth_service.update_role(username, role_data.role)
+    return {"message": f"Role of user {user.username} updated to {user.role}"}
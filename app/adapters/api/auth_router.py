@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPBasicCredentials
+from adapters.api.schemas import LoginSchema, RefreshTokenSchema, TokenResponseSchema
+from adapters.api.dependencies import get_auth_service, get_token_service
+from services.auth_service import AuthService
+from services.token_service import REFRESH_TOKEN, TokenService
+
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+
+@router.post(
+    "/login", response_model=TokenResponseSchema, status_code=status.HTTP_200_OK
+)
+def login(
+    login_data: LoginSchema,
+    auth_service: AuthService = Depends(get_auth_service),
+    token_service: TokenService = Depends(get_token_service),
+):
+    """
+    Exchange a username and password for an access and a refresh token
+    """
+
+    user = auth_service.authenticate_user(
+        HTTPBasicCredentials(username=login_data.username, password=login_data.password)
+    )
+    return token_service.create_token_pair(user)
+
+
+@router.post(
+    "/refresh", response_model=TokenResponseSchema, status_code=status.HTTP_200_OK
+)
+def refresh(
+    refresh_data: RefreshTokenSchema,
+    auth_service: AuthService = Depends(get_auth_service),
+    token_service: TokenService = Depends(get_token_service),
+):
+    """
+    Exchange a refresh token for new tokens. The user is read again,
+    so role changes are applied to the new tokens, and the tokens issued
+    before a password change are refused.
+    """
+
+    claims = token_service.verify_token(refresh_data.refresh_token, REFRESH_TOKEN)
+    user = auth_service.get_user(claims["sub"])
+    if user is None or claims.get("ver", 0) != (user.token_version or 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return token_service.create_token_pair(user)
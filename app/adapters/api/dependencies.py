@@ -1,33 +1,133 @@
-from fastapi import Depends, BackgroundTasks, HTTPException, status
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from functools import lru_cache
+from typing import Optional
+from fastapi import Depends, BackgroundTasks, HTTPException, Request, status
+from fastapi.security import (
+    HTTPAuthorizationCredentials,
+    HTTPBasic,
+    HTTPBasicCredentials,
+    HTTPBearer,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from adapters.database.repository import DatabaseECGRepository, DatabaseUserRepository
+from adapters.database.repository import (
+    DatabaseECGRepository,
+    DatabaseJobRepository,
+    DatabaseUserRepository,
+)
+from adapters.database.async_repository import (
+    AsyncDatabaseECGRepository,
+    AsyncDatabaseUserRepository,
+)
 from services.ecg_service import ECGService
-from services.auth_service import AuthService
+from services.async_ecg_service import AsyncECGService
+from services.auth_service import AuthService, credential_cache
+from services.async_auth_service import AsyncAuthService
+from services.token_service import TokenService
 from adapters.database.orm import get_db
-from adapters.database.models import UserRole
+from adapters.database.async_orm import get_async_db
+from adapters.database.cache import CachedECGRepository, ECGCache
+from adapters.database.models import User, UserRole
+from adapters.tasks.jobs import compute_insights_job, init_worker
+from adapters.tasks.tasks import (
+    FastAPIBackgroundTask,
+    ProcessPoolBackgroundTask,
+    QueueBackgroundTask,
+)
+from core.config import config
+from core.profiling import current_profile
 
 
-security = HTTPBasic()
+# Both schemes are optional, requests must use one of them
+basic_security = HTTPBasic(auto_error=False)
+bearer_security = HTTPBearer(auto_error=False)
+
+# Decoded ECGs shared by every request of the process
+ecg_cache = ECGCache(
+    max_bytes=config.ECG_CACHE_MAX_BYTES, ttl_seconds=config.ECG_CACHE_TTL_SECONDS
+)
+
+
+@lru_cache
+def get_process_pool() -> ProcessPoolBackgroundTask:
+    return ProcessPoolBackgroundTask(
+        max_workers=config.BACKGROUND_WORKERS,
+        max_queue_size=config.BACKGROUND_QUEUE_SIZE,
+        initializer=init_worker,
+        initargs=(config.model_dump(),),
+    )
 
 
 def get_ecg_service(
     background_task: BackgroundTasks, db: Session = Depends(get_db)
 ) -> ECGService:
     ecg_repository = DatabaseECGRepository(db)
-    return ECGService(ecg_repository, background_task)
+    if config.ECG_CACHE_MAX_BYTES > 0:
+        ecg_repository = CachedECGRepository(ecg_repository, ecg_cache)
+
+    if config.BACKGROUND_TASK_BACKEND == "process":
+        return ECGService(
+            ecg_repository, get_process_pool(), insights_task=compute_insights_job
+        )
+
+    if config.BACKGROUND_TASK_BACKEND == "queue":
+        return ECGService(
+            ecg_repository, QueueBackgroundTask(DatabaseJobRepository(db))
+        )
+
+    return ECGService(ecg_repository, FastAPIBackgroundTask(background_task))
 
 
 def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
     user_repository = DatabaseUserRepository(db)
-    return AuthService(user_repository)
+    return AuthService(user_repository, credential_cache)
+
 
+# Former default of AUTH_SECRET_KEY, refused like a missing key
+PLACEHOLDER_SECRET_KEY = "change-me-in-production"
 
-def verify_admin(
+
+@lru_cache
+def get_token_service() -> TokenService:
+    """
+    Called when a worker starts, so that it fails without a secret key:
+    anyone knowing the key can sign tokens for any user and role
+    """
+    if config.AUTH_SECRET_KEY in (None, "", PLACEHOLDER_SECRET_KEY):
+        raise RuntimeError(
+            "AUTH_SECRET_KEY must be set to a random secret, e.g. the output of "
+            "python -c 'import secrets; print(secrets.token_urlsafe(32))'"
+        )
+    return TokenService(
+        secret_key=config.AUTH_SECRET_KEY,
+        access_ttl_seconds=config.ACCESS_TOKEN_TTL_SECONDS,
+        refresh_ttl_seconds=config.REFRESH_TOKEN_TTL_SECONDS,
+    )
+
+
+def verify_user(
     auth_service: AuthService = Depends(get_auth_service),
-    credentials: HTTPBasicCredentials = Depends(security),
+    token_service: TokenService = Depends(get_token_service),
+    basic_credentials: Optional[HTTPBasicCredentials] = Depends(basic_security),
+    bearer_credentials: Optional[HTTPAuthorizationCredentials] = Depends(
+        bearer_security
+    ),
 ):
-    user = auth_service.authenticate_user(credentials)
+    # Bearer tokens are verified from their claims, without querying the DB
+    if bearer_credentials is not None:
+        return token_service.authenticate_token(bearer_credentials.credentials)
+
+    if basic_credentials is not None:
+        return auth_service.authenticate_user(basic_credentials)
+
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Basic"},
+    )
+
+
+def verify_admin(user: User = Depends(verify_user)):
     if user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
@@ -35,8 +135,84 @@ def verify_admin(
     return user
 
 
-def verify_user(
+async def authorize_profiling(
+    request: Request,
     auth_service: AuthService = Depends(get_auth_service),
-    credentials: HTTPBasicCredentials = Depends(security),
+    token_service: TokenService = Depends(get_token_service),
 ):
-    return auth_service.authenticate_user(credentials)
+    """
+    Dependency of every route: requests asking to be profiled must be made
+    by an admin. Credentials are only read from such requests.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return
+
+    user = await run_in_threadpool(
+        verify_user,
+        auth_service,
+        token_service,
+        await basic_security(request),
+        await bearer_security(request),
+    )
+    verify_admin(user)
+    # The profiling lock is only taken for admins
+    profile.authorize()
+
+
+def get_async_ecg_service(
+    background_task: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    sync_db: Session = Depends(get_db),
+) -> AsyncECGService:
+    ecg_repository = AsyncDatabaseECGRepository(db)
+
+    if config.BACKGROUND_TASK_BACKEND == "process":
+        return AsyncECGService(
+            ecg_repository, get_process_pool(), insights_task=compute_insights_job
+        )
+
+    # The job queue is still written with a sync session, it only
+    # connects when a job is enqueued
+    if config.BACKGROUND_TASK_BACKEND == "queue":
+        return AsyncECGService(
+            ecg_repository, QueueBackgroundTask(DatabaseJobRepository(sync_db))
+        )
+
+    return AsyncECGService(ecg_repository, FastAPIBackgroundTask(background_task))
+
+
+def get_async_auth_service(
+    db: AsyncSession = Depends(get_async_db),
+) -> AsyncAuthService:
+    user_repository = AsyncDatabaseUserRepository(db)
+    return AsyncAuthService(user_repository, credential_cache)
+
+
+async def verify_user_async(
+    auth_service: AsyncAuthService = Depends(get_async_auth_service),
+    token_service: TokenService = Depends(get_token_service),
+    basic_credentials: Optional[HTTPBasicCredentials] = Depends(basic_security),
+    bearer_credentials: Optional[HTTPAuthorizationCredentials] = Depends(
+        bearer_security
+    ),
+):
+    if bearer_credentials is not None:
+        return token_service.authenticate_token(bearer_credentials.credentials)
+
+    if basic_credentials is not None:
+        return await auth_service.authenticate_user(basic_credentials)
+
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Basic"},
+    )
+
+
+async def verify_admin_async(user: User = Depends(verify_user_async)):
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+    return user
@@ -1,10 +1,31 @@
-from fastapi import Depends, HTTPException, status
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi import Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.routing import APIRouter
+from pydantic import ValidationError
 from adapters.api.schemas import (
     ECGRequestSchema,
     ECGResponseSchema,
-    LeadResponseSchema,
     ECGInsightResponseSchema,
+    LeadFrameSchema,
+    ECGBatchRequestSchema,
+    ECGBatchResponseSchema,
+    ECGListResponseSchema,
+)
+from adapters.api.encodings import (
+    BINARY_RESPONSES,
+    JSON,
+    binary_response,
+    json_response,
+    negotiate_media_type,
+)
+from adapters.api.streaming import (
+    BodyTooLarge,
+    FrameTooLarge,
+    iter_ndjson_frames,
+    limit_body,
 )
 from services.ecg_service import ECGService
 from adapters.api.dependencies import (
@@ -12,7 +33,10 @@ from adapters.api.dependencies import (
     verify_user,
 )
 from adapters.database.models import User
+from adapters.tasks.tasks import BackgroundTaskQueueFull
+from core.config import config
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/ecg",
@@ -20,38 +44,158 @@ router = APIRouter(
 )
 
 
+def queue_full_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many ECGs being processed, try again later",
+        headers={"Retry-After": "5"},
+    )
+
+
+def request_content_length(request: Request) -> Optional[int]:
+    """
+    Length of the body of a request, None when it is sent in chunks
+    :param request: Incoming request
+    :raises HTTPException: if the Content-Length header is not a length
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is None:
+        return None
+    try:
+        length = int(content_length)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Content-Length header",
+        )
+    return length
+
+
+def signal_query(
+    leads: Optional[List[str]] = Query(
+        None, description="Leads to return, repeated or comma-separated"
+    ),
+    start: int = Query(0, ge=0, description="First sample of the window"),
+    end: Optional[int] = Query(
+        None, ge=0, description="Sample after the last one of the window"
+    ),
+    decimate: Optional[int] = Query(
+        None, ge=1, description="Reduce every bucket of samples to its min and max"
+    ),
+    max_points: Optional[int] = Query(
+        None, ge=2, description="Maximum number of samples per lead"
+    ),
+) -> Dict:
+    if end is not None and end < start:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="end must not be lower than start",
+        )
+
+    if leads is not None:
+        leads = [name for value in leads for name in value.split(",") if name]
+    return {
+        "leads": leads,
+        "start": start,
+        "end": end,
+        "decimate": decimate,
+        "max_points": max_points,
+    }
+
+
 @router.get(
-    "/{ecg_id}", response_model=ECGResponseSchema, status_code=status.HTTP_200_OK
+    "",
+    response_model=ECGListResponseSchema,
+    response_model_exclude_unset=True,
+    status_code=status.HTTP_200_OK,
+)
+def list_ecgs(
+    limit: int = Query(
+        config.ECG_LIST_DEFAULT_LIMIT, ge=1, le=config.ECG_LIST_MAX_LIMIT
+    ),
+    cursor: Optional[str] = Query(
+        None, description="`next_cursor` of the previous page"
+    ),
+    date_from: Optional[datetime] = Query(
+        None, description="Only list ECGs recorded at or after this date"
+    ),
+    date_to: Optional[datetime] = Query(
+        None, description="Only list ECGs recorded before this date"
+    ),
+    include_insights: bool = Query(
+        False, description="Include the insights of the leads, never the signals"
+    ),
+    current_user: User = Depends(verify_user),
+    ecg_service: ECGService = Depends(get_ecg_service),
+):
+    """
+    Endpoint to list the ECGs of the current user, newest first.
+    Pages are requested with the cursor returned by the previous page,
+    every page costs the same however deep it is.
+    """
+    try:
+        page = ecg_service.list_for_user(
+            current_user.id,
+            limit,
+            cursor=cursor,
+            date_from=date_from,
+            date_to=date_to,
+            include_insights=include_insights,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        ) from e
+
+    ecgs = []
+    for ecg in page["ecgs"]:
+        summary = {"ecg_id": ecg.ecg_id, "date": ecg.date}
+        if include_insights:
+            summary["leads"] = [
+                {"name": lead.name, "zero_crossings": lead.zero_crossings}
+                for lead in ecg.leads
+            ]
+        ecgs.append(summary)
+    return {"ecgs": ecgs, "next_cursor": page["next_cursor"]}
+
+
+@router.get(
+    "/{ecg_id}",
+    response_model=ECGResponseSchema,
+    status_code=status.HTTP_200_OK,
+    responses=BINARY_RESPONSES,
 )
 def get_ecg(
     ecg_id: str,
+    request: Request,
+    query: Dict = Depends(signal_query),
     current_user: User = Depends(verify_user),
     ecg_service: ECGService = Depends(get_ecg_service),
 ):
     """
     Endpoint to retrieve an ECG by ID.
+    A subset of the leads and a window of samples can be requested, and
+    the signals downsampled to the min/max envelope of buckets of samples.
+    Signals are sent as JSON, compressed with zstd or gzip when accepted,
+    or in a binary format negotiated with the Accept header. The response
+    is serialized from the stored data without validating it again, the
+    response model only documents it.
     """
+    media_type = negotiate_media_type(request.headers.get("accept"))
 
-    ecg = ecg_service.get(ecg_id=ecg_id)
+    ecg = ecg_service.get(ecg_id=ecg_id, **query)
 
     if ecg is None or ecg.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="ECG not found"
         )
 
-    return {
-        "ecg_id": ecg.ecg_id,
-        "date": ecg.date,
-        "leads": [
-            LeadResponseSchema(
-                name=lead.name,
-                signal=lead.signal,
-                num_samples=lead.num_samples,
-                zero_crossings=lead.zero_crossings,
-            )
-            for lead in ecg.leads
-        ],
-    }
+    if media_type != JSON:
+        return binary_response(ecg, media_type)
+
+    return json_response(ecg, request.headers.get("accept-encoding"))
 
 
 @router.get(
@@ -68,19 +212,14 @@ def get_ecg_insights(
     Endpoint to retrieve the insights of a particular ECG.
     """
 
-    ecg = ecg_service.get(ecg_id=ecg_id)
+    insights = ecg_service.get_insights(ecg_id=ecg_id)
 
-    if ecg is None or ecg.user_id != current_user.id:
+    if insights is None or insights["user_id"] != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="ECG not found"
         )
 
-    return {
-        "leads": [
-            {"name": lead.name, "zero_crossings": lead.zero_crossings}
-            for lead in ecg.leads
-        ]
-    }
+    return {"leads": insights["leads"]}
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
@@ -98,6 +237,152 @@ def upload_ecg(
             user_id=current_user.id,
         )
         return {"ecg_id": ecg_id}
+    except BackgroundTaskQueueFull as e:
+        raise queue_full_exception() from e
+    except Exception as e:
+        logger.exception("Failed to upload ECG data")
+        raise HTTPException(status_code=500, detail="Failed to upload ECG data") from e
+
+
+@router.post(
+    "/batch",
+    response_model=ECGBatchResponseSchema,
+    status_code=status.HTTP_201_CREATED,
+)
+def upload_ecg_batch(
+    batch: ECGBatchRequestSchema,
+    current_user: User = Depends(verify_user),
+    ecg_service: ECGService = Depends(get_ecg_service),
+):
+    """
+    Endpoint to upload several ECGs at once. Every item has the same
+    format as the body of `POST /ecg`. Returns the ECG ID or the error of
+    every item, in order.
+    """
+    if len(batch.ecgs) > config.ECG_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batches must not exceed {config.ECG_BATCH_MAX_SIZE} ECGs",
+        )
+
+    results = [None] * len(batch.ecgs)
+    valid_indexes = []
+    valid_ecgs = []
+    for index, item in enumerate(batch.ecgs):
+        try:
+            ecg_data = ECGRequestSchema.model_validate(item)
+        except ValidationError as e:
+            results[index] = {"error": str(e)}
+            continue
+        valid_indexes.append(index)
+        valid_ecgs.append([lead.model_dump() for lead in ecg_data.leads])
+
+    try:
+        processed = ecg_service.process_many(ecgs=valid_ecgs, user_id=current_user.id)
+    except BackgroundTaskQueueFull as e:
+        raise queue_full_exception() from e
+    except Exception as e:
+        logger.exception("Failed to upload ECG data")
+        raise HTTPException(status_code=500, detail="Failed to upload ECG data") from e
+
+    for index, result in zip(valid_indexes, processed):
+        results[index] = result
+
+    return {"results": results}
+
+
+@router.post(
+    "/stream",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/x-ndjson": {"schema": LeadFrameSchema.model_json_schema()}
+            },
+            "required": True,
+        }
+    },
+)
+async def upload_ecg_stream(
+    request: Request,
+    current_user: User = Depends(verify_user),
+    ecg_service: ECGService = Depends(get_ecg_service),
+):
+    """
+    Endpoint to upload ECG data as a stream of newline-delimited JSON
+    lead frames. Each frame holds a chunk of the signal of a lead, and
+    consecutive chunks of the same lead are concatenated. Chunks are
+    encoded as they arrive, so the whole recording is never held in
+    memory as Python objects. Bodies are limited to STREAM_MAX_BODY_BYTES.
+    """
+    content_length = request_content_length(request)
+    if content_length is not None and content_length > config.STREAM_MAX_BODY_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Body must not exceed {config.STREAM_MAX_BODY_BYTES} bytes",
+        )
+
+    encoders = {}
+    num_samples = {}
+
+    # Validating and encoding the samples is CPU-bound, it runs in a thread
+    # so the event loop keeps serving other requests
+    def write_frame(frame: bytes):
+        lead = LeadFrameSchema.model_validate_json(frame)
+        if lead.name not in encoders:
+            encoders[lead.name] = ecg_service.signal_encoder()
+        encoders[lead.name].write(lead.signal)
+        if lead.num_samples is not None:
+            num_samples[lead.name] = lead.num_samples
+
+    try:
+        async for frame in iter_ndjson_frames(
+            limit_body(request.stream(), config.STREAM_MAX_BODY_BYTES),
+            config.STREAM_MAX_FRAME_BYTES,
+        ):
+            await run_in_threadpool(write_frame, frame)
+    except (FrameTooLarge, BodyTooLarge) as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        ) from e
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid lead frame",
+        ) from e
+
+    if not encoders:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="No lead frames received",
+        )
+
+    for name, count in num_samples.items():
+        if encoders[name].num_samples != count:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"num_samples of lead {name} does not match its signal",
+            )
+
+    # Flushing the compressors is CPU-bound too
+    def store() -> str:
+        return ecg_service.process_encoded(
+            leads=[
+                {
+                    "name": name,
+                    "signal": encoder.finish(),
+                    "num_samples": num_samples.get(name),
+                }
+                for name, encoder in encoders.items()
+            ],
+            user_id=current_user.id,
+        )
+
+    try:
+        ecg_id = await run_in_threadpool(store)
+        return {"ecg_id": ecg_id}
+    except BackgroundTaskQueueFull as e:
+        raise queue_full_exception() from e
     except Exception as e:
-        print(e)
+        logger.exception("Failed to upload ECG data")
         raise HTTPException(status_code=500, detail="Failed to upload ECG data") from e
@@ -0,0 +1,289 @@
+"""
+Content negotiation and binary encodings of ECG responses.
+Signals are written from their int32 arrays as they are, so no format
+creates a Python object per sample.
+"""
+
+import gzip
+import importlib.util
+import json
+import logging
+import struct
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import orjson
+from fastapi import HTTPException, Response, status
+from adapters.database.models import ECG
+from core.metrics import STAGE_DURATION
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# pyarrow is only imported to encode Arrow responses: it is slow to import
+# and starts threads, which would make forking worker processes unsafe
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+JSON = "application/json"
+# Little-endian uint32 header length, JSON header, then the int32 samples
+# of every lead, in the order of the header
+RAW = "application/vnd.ecg.raw"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+SIGNAL_DTYPE = np.dtype("<i4")
+RAW_HEADER_SIZE = struct.Struct("<I")
+
+# Responses smaller than this are not worth compressing
+COMPRESSION_MIN_BYTES = 1024
+# Low levels: higher ones cost several times the encode time of the JSON
+# body for a few percent smaller responses, see benchmarks/encodings.py
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+
+
+def parse_accept(header: Optional[str]) -> List[Tuple[str, float]]:
+    """
+    Values of an Accept or Accept-Encoding header, by decreasing quality.
+    Values with the same quality keep their order.
+    :param header: Header value, None if missing
+    """
+    values = []
+    for item in (header or "").split(","):
+        value, *params = [part.strip() for part in item.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, number = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        values.append((value.lower(), quality))
+    return sorted(values, key=lambda value: -value[1])
+
+
+def available_media_types() -> List[str]:
+    return (
+        [JSON, RAW]
+        + ([MSGPACK] if msgpack else [])
+        + ([ARROW] if ARROW_AVAILABLE else [])
+    )
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """
+    Media type of the ECG response
+    :param accept: Accept header of the request
+    :raises HTTPException: 406 if no supported media type is acceptable
+    """
+    media_types = available_media_types()
+    values = parse_accept(accept)
+    if not values:
+        return JSON
+
+    for value, quality in values:
+        if quality <= 0:
+            continue
+        if value in ("*/*", "application/*"):
+            return JSON
+        if value in media_types:
+            return value
+        if value == "application/x-msgpack" and MSGPACK in media_types:
+            return MSGPACK
+
+    raise HTTPException(
+        status_code=status.HTTP_406_NOT_ACCEPTABLE,
+        detail=f"Supported media types: {', '.join(media_types)}",
+    )
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Content encoding of a compressed response, None to send it as is.
+    zstd is preferred over gzip when both are equally acceptable.
+    :param accept_encoding: Accept-Encoding header of the request
+    """
+    accepted = dict(parse_accept(accept_encoding))
+    encoding, best_quality = None, 0.0
+    for candidate in (["zstd"] if zstandard else []) + ["gzip"]:
+        quality = accepted.get(candidate, accepted.get("*", 0.0))
+        if quality > best_quality:
+            encoding, best_quality = candidate, quality
+    return encoding
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    :param body: Response body
+    :param encoding: "zstd" or "gzip"
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def ecg_header(ecg: ECG) -> Dict:
+    """
+    Every field of an ECG response but the samples
+    :param ecg: ECG with decoded signals
+    """
+    return {
+        "ecg_id": ecg.ecg_id,
+        "date": ecg.date.isoformat() if ecg.date else None,
+        "leads": [
+            {
+                "name": lead.name,
+                "num_samples": lead.num_samples,
+                "zero_crossings": lead.zero_crossings,
+                "length": len(lead.signal),
+            }
+            for lead in ecg.leads
+        ],
+    }
+
+
+def encode_json(ecg: ECG) -> bytes:
+    """
+    Body of an ECGResponseSchema, serialized straight from the decoded
+    arrays. Signals were validated when they were uploaded, validating
+    them again would build and check a Python int per sample twice.
+    """
+    return orjson.dumps(
+        {
+            "ecg_id": ecg.ecg_id,
+            "date": ecg.date,
+            "leads": [
+                {
+                    "name": lead.name,
+                    "signal": np.ascontiguousarray(lead.signal),
+                    "num_samples": lead.num_samples,
+                    "zero_crossings": lead.zero_crossings,
+                }
+                for lead in ecg.leads
+            ],
+        },
+        option=orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+
+def encode_raw(ecg: ECG) -> bytes:
+    header = ecg_header(ecg)
+    header["dtype"] = SIGNAL_DTYPE.str
+    header = json.dumps(header, separators=(",", ":")).encode()
+    return b"".join(
+        [RAW_HEADER_SIZE.pack(len(header)), header]
+        + [np.asarray(lead.signal, dtype=SIGNAL_DTYPE).tobytes() for lead in ecg.leads]
+    )
+
+
+def encode_msgpack(ecg: ECG) -> bytes:
+    header = ecg_header(ecg)
+    header["dtype"] = SIGNAL_DTYPE.str
+    for lead, signal in zip(header["leads"], ecg.leads):
+        lead["signal"] = np.asarray(signal.signal, dtype=SIGNAL_DTYPE).tobytes()
+    return msgpack.packb(header)
+
+
+def encode_arrow(ecg: ECG) -> bytes:
+    """
+    One row per lead, samples in a list<int32> column whose values are
+    the concatenated signals
+    """
+    import pyarrow as pa
+
+    signals = [np.asarray(lead.signal, dtype=np.int32) for lead in ecg.leads]
+    offsets = np.zeros(len(signals) + 1, dtype=np.int32)
+    np.cumsum([signal.size for signal in signals], out=offsets[1:])
+    values = np.concatenate(signals) if signals else np.empty(0, dtype=np.int32)
+
+    batch = pa.record_batch(
+        {
+            "name": pa.array([lead.name for lead in ecg.leads], pa.string()),
+            "num_samples": pa.array(
+                [lead.num_samples for lead in ecg.leads], pa.int32()
+            ),
+            "zero_crossings": pa.array(
+                [lead.zero_crossings for lead in ecg.leads], pa.int32()
+            ),
+            "signal": pa.ListArray.from_arrays(pa.array(offsets), pa.array(values)),
+        }
+    )
+    header = ecg_header(ecg)
+    schema = batch.schema.with_metadata(
+        {"ecg_id": header["ecg_id"], "date": header["date"] or ""}
+    )
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch.replace_schema_metadata(schema.metadata))
+    return sink.getvalue().to_pybytes()
+
+
+ENCODERS = {RAW: encode_raw, MSGPACK: encode_msgpack, ARROW: encode_arrow}
+
+# Responses depend on both negotiated headers, caches must key on them
+VARY = "Accept, Accept-Encoding"
+
+
+def binary_response(ecg: ECG, media_type: str) -> Response:
+    """
+    :param ecg: ECG with decoded signals
+    :param media_type: Negotiated binary media type
+    :raises HTTPException: 406 if the library of the media type can not
+    be imported, e.g. a broken pyarrow install
+    """
+    try:
+        with STAGE_DURATION.time(stage="serialize"):
+            body = ENCODERS[media_type](ecg)
+    except ImportError as e:
+        logger.error("Can not encode %s responses: %s", media_type, e)
+        media_types = [
+            other for other in available_media_types() if other != media_type
+        ]
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Supported media types: {', '.join(media_types)}",
+        ) from e
+    return Response(body, media_type=media_type, headers={"Vary": VARY})
+
+
+def json_response(ecg: ECG, accept_encoding: Optional[str]) -> Response:
+    """
+    JSON response, compressed with the negotiated content encoding
+    :param ecg: ECG with decoded signals
+    :param accept_encoding: Accept-Encoding header of the request
+    """
+    headers = {"Vary": VARY}
+    encoding = negotiate_encoding(accept_encoding)
+    with STAGE_DURATION.time(stage="serialize"):
+        body = encode_json(ecg)
+        if encoding is not None and len(body) >= COMPRESSION_MIN_BYTES:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return Response(body, media_type=JSON, headers=headers)
+
+
+# Alternative content of ECG responses, for the OpenAPI schema
+BINARY_RESPONSES = {
+    200: {
+        "content": {
+            media_type: {"schema": {"type": "string", "format": "binary"}}
+            for media_type in ENCODERS
+        },
+        "description": "ECG as JSON, or with the samples as little-endian int32 "
+        "arrays in the negotiated binary format",
+    },
+    406: {"description": "None of the accepted media types is supported"},
+}
@@ -0,0 +1,41 @@
+from typing import Any
+from fastapi import Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+
+# Items of arrays and characters of strings echoed in validation errors
+MAX_INPUT_ITEMS = 10
+MAX_INPUT_CHARS = 100
+
+
+def bounded_input(value: Any) -> Any:
+    """
+    Truncate the input of a validation error, which may be a whole signal
+    of several megabytes
+    :param value: Input that failed validation
+    """
+    if isinstance(value, dict):
+        return {key: bounded_input(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [bounded_input(item) for item in value[:MAX_INPUT_ITEMS]]
+        return items + ["..."] if len(value) > MAX_INPUT_ITEMS else items
+    if isinstance(value, str) and len(value) > MAX_INPUT_CHARS:
+        return value[:MAX_INPUT_CHARS] + "..."
+    return value
+
+
+async def validation_exception_handler(
+    request: Request, exc: RequestValidationError
+) -> JSONResponse:
+    """
+    422 response of FastAPI, with the inputs of the errors truncated
+    """
+    errors = [
+        {**error, "input": bounded_input(error["input"])} if "input" in error else error
+        for error in exc.errors()
+    ]
+    return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"detail": jsonable_encoder(errors)},
+    )
@@ -0,0 +1,144 @@
+import time
+from typing import Dict, Iterable, Tuple
+from fastapi import Response
+from fastapi.routing import APIRouter
+from adapters.api.dependencies import ecg_cache
+from adapters.database.async_orm import get_async_engine
+from adapters.database.engine import pool_stats
+from adapters.database.orm import get_engine, get_sessionmaker
+from adapters.database.repository import DatabaseJobRepository
+from core.config import config
+from core.metrics import REQUEST_DURATION, Gauge, registry
+from services.auth_service import credential_cache
+
+# Version 0.0.4 of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter(tags=["metrics"])
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware observing the duration of every HTTP request, until
+    its response is sent, by method, route template and status code
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route_template(scope),
+                status=status_code,
+            )
+
+
+def route_template(scope: Dict) -> str:
+    """
+    Path template of the route that served a request, e.g. "/ecg/{ecg_id}",
+    so the number of series does not grow with the number of ECGs
+    :param scope: ASGI scope of the request, once served
+    """
+    endpoint = scope.get("endpoint")
+    for route in scope["app"].routes:
+        if getattr(route, "endpoint", None) is endpoint is not None:
+            return route.path
+    return "unmatched"
+
+
+def collect_pool_stats() -> Iterable[Tuple[Dict, int]]:
+    # Engines are created on first use, the async one by the async routes
+    engines = {}
+    if get_engine.cache_info().currsize:
+        engines["sync"] = get_engine()
+    if get_async_engine.cache_info().currsize:
+        engines["async"] = get_async_engine().sync_engine
+
+    for name, database_engine in engines.items():
+        for state, value in pool_stats(database_engine).items():
+            yield {"engine": name, "state": state}, value
+
+
+def collect_job_queue_depth() -> Iterable[Tuple[Dict, int]]:
+    if config.BACKGROUND_TASK_BACKEND != "queue":
+        return
+    db = get_sessionmaker()()
+    try:
+        yield {"status": "active"}, DatabaseJobRepository(db).count_active()
+    finally:
+        db.close()
+
+
+def collect_cache_events() -> Iterable[Tuple[Dict, int]]:
+    # Counted since the process started
+    yield {"cache": "ecg", "event": "hit"}, ecg_cache.hits
+    yield {"cache": "ecg", "event": "miss"}, ecg_cache.misses
+    yield {"cache": "ecg", "event": "eviction"}, ecg_cache.evictions
+    yield {"cache": "credential", "event": "hit"}, credential_cache.hits
+    yield {"cache": "credential", "event": "miss"}, credential_cache.misses
+
+
+def collect_cache_entries() -> Iterable[Tuple[Dict, int]]:
+    yield {"cache": "ecg"}, ecg_cache.stats()["entries"]
+    yield {"cache": "credential"}, credential_cache.size
+
+
+registry.register(
+    Gauge(
+        "db_pool_connections",
+        "Connections of the database pools by state",
+        ["engine", "state"],
+        collect=collect_pool_stats,
+    )
+)
+registry.register(
+    Gauge(
+        "insight_job_queue_depth",
+        "Pending or running jobs of the insight job queue",
+        ["status"],
+        collect=collect_job_queue_depth,
+    )
+)
+
+registry.register(
+    Gauge(
+        "cache_events",
+        "Hits, misses and evictions of the in-process caches",
+        ["cache", "event"],
+        collect=collect_cache_events,
+    )
+)
+registry.register(
+    Gauge(
+        "cache_entries",
+        "Entries of the in-process caches",
+        ["cache"],
+        collect=collect_cache_entries,
+    )
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Endpoint exposing the metrics of the process in the Prometheus text
+    format. Every worker process has its own metrics.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
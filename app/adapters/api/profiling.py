@@ -0,0 +1,120 @@
+from typing import Dict, List
+from urllib.parse import parse_qs
+from fastapi import Depends, HTTPException, status
+from fastapi.routing import APIRouter
+from adapters.api.dependencies import verify_admin
+from core.config import config
+from core.profiling import RequestProfile, current_profile, profiles, slow_calls
+
+PROFILE_FLAG_VALUES = {"1", "true", "yes"}
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+    dependencies=[Depends(verify_admin)],
+)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the requests with the X-Profile header or the
+    profile query parameter. The profile only starts once the user is
+    verified to be an admin (see authorize_profiling), and its ID is
+    returned in the X-Profile-Id header. Requests made while another one
+    is profiled are served without profiling, with the X-Profile: busy
+    header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not config.PROFILING_ENABLED
+            or not profiling_requested(scope)
+        ):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        finished = False
+
+        async def send_wrapper(message):
+            nonlocal finished
+            if message["type"] == "http.response.start" and not finished:
+                finished = True
+                report = profile.finish()
+                if report is not None:
+                    profiles.append(report)
+                    message = add_header(
+                        message, b"x-profile-id", report["id"].encode()
+                    )
+                elif profile.busy:
+                    message = add_header(message, b"x-profile", b"busy")
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            if not finished:
+                profile.finish()
+
+
+def profiling_requested(scope: Dict) -> bool:
+    """
+    :param scope: ASGI scope of the request
+    """
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.decode("latin-1").lower() in PROFILE_FLAG_VALUES
+
+    query = parse_qs(scope["query_string"].decode("latin-1"))
+    return any(
+        value.lower() in PROFILE_FLAG_VALUES for value in query.get("profile", [])
+    )
+
+
+def add_header(message: Dict, name: bytes, value: bytes) -> Dict:
+    return {**message, "headers": [*message.get("headers", []), (name, value)]}
+
+
+@router.get("/slow-calls")
+def get_slow_calls() -> List[Dict]:
+    """
+    Calls of profiled functions slower than PROFILING_SLOW_CALL_SECONDS,
+    newest first. Every worker process has its own slow calls.
+    """
+    return slow_calls.entries()
+
+
+@router.delete("/slow-calls", status_code=status.HTTP_204_NO_CONTENT)
+def clear_slow_calls():
+    slow_calls.clear()
+
+
+@router.get("/profiles")
+def list_profiles() -> List[Dict]:
+    """
+    Profiled requests, newest first, without their statistics
+    """
+    return [
+        {key: value for key, value in report.items() if key not in ("calls", "stats")}
+        for report in profiles.entries()
+    ]
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str) -> Dict:
+    """
+    Profiled calls of a request, and the cProfile statistics of their
+    functions sorted by cumulative time
+    """
+    for report in profiles.entries():
+        if report["id"] == profile_id:
+            return report
+
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+    )
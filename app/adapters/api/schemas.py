@@ -1,14 +1,79 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from array import array
+import numpy as np
+from pydantic import (
+    BaseModel,
+    PlainSerializer,
+    PlainValidator,
+    WithJsonSchema,
+    model_validator,
+)
+from typing import Annotated, Any, List, Optional
 from datetime import datetime
+from adapters.database.models import UserRole
+from core.config import config
 
+# Array type codes of the samples accepted on upload, see SIGNAL_SAMPLE_DTYPE
+SAMPLE_TYPECODES = {"int16": "h", "int32": "i"}
+
+
+def parse_signal(value: Any) -> np.ndarray:
+    """
+    Convert the samples of a lead into an int32 array in a single C pass,
+    instead of validating every sample as a Python int: `array` rejects
+    non-integers and samples out of the range of SIGNAL_SAMPLE_DTYPE.
+    :param value: Array of samples, as decoded from the JSON body
+    :raises ValueError: if the signal is not an array of such integers
+    """
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    elif not isinstance(value, (list, tuple)):
+        raise ValueError("Signal must be an array of integers")
+
+    try:
+        samples = array(SAMPLE_TYPECODES[config.SIGNAL_SAMPLE_DTYPE], value)
+    except TypeError as e:
+        raise ValueError("Signal must be an array of integers") from e
+    except OverflowError as e:
+        raise ValueError(
+            f"Signal values must fit in a {config.SIGNAL_SAMPLE_DTYPE} integer"
+        ) from e
+    # Zero-copy view of int32 samples, int16 samples are widened
+    return np.frombuffer(samples, dtype=np.dtype(samples.typecode)).astype(
+        np.int32, copy=False
+    )
+
+
+# Signal parsed into an int32 array, documented as an array of integers
+SignalArray = Annotated[
+    np.ndarray,
+    PlainValidator(parse_signal),
+    PlainSerializer(lambda signal: signal.tolist(), when_used="json"),
+    WithJsonSchema({"type": "array", "items": {"type": "integer"}}),
+]
+
+
+class LeadFrameSchema(BaseModel):
+    """
+    Chunk of the signal of a lead in a streamed upload, `num_samples` is
+    the length of the whole signal
+    """
 
-class LeadRequestSchema(BaseModel):
     name: str
-    signal: List[int]
+    signal: SignalArray
     num_samples: Optional[int] = None
 
 
+class LeadRequestSchema(LeadFrameSchema):
+    @model_validator(mode="after")
+    def check_num_samples(self) -> "LeadRequestSchema":
+        if self.num_samples is not None and self.num_samples != self.signal.size:
+            raise ValueError(
+                f"num_samples is {self.num_samples} but the signal has "
+                f"{self.signal.size} samples"
+            )
+        return self
+
+
 class LeadResponseSchema(BaseModel):
     name: str
     signal: List[int]
@@ -20,6 +85,21 @@ class ECGRequestSchema(BaseModel):
     leads: List[LeadRequestSchema]
 
 
+class ECGBatchRequestSchema(BaseModel):
+    # Items are validated one by one against ECGRequestSchema,
+    # so a single invalid ECG does not reject the whole batch
+    ecgs: List[Any]
+
+
+class ECGBatchItemResponseSchema(BaseModel):
+    ecg_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ECGBatchResponseSchema(BaseModel):
+    results: List[ECGBatchItemResponseSchema]
+
+
 class ECGResponseSchema(BaseModel):
     ecg_id: str
     date: datetime
@@ -28,13 +108,56 @@ class ECGResponseSchema(BaseModel):
 
 class ZeroCrossingSchema(BaseModel):
     name: str
-    zero_crossings: int
+    # None until the insights of the ECG are computed
+    zero_crossings: Optional[int] = None
 
 
 class ECGInsightResponseSchema(BaseModel):
     leads: List[ZeroCrossingSchema]
 
 
+class LeadInsightSchema(BaseModel):
+    name: str
+    # None until the insights of the ECG are computed
+    zero_crossings: Optional[int] = None
+
+
+class ECGSummarySchema(BaseModel):
+    ecg_id: str
+    date: datetime
+    leads: Optional[List[LeadInsightSchema]] = None
+
+
+class ECGListResponseSchema(BaseModel):
+    ecgs: List[ECGSummarySchema]
+    next_cursor: Optional[str] = None
+
+
 class UserCreate(BaseModel):
     username: str
     password: str
+
+
+class PasswordUpdate(BaseModel):
+    current_password: str
+    new_password: str
+
+
+class RoleUpdate(BaseModel):
+    role: UserRole
+
+
+class LoginSchema(BaseModel):
+    username: str
+    password: str
+
+
+class RefreshTokenSchema(BaseModel):
+    refresh_token: str
+
+
+class TokenResponseSchema(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
+    expires_in: int
@@ -0,0 +1,61 @@
+from typing import AsyncIterable, AsyncIterator
+
+
+class FrameTooLarge(Exception):
+    """
+    Raised when a frame of a streamed body exceeds the maximum size
+    """
+
+
+class BodyTooLarge(Exception):
+    """
+    Raised when a streamed body exceeds the maximum size
+    """
+
+
+async def limit_body(
+    stream: AsyncIterable[bytes], max_body_bytes: int
+) -> AsyncIterator[bytes]:
+    """
+    Pass the chunks of a streamed body through, up to a maximum total size
+    :param stream: Chunks of the request body
+    :param max_body_bytes: Maximum size of the body
+    :raises BodyTooLarge: if the body exceeds `max_body_bytes`
+    """
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_body_bytes:
+            raise BodyTooLarge(f"Body must not exceed {max_body_bytes} bytes")
+        yield chunk
+
+
+async def iter_ndjson_frames(
+    stream: AsyncIterable[bytes], max_frame_bytes: int
+) -> AsyncIterator[bytes]:
+    """
+    Split a streamed body into newline-delimited frames.
+    Only the frame being received is kept in memory.
+    :param stream: Chunks of the request body
+    :param max_frame_bytes: Maximum size of a single frame
+    :raises FrameTooLarge: if a frame exceeds `max_frame_bytes`
+    """
+    buffer = bytearray()
+    async for chunk in stream:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            if end - start > max_frame_bytes:
+                break
+            frame = bytes(buffer[start:end]).strip()
+            if frame:
+                yield frame
+            start = end + 1
+        del buffer[:start]
+
+        if len(buffer) > max_frame_bytes:
+            raise FrameTooLarge(f"Frames must not exceed {max_frame_bytes} bytes")
+
+    frame = bytes(buffer).strip()
+    if frame:
+        yield frame
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, status
-from adapters.api.schemas import UserCreate
-from adapters.api.dependencies import get_auth_service, verify_admin
+from fastapi.security import HTTPBasicCredentials
+from adapters.api.schemas import PasswordUpdate, RoleUpdate, UserCreate
+from adapters.api.dependencies import get_auth_service, verify_admin, verify_user
 from adapters.database.models import User
 from services.auth_service import AuthService
 
@@ -22,3 +23,38 @@ def create_user(
     return {
         "message": f"User {user.username} with role {user.role} created successfully"
     }
+
+
+@router.put("/me/password", status_code=status.HTTP_200_OK)
+def update_password(
+    password_data: PasswordUpdate,
+    user: User = Depends(verify_user),
+    auth_service: AuthService = Depends(get_auth_service),
+):
+    """
+    Change the password of the current user, who must confirm the current
+    one. Refresh tokens issued before the change are refused.
+    """
+
+    auth_service.authenticate_user(
+        HTTPBasicCredentials(
+            username=user.username, password=password_data.current_password
+        )
+    )
+    auth_service.update_password(user.username, password_data.new_password)
+    return {"message": f"Password of user {user.username} updated successfully"}
+
+
+@router.put("/{username}/role", status_code=status.HTTP_200_OK)
+def update_role(
+    username: str,
+    role_data: RoleUpdate,
+    admin: User = Depends(verify_admin),
+    auth_service: AuthService = Depends(get_auth_service),
+):
+    """
+    Only admins can change the role of a user
+    """
+
+    user = auth_service.update_role(username, role_data.role)
+    return {"message": f"Role of user {user.username} updated to {user.role}"}
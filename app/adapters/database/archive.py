@@ -0,0 +1,101 @@
+import fcntl
+import mmap
+import os
+import threading
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import numpy as np
+from core.config import config
+
+# Samples are stored as raw little-endian int32, so they can be mapped as is
+ARCHIVE_DTYPE = np.dtype("<i4")
+
+
+class SignalArchive:
+    """
+    File-backed store of lead signals: one append-only file of raw
+    samples per day. The database only keeps the day, offset and length
+    of every signal, see ArchiveSignalCodec.
+
+    Reads are memory-mapped: signals are returned as read-only views of
+    the page cache, so large recordings are never copied into the heap
+    and a window of a signal only touches the pages it spans.
+    Bytes of ECGs whose transaction is rolled back are never reclaimed.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: Directory of the day files, created if missing
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._lock = threading.Lock()
+
+    def path(self, day: int) -> str:
+        """
+        :param day: Day as a YYYYMMDD integer
+        """
+        return os.path.join(self.directory, f"{day}.i32")
+
+    def append(self, signal: np.ndarray, day: Optional[date] = None) -> Tuple[int, int]:
+        """
+        Append the samples of a lead to the file of a day.
+        Returns the day, as a YYYYMMDD integer, and the byte offset of the
+        samples in its file.
+        :param signal: int32 samples of a lead
+        :param day: Day file to append to, today by default
+        """
+        day = int((day or date.today()).strftime("%Y%m%d"))
+        data = np.ascontiguousarray(signal, dtype=ARCHIVE_DTYPE).tobytes()
+
+        # Other processes may append to the same file, the exclusive lock
+        # makes the offset and the write atomic
+        with open(self.path(day), "ab") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                offset = file.seek(0, os.SEEK_END)
+                file.write(data)
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+        return day, offset
+
+    def read(
+        self, day: int, offset: int, num_samples: int, start: int = 0, end: int = None
+    ) -> np.ndarray:
+        """
+        Read-only view of the samples of a lead, or of a window of them
+        :param day: Day of the file, as returned by `append`
+        :param offset: Byte offset of the signal, as returned by `append`
+        :param num_samples: Number of samples of the signal
+        :param start: First sample of the window
+        :param end: Sample after the last one of the window, None for the end
+        """
+        start, end, _ = slice(start, end).indices(num_samples)
+        count = max(end - start, 0)
+        if not count:
+            return np.empty(0, dtype=ARCHIVE_DTYPE)
+
+        offset += start * ARCHIVE_DTYPE.itemsize
+        file_map = self._map(day, offset + count * ARCHIVE_DTYPE.itemsize)
+        return np.frombuffer(file_map, dtype=ARCHIVE_DTYPE, count=count, offset=offset)
+
+    def _map(self, day: int, size: int) -> mmap.mmap:
+        """
+        Map the file of a day, remapping it if it grew past the mapped size.
+        Views of a previous map keep it alive until they are released.
+        """
+        with self._lock:
+            file_map = self._maps.get(day)
+            if file_map is None or len(file_map) < size:
+                with open(self.path(day), "rb") as file:
+                    file_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[day] = file_map
+            return file_map
+
+
+@lru_cache
+def get_archive() -> SignalArchive:
+    return SignalArchive(config.SIGNAL_ARCHIVE_DIR)
@@ -0,0 +1,43 @@
+from functools import lru_cache
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from adapters.database.engine import (
+    async_database_url,
+    create_async_database_engine,
+    same_database,
+)
+from core.config import config
+
+
+def get_async_database_url() -> str:
+    """
+    ASYNC_DATABASE_URL, or DATABASE_URL with an async driver when unset
+    :raises RuntimeError: if they do not point to the same database
+    """
+    if config.ASYNC_DATABASE_URL is None:
+        return async_database_url(config.DATABASE_URL)
+    if not same_database(config.ASYNC_DATABASE_URL, config.DATABASE_URL):
+        raise RuntimeError(
+            "ASYNC_DATABASE_URL must point to the database of DATABASE_URL"
+        )
+    return config.ASYNC_DATABASE_URL
+
+
+# The async engine is only created when the async routes are used, so the
+# async driver (aiosqlite, asyncpg) is not required otherwise
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    return create_async_database_engine(get_async_database_url())
+
+
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker:
+    # Instances stay usable after a commit, async sessions can not reload
+    # expired attributes on access
+    return async_sessionmaker(
+        bind=get_async_engine(), autoflush=False, expire_on_commit=False
+    )
+
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -0,0 +1,218 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from adapters.database.codecs import SignalCodec, get_codec
+from adapters.database.models import ECG, Lead, User
+from adapters.database.repository import (
+    LEAD_LOADERS,
+    insert_statements,
+    insight_versions_query,
+    insights_from_rows,
+    insights_query,
+    insights_rows,
+    load_leads,
+    mark_insights_saved,
+    migrate_legacy_signals,
+    result_statements,
+)
+from core.config import config
+from core.profiling import profiled
+
+
+class AsyncECGRepository(ABC):
+    """
+    Abstract class for asynchronous ECG repository
+    """
+
+    @abstractmethod
+    async def save(self, ecg: ECG):
+        pass
+
+    @abstractmethod
+    async def save_many(self, ecgs: List[ECG]):
+        pass
+
+    @abstractmethod
+    async def save_insights(
+        self,
+        ecg: ECG,
+        results: Optional[Dict[str, Tuple[int, Any]]] = None,
+        outdated: Sequence[str] = (),
+    ):
+        pass
+
+    @abstractmethod
+    async def get(self, uuid: str, leads: Optional[List[str]] = None) -> Optional[ECG]:
+        pass
+
+    @abstractmethod
+    async def get_insights(self, uuid: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    async def get_insight_versions(self, uuid: str) -> Dict[str, int]:
+        pass
+
+
+class AsyncDatabaseECGRepository(AsyncECGRepository):
+    """
+    Database implementation of asynchronous ECG repository.
+    Runs the same statements as DatabaseECGRepository.
+    """
+
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        codec: Optional[SignalCodec] = None,
+        chunk_size: int = config.BULK_INSERT_CHUNK_SIZE,
+        leads_loading: str = config.LEADS_LOADING,
+    ):
+        """
+        :param db_session: Asynchronous database session
+        :param codec: Codec used to re-encode legacy text signals on read
+        :param chunk_size: Maximum number of rows per bulk insert statement
+        :param leads_loading: Strategy to load the leads, see LEAD_LOADERS.
+        Async sessions can not load relationships on access, so "lazy"
+        is not supported.
+        """
+        if leads_loading not in LEAD_LOADERS or leads_loading == "lazy":
+            raise ValueError(f"Unsupported leads loading strategy: {leads_loading}")
+
+        self.db_session = db_session
+        self.codec = codec or get_codec(config.SIGNAL_CODEC)
+        self.chunk_size = chunk_size
+        self.leads_loading = leads_loading
+
+    @profiled
+    async def save(self, ecg: ECG):
+        """
+        :param ecg: ECG database model
+        """
+        await self.save_many([ecg])
+
+    @profiled
+    async def save_many(self, ecgs: List[ECG]):
+        """
+        Save ECGs and their leads with bulk insert statements
+        in a single transaction
+        :param ecgs: ECG database models
+        """
+        try:
+            for statement, rows in insert_statements(ecgs, self.chunk_size):
+                await self.db_session.execute(statement, rows)
+            await self.db_session.commit()
+        except Exception:
+            await self.db_session.rollback()
+            raise
+
+    @profiled
+    async def save_insights(
+        self,
+        ecg: ECG,
+        results: Optional[Dict[str, Tuple[int, Any]]] = None,
+        outdated: Sequence[str] = (),
+    ):
+        """
+        Update only the insight columns of the leads of an ECG, and store
+        the results of analyzers in a single transaction
+        :param ecg: ECG database model with computed insights
+        :param results: Version and result of analyzers, by name
+        :param outdated: Analyzers whose previously stored results are replaced
+        """
+        ecg_id = ecg.ecg_id
+        try:
+            rows = insights_rows(ecg)
+            if rows:
+                mark_insights_saved(ecg)
+                await self.db_session.execute(
+                    update(Lead).execution_options(synchronize_session=False), rows
+                )
+            for statement, params in result_statements(ecg_id, results, outdated):
+                await self.db_session.execute(statement, params)
+            await self.db_session.commit()
+        except Exception:
+            await self.db_session.rollback()
+            raise
+
+    @profiled
+    async def get(
+        self, ecg_id: str, leads: Optional[List[str]] = None
+    ) -> Optional[ECG]:
+        """
+        :param ecg_id: ECG ID (uuid)
+        :param leads: Only load the leads with these names, None for every lead
+        """
+        result = await self.db_session.execute(
+            select(ECG)
+            .options(load_leads(self.leads_loading, with_signals=True, names=leads))
+            .where(ECG.ecg_id == ecg_id)
+            .execution_options(populate_existing=True)
+        )
+        ecg = result.unique().scalars().first()
+        # Legacy text signals are only rewritten once, on their first read
+        if ecg is not None and migrate_legacy_signals(ecg, self.codec):
+            await self.db_session.commit()
+        return ecg
+
+    @profiled
+    async def get_insights(self, ecg_id: str) -> Optional[Dict]:
+        """
+        Retrieve the owner and the insights of the leads of an ECG,
+        without loading the signals
+        :param ecg_id: ECG ID (uuid)
+        """
+        result = await self.db_session.execute(insights_query(ecg_id))
+        return insights_from_rows(result.all())
+
+    @profiled
+    async def get_insight_versions(self, ecg_id: str) -> Dict[str, int]:
+        """
+        Version of the stored result of every analyzer of an ECG, by name
+        :param ecg_id: ECG ID (uuid)
+        """
+        result = await self.db_session.execute(insight_versions_query(ecg_id))
+        return dict(result.all())
+
+
+class AsyncUserRepository(ABC):
+    """
+    Abstract class for asynchronous User repository
+    """
+
+    @abstractmethod
+    async def save(self, user: User):
+        pass
+
+    @abstractmethod
+    async def get(self, username: str) -> Optional[User]:
+        pass
+
+
+class AsyncDatabaseUserRepository(AsyncUserRepository):
+    """
+    Database implementation of asynchronous User repository
+    """
+
+    def __init__(self, db_session: AsyncSession):
+        """
+        :param db_session: Asynchronous database session
+        """
+        self.db_session = db_session
+
+    async def save(self, user: User):
+        """
+        :param user: User database model
+        """
+        self.db_session.add(user)
+        await self.db_session.commit()
+        await self.db_session.refresh(user)
+
+    async def get(self, username: str) -> Optional[User]:
+        """
+        :param username: Username
+        """
+        result = await self.db_session.execute(
+            select(User).where(User.username == username)
+        )
+        return result.scalars().first()
@@ -0,0 +1,284 @@
+import threading
+import time
+from datetime import datetime
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from adapters.database.codecs import decode_signal
+from adapters.database.models import ECG, Lead
+from adapters.database.repository import ECGRepository
+from services.analyzers import analyzer_versions, pending_analyzers
+
+# Approximate memory used by the Python objects of a cached ECG and lead
+ECG_OVERHEAD_BYTES = 512
+LEAD_OVERHEAD_BYTES = 256
+
+
+class ECGCache:
+    """
+    In-process LRU cache of ECGs with decoded signals, bounded by the
+    approximate memory used by its entries rather than their number.
+    Entries optionally expire after `ttl_seconds`.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: Optional[float] = None):
+        """
+        :param max_bytes: Maximum memory used by the cached ECGs
+        :param ttl_seconds: Time an entry is valid for, None to never expire
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[float], int, Dict]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, ecg_id: str) -> Optional[Dict]:
+        """
+        Retrieve the snapshot of a cached ECG
+        :param ecg_id: ECG ID (uuid)
+        """
+        with self._lock:
+            entry = self._entries.get(ecg_id)
+            if (
+                entry is not None
+                and entry[0] is not None
+                and entry[0] < time.monotonic()
+            ):
+                self._remove(ecg_id)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(ecg_id)
+            self.hits += 1
+            return entry[2]
+
+    def add(self, ecg_id: str, snapshot: Dict, size_bytes: int):
+        """
+        :param ecg_id: ECG ID (uuid)
+        :param snapshot: Snapshot of the ECG
+        :param size_bytes: Approximate memory used by the snapshot
+        """
+        if size_bytes > self.max_bytes:
+            return
+
+        expires_at = None
+        if self.ttl_seconds is not None:
+            expires_at = time.monotonic() + self.ttl_seconds
+
+        with self._lock:
+            self._remove(ecg_id)
+            self._entries[ecg_id] = (expires_at, size_bytes, snapshot)
+            self.size_bytes += size_bytes
+
+            while self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, ecg_id: str):
+        """
+        :param ecg_id: ECG ID (uuid)
+        """
+        with self._lock:
+            self._remove(ecg_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, ecg_id: str):
+        entry = self._entries.pop(ecg_id, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+
+class CachedECGRepository(ECGRepository):
+    """
+    Read-through cache in front of an ECG repository.
+    Cache hits skip both the database and the decoding of the signals.
+
+    Only ECGs whose insights are computed by the current version of every
+    analyzer are cached, and entries record these versions: after a
+    version bump, they are misses until the insights are recomputed.
+    Writes through this repository invalidate the entries of their ECGs,
+    writes of other processes (worker, backfill) are only picked up when
+    the entries expire.
+    """
+
+    def __init__(self, repository: ECGRepository, cache: ECGCache):
+        """
+        :param repository: ECG repository instance to read from on misses
+        :param cache: ECGCache instance, usually shared by every request
+        """
+        self.repository = repository
+        self.cache = cache
+
+    def save(self, ecg: ECG):
+        """
+        :param ecg: ECG database model
+        """
+        self.repository.save(ecg)
+        self.cache.invalidate(ecg.ecg_id)
+
+    def save_many(self, ecgs: List[ECG]):
+        """
+        :param ecgs: ECG database models
+        """
+        self.repository.save_many(ecgs)
+        for ecg in ecgs:
+            self.cache.invalidate(ecg.ecg_id)
+
+    def save_insights(
+        self,
+        ecg: ECG,
+        results: Optional[Dict[str, Tuple[int, Any]]] = None,
+        outdated: Sequence[str] = (),
+    ):
+        """
+        :param ecg: ECG database model with computed insights
+        :param results: Version and result of analyzers, by name
+        :param outdated: Analyzers whose previously stored results are replaced
+        """
+        ecg_id = ecg.ecg_id
+        self.repository.save_insights(ecg, results, outdated)
+        self.cache.invalidate(ecg_id)
+
+    def get(self, ecg_id: str, leads: Optional[List[str]] = None) -> Optional[ECG]:
+        """
+        Returns a new ECG instance, detached from any session, when cached.
+        Its signals are already decoded into read-only arrays.
+        Subsets of leads are served from the cache, but not cached on a miss.
+        :param ecg_id: ECG ID (uuid)
+        :param leads: Only return the leads with these names, None for every lead
+        """
+        snapshot = self._get_snapshot(ecg_id)
+        if snapshot is not None:
+            return self._from_snapshot(snapshot, leads)
+
+        if leads is not None:
+            return self.repository.get(ecg_id, leads)
+
+        ecg = self.repository.get(ecg_id)
+        if ecg is None or any(lead.zero_crossings is None for lead in ecg.leads):
+            return ecg
+
+        versions = self.repository.get_insight_versions(ecg_id)
+        if pending_analyzers(versions):
+            return ecg
+
+        snapshot, size_bytes = self._to_snapshot(ecg, versions)
+        self.cache.add(ecg_id, snapshot, size_bytes)
+        return self._from_snapshot(snapshot)
+
+    def get_insights(self, ecg_id: str) -> Optional[Dict]:
+        """
+        Served from the cached ECG if any, the insights query does not
+        populate the cache.
+        :param ecg_id: ECG ID (uuid)
+        """
+        snapshot = self._get_snapshot(ecg_id)
+        if snapshot is None:
+            return self.repository.get_insights(ecg_id)
+
+        return {
+            "user_id": snapshot["user_id"],
+            "leads": [
+                {"name": lead["name"], "zero_crossings": lead["zero_crossings"]}
+                for lead in snapshot["leads"]
+            ],
+        }
+
+    def get_insight_versions(self, ecg_id: str) -> Dict[str, int]:
+        """
+        :param ecg_id: ECG ID (uuid)
+        """
+        return self.repository.get_insight_versions(ecg_id)
+
+    def list_for_user(
+        self,
+        user_id: int,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        with_insights: bool = False,
+    ) -> List[ECG]:
+        """
+        Not cached, listed ECGs do not have their signals
+        :param user_id: User ID
+        """
+        return self.repository.list_for_user(
+            user_id, limit, after, date_from, date_to, with_insights
+        )
+
+    def _get_snapshot(self, ecg_id: str) -> Optional[Dict]:
+        snapshot = self.cache.get(ecg_id)
+        if snapshot is not None and snapshot["versions"] != analyzer_versions():
+            self.cache.invalidate(ecg_id)
+            return None
+        return snapshot
+
+    def _to_snapshot(self, ecg: ECG, versions: Dict[str, int]) -> Tuple[Dict, int]:
+        leads = []
+        size_bytes = ECG_OVERHEAD_BYTES
+        for lead in ecg.leads:
+            signal = decode_signal(lead.signal)
+            signal.flags.writeable = False
+            size_bytes += LEAD_OVERHEAD_BYTES + signal.nbytes
+            leads.append(
+                {
+                    "id": lead.id,
+                    "ecg_id": lead.ecg_id,
+                    "name": lead.name,
+                    "num_samples": lead.num_samples,
+                    "signal": signal,
+                    "zero_crossings": lead.zero_crossings,
+                }
+            )
+
+        snapshot = {
+            "id": ecg.id,
+            "ecg_id": ecg.ecg_id,
+            "date": ecg.date,
+            "user_id": ecg.user_id,
+            "leads": leads,
+            # Versions of the analyzers the insights were computed by
+            "versions": versions,
+        }
+        return snapshot, size_bytes
+
+    def _from_snapshot(self, snapshot: Dict, names: Optional[List[str]] = None) -> ECG:
+        return ECG(
+            id=snapshot["id"],
+            ecg_id=snapshot["ecg_id"],
+            date=snapshot["date"],
+            user_id=snapshot["user_id"],
+            leads=[
+                Lead(**lead)
+                for lead in snapshot["leads"]
+                if names is None or lead["name"] in names
+            ],
+        )
@@ -0,0 +1,383 @@
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence, Union
+import numpy as np
+from adapters.database.archive import SignalArchive, get_archive
+from adapters.database.utils import signal_to_string, string_to_signal
+from core.metrics import STAGE_DURATION
+
+
+# Binary payload layout: magic, dtype code, flags, number of samples
+HEADER = struct.Struct("<4sBBI")
+MAGIC = b"ECGB"
+
+DTYPES = {0: np.dtype("<i2"), 1: np.dtype("<i4")}
+FLAG_DELTA = 0x01
+FLAG_ZLIB = 0x02
+
+# Archive payload layout: magic, day (YYYYMMDD), byte offset, number of samples
+ARCHIVE_REFERENCE = struct.Struct("<4sIQI")
+ARCHIVE_MAGIC = b"ECGR"
+
+INT16 = np.iinfo(np.int16)
+INT32 = np.iinfo(np.int32)
+
+
+def as_int32(signal: Sequence[int]) -> np.ndarray:
+    """
+    Convert samples to an int32 array
+    :param signal: Samples of a lead
+    :raises ValueError: if a sample does not fit in a 32-bit integer
+    """
+    # Uploaded signals are already validated int32 arrays
+    if isinstance(signal, np.ndarray) and signal.dtype == np.int32:
+        return signal
+
+    values = np.asarray(signal, dtype=np.int64)
+    if values.size and (values.min() < INT32.min or values.max() > INT32.max):
+        raise ValueError("Signal values must fit in a 32-bit integer")
+    return values.astype(np.int32)
+
+
+class SignalCodec(ABC):
+    """
+    Abstract class for signal codecs.
+    A codec turns the samples of a lead into the payload stored
+    in the `Lead.signal` column and back.
+    """
+
+    name: str
+
+    @abstractmethod
+    def encode(self, signal: Sequence[int]) -> bytes:
+        """Encode the samples of a lead into a storable payload."""
+        pass
+
+    @abstractmethod
+    def decode(self, payload: Union[bytes, str]) -> np.ndarray:
+        """Decode a stored payload into an array of samples."""
+        pass
+
+    def decode_range(
+        self, payload: Union[bytes, str], start: int = 0, end: Optional[int] = None
+    ) -> np.ndarray:
+        """Decode a window of the samples of a stored payload."""
+        return self.decode(payload)[start:end]
+
+    def encoder(self) -> "SignalEncoder":
+        """Create an encoder that receives the samples of a lead in chunks."""
+        return BufferedSignalEncoder(self)
+
+
+class SignalEncoder(ABC):
+    """
+    Abstract class for incremental signal encoders
+    """
+
+    num_samples = 0
+
+    @abstractmethod
+    def write(self, chunk: Sequence[int]):
+        """Append a chunk of samples."""
+        pass
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        """Return the payload of all the written samples."""
+        pass
+
+
+class BufferedSignalEncoder(SignalEncoder):
+    """
+    Encoder that keeps the samples in an int32 buffer and encodes them
+    with its codec once all the chunks are written
+    """
+
+    def __init__(self, codec: SignalCodec):
+        """
+        :param codec: Codec used to encode the samples
+        """
+        self.codec = codec
+        self.chunks = []
+
+    def write(self, chunk: Sequence[int]):
+        """
+        :param chunk: Samples to append
+        """
+        chunk = as_int32(chunk)
+        self.chunks.append(chunk)
+        self.num_samples += chunk.size
+
+    def finish(self) -> bytes:
+        return self.codec.encode(np.concatenate(self.chunks or [as_int32([])]))
+
+
+class StreamingBinaryEncoder(SignalEncoder):
+    """
+    Encoder that writes int32 samples, delta-encodes and compresses them
+    as they arrive, so only the encoded payload is kept in memory
+    """
+
+    def __init__(self, delta: bool, compress: bool, level: int):
+        """
+        :param delta: Store differences between consecutive samples
+        :param compress: Compress the sample block with zlib
+        :param level: zlib compression level
+        """
+        self.delta = delta
+        self.compressor = zlib.compressobj(level) if compress else None
+        self.flags = (FLAG_DELTA if delta else 0) | (FLAG_ZLIB if compress else 0)
+        self.body = bytearray()
+        self.last_sample = 0
+
+    def write(self, chunk: Sequence[int]):
+        """
+        :param chunk: Samples to append
+        """
+        values = as_int32(chunk)
+        if not values.size:
+            return
+
+        if self.delta:
+            # Deltas wrap around in int32, decoding wraps them back
+            deltas = np.diff(values.astype(np.int64), prepend=self.last_sample)
+            self.last_sample = int(values[-1])
+            values = deltas.astype(np.int32)
+
+        block = values.astype(DTYPES[1]).tobytes()
+        if self.compressor is not None:
+            block = self.compressor.compress(block)
+        self.body += block
+        self.num_samples += values.size
+
+    def finish(self) -> bytes:
+        if self.compressor is not None:
+            self.body += self.compressor.flush()
+        return HEADER.pack(MAGIC, 1, self.flags, self.num_samples) + bytes(self.body)
+
+
+class TextSignalCodec(SignalCodec):
+    """
+    Legacy codec that stores signals as comma-separated integers
+    """
+
+    name = "text"
+
+    def encode(self, signal: Sequence[int]) -> bytes:
+        """
+        :param signal: Samples of a lead
+        """
+        return signal_to_string(signal).encode("ascii")
+
+    def decode(self, payload: Union[bytes, str]) -> np.ndarray:
+        """
+        :param payload: Comma-separated string (or its ASCII bytes)
+        """
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            payload = bytes(payload).decode("ascii")
+        return np.asarray(string_to_signal(payload), dtype=np.int32)
+
+
+class BinarySignalCodec(SignalCodec):
+    """
+    Codec that stores signals as fixed-width little-endian integers.
+    The narrowest of int16/int32 that fits the data is used, optionally
+    delta-encoded and zlib-compressed.
+    Windows of plain payloads are read in place, at a cost independent of
+    their position. Delta and zlib payloads have no checkpoints: a window
+    costs as much as decoding every sample before its end.
+    """
+
+    def __init__(self, delta: bool = False, compress: bool = False, level: int = 6):
+        """
+        :param delta: Store differences between consecutive samples
+        :param compress: Compress the sample block with zlib
+        :param level: zlib compression level
+        """
+        self.delta = delta
+        self.compress = compress
+        self.level = level
+        self.name = "-".join(
+            ["binary"] + (["delta"] if delta else []) + (["zlib"] if compress else [])
+        )
+
+    def encode(self, signal: Sequence[int]) -> bytes:
+        """
+        :param signal: Samples of a lead
+        """
+        values = as_int32(signal)
+
+        flags = 0
+        if self.delta:
+            values = np.diff(values.astype(np.int64), prepend=0)
+            flags |= FLAG_DELTA
+
+        dtype_code = 1
+        if not values.size or (values.min() >= INT16.min and values.max() <= INT16.max):
+            dtype_code = 0
+
+        # Deltas that do not fit in int32 wrap around, decoding wraps them back
+        body = values.astype(DTYPES[dtype_code]).tobytes()
+        if self.compress:
+            body = zlib.compress(body, self.level)
+            flags |= FLAG_ZLIB
+
+        return HEADER.pack(MAGIC, dtype_code, flags, values.size) + body
+
+    def encoder(self) -> SignalEncoder:
+        return StreamingBinaryEncoder(self.delta, self.compress, self.level)
+
+    def decode(self, payload: Union[bytes, str]) -> np.ndarray:
+        """
+        :param payload: Binary payload produced by `encode`
+        """
+        payload = memoryview(payload)
+        magic, dtype_code, flags, length = HEADER.unpack_from(payload)
+        if magic != MAGIC or dtype_code not in DTYPES:
+            raise ValueError("Invalid binary signal payload")
+
+        return self.decode_range(payload)
+
+    def decode_range(
+        self, payload: Union[bytes, str], start: int = 0, end: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Only the samples up to `end` are decompressed and, for deltas,
+        accumulated, so the cost grows with `end`. Samples of plain
+        payloads before `start` are skipped without conversion.
+        :param payload: Binary payload produced by `encode`
+        :param start: First sample of the window
+        :param end: Sample after the last one of the window, None for the end
+        """
+        payload = memoryview(payload)
+        magic, dtype_code, flags, length = HEADER.unpack_from(payload)
+        if magic != MAGIC or dtype_code not in DTYPES:
+            raise ValueError("Invalid binary signal payload")
+
+        start, end, _ = slice(start, end).indices(length)
+        if end <= start:
+            return np.empty(0, dtype=np.int32)
+
+        dtype = DTYPES[dtype_code]
+        body = payload[HEADER.size :]
+        if flags & FLAG_ZLIB:
+            body = zlib.decompressobj().decompress(body, end * dtype.itemsize)
+
+        if flags & FLAG_DELTA:
+            values = np.frombuffer(body, dtype=dtype, count=end)
+            return np.cumsum(values, dtype=np.int64)[start:].astype(np.int32)
+
+        values = np.frombuffer(
+            body, dtype=dtype, count=end - start, offset=start * dtype.itemsize
+        )
+        return values.astype(np.int32)
+
+
+class ArchiveSignalCodec(SignalCodec):
+    """
+    Codec that stores the samples in the signal archive, the payload
+    stored in the database only references them. Decoded signals are
+    read-only views of the memory-mapped archive files.
+    """
+
+    name = "archive"
+
+    def __init__(self, archive: Optional[SignalArchive] = None):
+        """
+        :param archive: SignalArchive instance, the one configured with
+        SIGNAL_ARCHIVE_DIR by default
+        """
+        self._archive = archive
+
+    @property
+    def archive(self) -> SignalArchive:
+        # Resolved on use, so the archive directory is only created
+        # by the processes that use the archive
+        return self._archive or get_archive()
+
+    def encode(self, signal: Sequence[int]) -> bytes:
+        """
+        :param signal: Samples of a lead
+        """
+        values = as_int32(signal)
+        day, offset = self.archive.append(values)
+        return ARCHIVE_REFERENCE.pack(ARCHIVE_MAGIC, day, offset, values.size)
+
+    def decode(self, payload: Union[bytes, str]) -> np.ndarray:
+        """
+        :param payload: Archive reference produced by `encode`
+        """
+        return self.decode_range(payload)
+
+    def decode_range(
+        self, payload: Union[bytes, str], start: int = 0, end: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Only the pages of the window are read from the archive
+        :param payload: Archive reference produced by `encode`
+        :param start: First sample of the window
+        :param end: Sample after the last one of the window, None for the end
+        """
+        magic, day, offset, length = ARCHIVE_REFERENCE.unpack_from(payload)
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError("Invalid archive signal payload")
+        return self.archive.read(day, offset, length, start, end)
+
+
+CODECS = {
+    codec.name: codec
+    for codec in (
+        TextSignalCodec(),
+        BinarySignalCodec(),
+        BinarySignalCodec(delta=True, compress=True),
+        ArchiveSignalCodec(),
+    )
+}
+
+
+def get_codec(name: str) -> SignalCodec:
+    """
+    Retrieve a registered codec by name
+    :param name: Codec name (e.g. "binary-delta-zlib")
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown signal codec: {name}") from None
+
+
+def is_legacy_payload(payload: Union[bytes, str]) -> bool:
+    """
+    Check whether a stored payload uses the legacy text format
+    :param payload: Stored `Lead.signal` value
+    """
+    return isinstance(payload, str) or bytes(payload[: len(MAGIC)]) not in (
+        MAGIC,
+        ARCHIVE_MAGIC,
+    )
+
+
+def decode_signal(
+    payload: Union[bytes, str, np.ndarray], start: int = 0, end: Optional[int] = None
+) -> np.ndarray:
+    """
+    Decode any stored payload, binary, archived or legacy text.
+    Signals that are already decoded are returned as they are.
+    :param payload: Stored `Lead.signal` value
+    :param start: First sample to decode
+    :param end: Sample after the last one to decode, None for the end
+    """
+    if isinstance(payload, np.ndarray):
+        return payload if start == 0 and end is None else payload[start:end]
+    if is_legacy_payload(payload):
+        codec = CODECS["text"]
+    elif bytes(payload[: len(ARCHIVE_MAGIC)]) == ARCHIVE_MAGIC:
+        codec = CODECS["archive"]
+    else:
+        codec = CODECS["binary"]
+
+    with STAGE_DURATION.time(stage="decode"):
+        if start == 0 and end is None:
+            return codec.decode(payload)
+        return codec.decode_range(payload, start, end)
@@ -0,0 +1,150 @@
+import time
+from typing import Dict
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from core.config import config
+from core.metrics import STAGE_DURATION
+
+
+# Async drivers of the backends, see async_database_url
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """
+    URL of the same database with the async driver of its backend
+    :param url: Database URL
+    :raises ValueError: if the backend has no known async driver
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for the {backend} backend")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(
+        hide_password=False
+    )
+
+
+def same_database(url: str, other_url: str) -> bool:
+    """
+    Whether two URLs point to the same database, whatever their drivers
+    """
+    urls = [make_url(url), make_url(other_url)]
+    return len({url.set(drivername=url.get_backend_name()) for url in urls}) == 1
+
+
+def is_sqlite_memory(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def engine_options(url: str) -> Dict:
+    """
+    Keyword arguments of `create_engine` for a database URL
+    :param url: Database URL
+    """
+    options = {}
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+
+    # In-memory SQLite databases live in a single connection, not a pool
+    if not is_sqlite_memory(url):
+        options.update(
+            pool_size=config.DATABASE_POOL_SIZE,
+            max_overflow=config.DATABASE_MAX_OVERFLOW,
+            pool_timeout=config.DATABASE_POOL_TIMEOUT,
+            pool_recycle=config.DATABASE_POOL_RECYCLE,
+            pool_pre_ping=config.DATABASE_POOL_PRE_PING,
+        )
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune a new SQLite connection, see the SQLITE_* settings
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA journal_mode = {config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {int(config.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size = {int(config.SQLITE_CACHE_SIZE)}")
+    finally:
+        cursor.close()
+
+
+# The start time is kept on the execution context of the statement, which
+# is discarded with it when the statement fails
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    STAGE_DURATION.observe(time.perf_counter() - context._query_start, stage="db")
+
+
+def observe_queries(engine: Engine):
+    """
+    Observe the duration of every SQL statement as the "db" stage
+    :param engine: Engine, the sync engine of async engines
+    """
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def pool_stats(engine: Engine) -> Dict[str, int]:
+    """
+    Connections of the pool of an engine by state, empty for pools
+    without a fixed size (e.g. in-memory SQLite databases)
+    :param engine: Engine, the sync engine of async engines
+    """
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+def create_database_engine(url: str) -> Engine:
+    """
+    Create an engine with the pool settings and the performance
+    pragmas of its dialect
+    :param url: Database URL
+    """
+    engine = create_engine(url, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    observe_queries(engine)
+    return engine
+
+
+def create_async_database_engine(url: str) -> AsyncEngine:
+    """
+    Async version of `create_database_engine`
+    :param url: Database URL with an async driver
+    """
+    options = engine_options(url)
+    if make_url(url).get_backend_name() == "sqlite":
+        # aiosqlite connections are not bound to a thread
+        options.pop("connect_args")
+        # aiosqlite opens a new connection per session by default, pool
+        # them so the pragmas and the page cache are kept
+        if not is_sqlite_memory(url):
+            options["poolclass"] = AsyncAdaptedQueuePool
+
+    engine = create_async_engine(url, **options)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    observe_queries(engine.sync_engine)
+    return engine
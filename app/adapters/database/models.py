@@ -5,9 +5,13 @@ from sqlalchemy import (
     Integer,
     ForeignKey,
     DateTime,
+    JSON,
+    LargeBinary,
     Enum as SQLEnum,
+    Index,
+    UniqueConstraint,
 )
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import deferred, relationship, declarative_base
 
 
 Base = declarative_base()
@@ -18,6 +22,13 @@ class UserRole(str, Enum):
     USER = "user"
 
 
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -25,6 +36,8 @@ class User(Base):
     username = Column(String, unique=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     role = Column(SQLEnum(UserRole), default=UserRole.USER)
+    # Bumped when the password changes, older refresh tokens are refused
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 class ECG(Base):
@@ -34,17 +47,74 @@ class ECG(Base):
     ecg_id = Column(String, unique=True, nullable=False)
     date = Column(DateTime(timezone=False))
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    leads = relationship("Lead", back_populates="ecg")
+    # Repositories choose how leads are loaded, see LEAD_LOADERS
+    leads = relationship("Lead", back_populates="ecg", order_by="Lead.id")
     user = relationship("User")
 
+    # Lists the ECGs of a user by date, and serves lookups by user ID
+    __table_args__ = (Index("ix_ecgs_user_id_date_id", "user_id", "date", "id"),)
+
 
 class Lead(Base):
     __tablename__ = "leads"
 
     id = Column(Integer, primary_key=True, index=True)
-    ecg_id = Column(String, ForeignKey("ecgs.ecg_id"))
+    ecg_id = Column(String, ForeignKey("ecgs.ecg_id"), index=True)
     name = Column(String)
     num_samples = Column(Integer, nullable=True)
-    signal = Column(String, nullable=False)
+    # Encoded with a signal codec, see adapters/database/codecs.py.
+    # Only loaded when accessed, or when a query undefers it.
+    signal = deferred(Column(LargeBinary, nullable=False))
     zero_crossings = Column(Integer, nullable=True)
     ecg = relationship("ECG", back_populates="leads")
+
+
+class Insight(Base):
+    """
+    Result of an analyzer for an ECG, see services/analyzers.py.
+    Results of an older version of the analyzer are recomputed.
+    """
+
+    __tablename__ = "insights"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ecg_id = Column(String, ForeignKey("ecgs.ecg_id"), nullable=False)
+    analyzer = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+    # NULL when the ECG does not have the leads the analyzer needs
+    value = Column(JSON(none_as_null=True), nullable=True)
+    computed_at = Column(DateTime(timezone=False), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("ecg_id", "analyzer", name="uq_insights_ecg_id_analyzer"),
+    )
+
+
+class InsightJob(Base):
+    __tablename__ = "insight_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ecg_id = Column(String, ForeignKey("ecgs.ecg_id"), nullable=False, index=True)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    # Pending jobs are not run before this date (retry backoff)
+    run_after = Column(DateTime(timezone=False), nullable=False)
+    # Running jobs whose lease expired are considered abandoned
+    lease_until = Column(DateTime(timezone=False), nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=False), nullable=False)
+    updated_at = Column(DateTime(timezone=False), nullable=False)
+
+    __table_args__ = (Index("ix_insight_jobs_status_run_after", "status", "run_after"),)
+
+
+class SchemaVersion(Base):
+    """
+    Migration marker: one row per schema version applied to the database,
+    see adapters/database/schema.py
+    """
+
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(DateTime(timezone=False), nullable=False)
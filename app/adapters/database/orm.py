@@ -1,46 +1,64 @@
-from sqlalchemy import create_engine
+import logging
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy import Engine
 from sqlalchemy.orm import sessionmaker
+from adapters.database.engine import create_database_engine
 from adapters.database.models import UserRole
 from adapters.database.repository import DatabaseUserRepository
 from services.auth_service import AuthService
 from core.config import config
 
-engine = create_engine(config.DATABASE_URL, connect_args={"check_same_thread": False})
+logger = logging.getLogger(__name__)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# The engine is created on first use rather than on import, so importing
+# the app does not connect, and DATABASE_URL can be set until then
+@lru_cache
+def get_engine() -> Engine:
+    return create_database_engine(config.DATABASE_URL)
+
+
+@lru_cache
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 
 
 def get_db():
-    db = SessionLocal()
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
         db.close()
 
 
-def create_admin_user():
+def create_admin_user(
+    username: Optional[str] = None, password: Optional[str] = None
+) -> bool:
     """
-    Create admin user if doesn't exist
+    Create admin user if doesn't exist.
+    Returns whether the user was created.
+    :param username: Username of the admin, ADMIN_USERNAME by default
+    :param password: Password of the admin, ADMIN_PASSWORD by default
     """
+    username = username or config.ADMIN_USERNAME
+    password = password or config.ADMIN_PASSWORD
 
     # Use another session to create user
-    db = SessionLocal()
+    db = get_sessionmaker()()
 
     # Use auth service to create user
     user_repository = DatabaseUserRepository(db)
     auth_service = AuthService(user_repository)
 
     try:
-        admin_username = config.ADMIN_USERNAME
-        admin_password = config.ADMIN_PASSWORD
-
         # Check if admin exists
-        if not auth_service.get_user(admin_username):
-            auth_service.create_user(
-                username=admin_username, password=admin_password, role=UserRole.ADMIN
-            )
-    except Exception as e:
-        print(f"Error creating admin user: {e}")
+        if auth_service.get_user(username):
+            return False
 
+        auth_service.create_user(
+            username=username, password=password, role=UserRole.ADMIN
+        )
+        return True
     finally:
         db.close()
@@ -1,7 +1,201 @@
 from abc import ABC, abstractmethod
-from typing import Optional
-from adapters.database.models import ECG, User
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from adapters.database.models import (
+    ECG,
+    Insight,
+    InsightJob,
+    JobStatus,
+    Lead,
+    User,
+)
+from adapters.database.codecs import (
+    SignalCodec,
+    decode_signal,
+    get_codec,
+    is_legacy_payload,
+)
+from core.config import config
+from core.profiling import profiled
+from sqlalchemy import or_, and_, delete, func, insert, select, tuple_, update
+from sqlalchemy.orm import Session, joinedload, lazyload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+# Strategies to load the leads of an ECG:
+# - "selectin": a second query loads the leads of every ECG of the first one
+# - "joined": leads are loaded in the same query with a LEFT OUTER JOIN
+# - "lazy": leads are loaded when first accessed, one query per ECG
+LEAD_LOADERS = {
+    "selectin": selectinload,
+    "joined": joinedload,
+    "lazy": lazyload,
+}
+
+
+def load_leads(
+    leads_loading: str, with_signals: bool, names: Optional[List[str]] = None
+):
+    """
+    Loader option for the leads of the ECGs of a query
+    :param leads_loading: Strategy to load the leads, see LEAD_LOADERS
+    :param with_signals: Load the deferred signal column with the leads
+    :param names: Only load the leads with these names, None for every lead
+    """
+    leads = ECG.leads if names is None else ECG.leads.and_(Lead.name.in_(names))
+    loader = LEAD_LOADERS[leads_loading](leads)
+    return loader.undefer(Lead.signal) if with_signals else loader
+
+
+def insert_statements(ecgs: List[ECG], chunk_size: int):
+    """
+    Bulk insert statements, with their rows, to save ECGs and their leads
+    :param ecgs: ECG database models
+    :param chunk_size: Maximum number of rows per statement
+    """
+    ecg_rows = [
+        {"ecg_id": ecg.ecg_id, "date": ecg.date, "user_id": ecg.user_id} for ecg in ecgs
+    ]
+    lead_rows = [
+        {
+            "ecg_id": ecg.ecg_id,
+            "name": lead.name,
+            "num_samples": lead.num_samples,
+            "signal": lead.signal,
+            "zero_crossings": lead.zero_crossings,
+        }
+        for ecg in ecgs
+        for lead in ecg.leads
+    ]
+    for model, rows in ((ECG, ecg_rows), (Lead, lead_rows)):
+        for start in range(0, len(rows), chunk_size):
+            yield insert(model), rows[start : start + chunk_size]
+
+
+def insights_rows(ecg: ECG) -> List[Dict]:
+    """
+    Rows to update the insight columns of the leads of an ECG by primary key
+    :param ecg: ECG database model with computed insights
+    """
+    return [
+        {"id": lead.id, "zero_crossings": lead.zero_crossings} for lead in ecg.leads
+    ]
+
+
+def mark_insights_saved(ecg: ECG):
+    """
+    Mark the insight columns of the leads of an ECG as saved before they
+    are bulk updated, otherwise the session flushes the same UPDATE again
+    :param ecg: ECG database model with computed insights
+    """
+    for lead in ecg.leads:
+        set_committed_value(lead, "zero_crossings", lead.zero_crossings)
+
+
+def result_statements(
+    ecg_id: str, results: Dict[str, Tuple[int, Any]], outdated: Sequence[str] = ()
+):
+    """
+    Statements, with their parameters, to store analyzer results of an ECG
+    :param ecg_id: ECG ID (uuid)
+    :param results: Version and result of analyzers, by name
+    :param outdated: Analyzers whose previously stored results are replaced
+    """
+    if outdated:
+        yield delete(Insight).where(
+            Insight.ecg_id == ecg_id, Insight.analyzer.in_(outdated)
+        ), None
+    if results:
+        now = datetime.now()
+        yield insert(Insight), [
+            {
+                "ecg_id": ecg_id,
+                "analyzer": name,
+                "version": version,
+                "value": value,
+                "computed_at": now,
+            }
+            for name, (version, value) in results.items()
+        ]
+
+
+def list_query(
+    user_id: int,
+    limit: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Query of a page of the ECGs of a user, newest first.
+    Pages are seeked by (date, id) on the (user_id, date, id) index instead
+    of skipped with an OFFSET, so every page costs the same.
+    :param user_id: User ID
+    :param limit: Maximum number of ECGs
+    :param after: Date and primary key of the last ECG of the previous page
+    :param date_from: Only list ECGs recorded at or after this date
+    :param date_to: Only list ECGs recorded before this date
+    """
+    query = select(ECG).where(ECG.user_id == user_id)
+    if after is not None:
+        query = query.where(tuple_(ECG.date, ECG.id) < tuple_(*after))
+    if date_from is not None:
+        query = query.where(ECG.date >= date_from)
+    if date_to is not None:
+        query = query.where(ECG.date < date_to)
+    return query.order_by(ECG.date.desc(), ECG.id.desc()).limit(limit)
+
+
+def insight_versions_query(ecg_id: str):
+    """
+    Query of the analyzers and versions of the stored results of an ECG
+    :param ecg_id: ECG ID (uuid)
+    """
+    return select(Insight.analyzer, Insight.version).where(Insight.ecg_id == ecg_id)
+
+
+def insights_query(ecg_id: str):
+    """
+    Query of the owner and the insights of the leads of an ECG
+    :param ecg_id: ECG ID (uuid)
+    """
+    return (
+        select(ECG.user_id, Lead.name, Lead.zero_crossings)
+        .select_from(ECG)
+        .outerjoin(Lead, Lead.ecg_id == ECG.ecg_id)
+        .where(ECG.ecg_id == ecg_id)
+        .order_by(Lead.id)
+    )
+
+
+def insights_from_rows(rows) -> Optional[Dict]:
+    """
+    :param rows: Rows of `insights_query`
+    """
+    if not rows:
+        return None
+
+    return {
+        "user_id": rows[0].user_id,
+        "leads": [
+            {"name": row.name, "zero_crossings": row.zero_crossings}
+            for row in rows
+            if row.name is not None
+        ],
+    }
+
+
+def migrate_legacy_signals(ecg: ECG, codec: SignalCodec) -> bool:
+    """
+    Rewrite comma-separated text signals with a codec.
+    Returns whether any signal was rewritten.
+    :param ecg: ECG database model
+    :param codec: Codec used to encode the signals
+    """
+    legacy_leads = [lead for lead in ecg.leads if is_legacy_payload(lead.signal)]
+    for lead in legacy_leads:
+        lead.signal = codec.encode(decode_signal(lead.signal))
+    return bool(legacy_leads)
 
 
 class ECGRepository(ABC):
@@ -14,7 +208,40 @@ class ECGRepository(ABC):
         pass
 
     @abstractmethod
-    def get(self, uuid: str) -> Optional[ECG]:
+    def save_many(self, ecgs: List[ECG]):
+        pass
+
+    @abstractmethod
+    def save_insights(
+        self,
+        ecg: ECG,
+        results: Optional[Dict[str, Tuple[int, Any]]] = None,
+        outdated: Sequence[str] = (),
+    ):
+        pass
+
+    @abstractmethod
+    def get(self, uuid: str, leads: Optional[List[str]] = None) -> Optional[ECG]:
+        pass
+
+    @abstractmethod
+    def get_insights(self, uuid: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def get_insight_versions(self, uuid: str) -> Dict[str, int]:
+        pass
+
+    @abstractmethod
+    def list_for_user(
+        self,
+        user_id: int,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        with_insights: bool = False,
+    ) -> List[ECG]:
         pass
 
 
@@ -23,24 +250,151 @@ class DatabaseECGRepository(ECGRepository):
     Database implementation of ECG repository
     """
 
-    def __init__(self, db_session: Session):
+    def __init__(
+        self,
+        db_session: Session,
+        codec: Optional[SignalCodec] = None,
+        chunk_size: int = config.BULK_INSERT_CHUNK_SIZE,
+        leads_loading: str = config.LEADS_LOADING,
+    ):
         """
         :param db_session: Database session
+        :param codec: Codec used to re-encode legacy text signals on read
+        :param chunk_size: Maximum number of rows per bulk insert statement
+        :param leads_loading: Strategy to load the leads, see LEAD_LOADERS
         """
+        if leads_loading not in LEAD_LOADERS:
+            raise ValueError(f"Unknown leads loading strategy: {leads_loading}")
+
         self.db_session = db_session
+        self.codec = codec or get_codec(config.SIGNAL_CODEC)
+        self.chunk_size = chunk_size
+        self.leads_loading = leads_loading
 
+    @profiled
     def save(self, ecg: ECG):
         """
+        Save an ECG with bulk insert statements, so the number of
+        statements does not grow with the number of leads
         :param ecg: ECG database model
         """
-        self.db_session.add(ecg)
-        self.db_session.commit()
+        self.save_many([ecg])
+
+    @profiled
+    def save_many(self, ecgs: List[ECG]):
+        """
+        Save ECGs and their leads with bulk insert statements
+        in a single transaction
+        :param ecgs: ECG database models
+        """
+        try:
+            for statement, rows in insert_statements(ecgs, self.chunk_size):
+                self.db_session.execute(statement, rows)
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
+
+    @profiled
+    def save_insights(
+        self,
+        ecg: ECG,
+        results: Optional[Dict[str, Tuple[int, Any]]] = None,
+        outdated: Sequence[str] = (),
+    ):
+        """
+        Update only the insight columns of the leads of an ECG, and store
+        the results of analyzers in a single transaction
+        :param ecg: ECG database model with computed insights
+        :param results: Version and result of analyzers, by name
+        :param outdated: Analyzers whose previously stored results are replaced
+        """
+        ecg_id = ecg.ecg_id
+        try:
+            rows = insights_rows(ecg)
+            if rows:
+                mark_insights_saved(ecg)
+                self.db_session.execute(
+                    update(Lead).execution_options(synchronize_session=False), rows
+                )
+            for statement, params in result_statements(ecg_id, results, outdated):
+                self.db_session.execute(statement, params)
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
 
-    def get(self, ecg_id: str) -> Optional[ECG]:
+    @profiled
+    def get(self, ecg_id: str, leads: Optional[List[str]] = None) -> Optional[ECG]:
         """
         :param ecg_id: ECG ID (uuid)
+        :param leads: Only load the leads with these names, None for every lead
         """
-        return self.db_session.query(ECG).filter(ECG.ecg_id == ecg_id).first()
+        # The leads collection is replaced even if the ECG is already in the
+        # session, a previous query may have loaded another subset
+        ecg = (
+            self.db_session.query(ECG)
+            .options(self._load_leads(with_signals=True, names=leads))
+            .filter(ECG.ecg_id == ecg_id)
+            .execution_options(populate_existing=True)
+            .first()
+        )
+        if ecg is not None:
+            self._migrate_legacy_signals(ecg)
+        return ecg
+
+    @profiled
+    def get_insights(self, ecg_id: str) -> Optional[Dict]:
+        """
+        Retrieve the owner and the insights of the leads of an ECG,
+        without loading the signals
+        :param ecg_id: ECG ID (uuid)
+        """
+        rows = self.db_session.execute(insights_query(ecg_id)).all()
+        return insights_from_rows(rows)
+
+    @profiled
+    def get_insight_versions(self, ecg_id: str) -> Dict[str, int]:
+        """
+        Version of the stored result of every analyzer of an ECG, by name
+        :param ecg_id: ECG ID (uuid)
+        """
+        return dict(self.db_session.execute(insight_versions_query(ecg_id)).all())
+
+    @profiled
+    def list_for_user(
+        self,
+        user_id: int,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        with_insights: bool = False,
+    ) -> List[ECG]:
+        """
+        ECGs of a user, newest first, without their signals
+        :param user_id: User ID
+        :param limit: Maximum number of ECGs
+        :param after: Date and primary key of the last ECG of the previous page
+        :param date_from: Only list ECGs recorded at or after this date
+        :param date_to: Only list ECGs recorded before this date
+        :param with_insights: Load the leads, without their signals
+        """
+        query = list_query(user_id, limit, after, date_from, date_to)
+        if with_insights:
+            query = query.options(self._load_leads(with_signals=False))
+        return list(self.db_session.scalars(query))
+
+    def _load_leads(self, with_signals: bool, names: Optional[List[str]] = None):
+        return load_leads(self.leads_loading, with_signals, names)
+
+    def _migrate_legacy_signals(self, ecg: ECG):
+        """
+        Rewrite comma-separated text signals with the configured codec
+        :param ecg: ECG database model
+        """
+        if migrate_legacy_signals(ecg, self.codec):
+            self.db_session.commit()
 
 
 class UserRepository(ABC):
@@ -81,3 +435,301 @@ class DatabaseUserRepository(UserRepository):
         :param username: Username
         """
         return self.db_session.query(User).filter(User.username == username).first()
+
+
+class JobRepository(ABC):
+    """
+    Abstract class for the insight job queue repository
+    """
+
+    @abstractmethod
+    def enqueue(self, ecg_ids: List[str]):
+        pass
+
+    @abstractmethod
+    def claim(self, batch_size: int, lease_seconds: int) -> List[InsightJob]:
+        pass
+
+    @abstractmethod
+    def complete(self, job: InsightJob):
+        pass
+
+    @abstractmethod
+    def fail(self, job: InsightJob, error: str, retry_at: Optional[datetime]):
+        pass
+
+    @abstractmethod
+    def enqueue_missing_insights(self, versions: Dict[str, int]) -> int:
+        pass
+
+    @abstractmethod
+    def count_active(self) -> int:
+        pass
+
+
+class DatabaseJobRepository(JobRepository):
+    """
+    Database implementation of the insight job queue repository
+    """
+
+    def __init__(self, db_session: Session):
+        """
+        :param db_session: Database session
+        """
+        self.db_session = db_session
+
+    def enqueue(self, ecg_ids: List[str]):
+        """
+        :param ecg_ids: IDs of the ECGs whose insights must be computed
+        """
+        now = datetime.now()
+        self.db_session.add_all(
+            InsightJob(
+                ecg_id=ecg_id,
+                status=JobStatus.PENDING,
+                attempts=0,
+                run_after=now,
+                created_at=now,
+                updated_at=now,
+            )
+            for ecg_id in ecg_ids
+        )
+        self.db_session.commit()
+
+    def claim(self, batch_size: int, lease_seconds: int) -> List[InsightJob]:
+        """
+        Claim pending jobs, and running jobs whose lease expired.
+        Every job is claimed with a conditional update, so concurrent
+        workers never claim the same job.
+        :param batch_size: Maximum number of jobs to claim
+        :param lease_seconds: Time after which a claimed job is abandoned
+        """
+        now = datetime.now()
+        claimable = or_(
+            and_(InsightJob.status == JobStatus.PENDING, InsightJob.run_after <= now),
+            and_(InsightJob.status == JobStatus.RUNNING, InsightJob.lease_until < now),
+        )
+        candidate_ids = [
+            job_id
+            for (job_id,) in self.db_session.query(InsightJob.id)
+            .filter(claimable)
+            .order_by(InsightJob.run_after)
+            .limit(batch_size)
+        ]
+
+        claimed_ids = []
+        for job_id in candidate_ids:
+            result = self.db_session.execute(
+                update(InsightJob)
+                .where(InsightJob.id == job_id, claimable)
+                .values(
+                    status=JobStatus.RUNNING,
+                    attempts=InsightJob.attempts + 1,
+                    lease_until=now + timedelta(seconds=lease_seconds),
+                    updated_at=now,
+                )
+            )
+            if result.rowcount:
+                claimed_ids.append(job_id)
+        self.db_session.commit()
+
+        if not claimed_ids:
+            return []
+        return (
+            self.db_session.query(InsightJob)
+            .filter(InsightJob.id.in_(claimed_ids))
+            .all()
+        )
+
+    def complete(self, job: InsightJob):
+        """
+        :param job: Claimed job
+        """
+        job.status = JobStatus.DONE
+        job.lease_until = None
+        job.last_error = None
+        job.updated_at = datetime.now()
+        self.db_session.commit()
+
+    def fail(self, job: InsightJob, error: str, retry_at: Optional[datetime]):
+        """
+        :param job: Claimed job
+        :param error: Error message
+        :param retry_at: Date of the next attempt, or None to give up
+        """
+        job.status = JobStatus.FAILED if retry_at is None else JobStatus.PENDING
+        job.run_after = retry_at or job.run_after
+        job.lease_until = None
+        job.last_error = error
+        job.updated_at = datetime.now()
+        self.db_session.commit()
+
+    def enqueue_missing_insights(self, versions: Dict[str, int]) -> int:
+        """
+        Enqueue the ECGs without an up-to-date result for every analyzer
+        and no pending or running job, e.g. because their job was lost or
+        an analyzer was added or upgraded.
+        Returns the number of enqueued ECGs.
+        :param versions: Current version of every analyzer, by name
+        """
+        if not versions:
+            return 0
+
+        active_jobs = select(InsightJob.ecg_id).where(
+            InsightJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING])
+        )
+        up_to_date = (
+            select(Insight.ecg_id)
+            .where(
+                or_(
+                    *(
+                        and_(Insight.analyzer == name, Insight.version == version)
+                        for name, version in versions.items()
+                    )
+                )
+            )
+            .group_by(Insight.ecg_id)
+            .having(func.count() == len(versions))
+        )
+        ecg_ids = list(
+            self.db_session.scalars(
+                select(ECG.ecg_id).where(
+                    ECG.ecg_id.not_in(up_to_date), ECG.ecg_id.not_in(active_jobs)
+                )
+            )
+        )
+        if ecg_ids:
+            self.enqueue(ecg_ids)
+        return len(ecg_ids)
+
+    def count_active(self) -> int:
+        """
+        Number of pending or running jobs
+        """
+        return self.db_session.scalar(
+            select(func.count()).where(
+                InsightJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING])
+            )
+        )
+
+
+class BackfillRepository(ABC):
+    """
+    Abstract class for the repository used to recompute the insights
+    of every ECG, see adapters/tasks/backfill.py
+    """
+
+    @abstractmethod
+    def scan(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        pass
+
+    @abstractmethod
+    def get_insight_versions_many(self, ecg_ids: List[str]) -> Dict[str, Dict]:
+        pass
+
+    @abstractmethod
+    def get_signals(self, ecg_ids: List[str], leads: Optional[Sequence[str]] = None):
+        pass
+
+    @abstractmethod
+    def save_insights_many(
+        self, lead_rows: List[Dict], results: Dict[str, Dict[str, Tuple[int, Any]]]
+    ):
+        pass
+
+
+class DatabaseBackfillRepository(BackfillRepository):
+    """
+    Database implementation of the backfill repository.
+    Reads select plain columns instead of models, and every write is a
+    single short transaction, so the API keeps serving requests.
+    """
+
+    def __init__(self, db_session: Session):
+        """
+        :param db_session: Database session
+        """
+        self.db_session = db_session
+
+    def scan(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        """
+        Next page of ECGs by primary key, without an OFFSET
+        :param after_id: Primary key of the last ECG of the previous page
+        :param limit: Maximum number of ECGs
+        """
+        rows = self.db_session.execute(
+            select(ECG.id, ECG.ecg_id)
+            .where(ECG.id > after_id)
+            .order_by(ECG.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in rows]
+
+    def get_insight_versions_many(self, ecg_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Version of the stored result of every analyzer, by ECG ID and name
+        :param ecg_ids: ECG IDs (uuid)
+        """
+        versions = {ecg_id: {} for ecg_id in ecg_ids}
+        rows = self.db_session.execute(
+            select(Insight.ecg_id, Insight.analyzer, Insight.version).where(
+                Insight.ecg_id.in_(ecg_ids)
+            )
+        )
+        for ecg_id, analyzer, version in rows:
+            versions[ecg_id][analyzer] = version
+        return versions
+
+    def get_signals(self, ecg_ids: List[str], leads: Optional[Sequence[str]] = None):
+        """
+        Primary key, ECG ID, name and stored signal of the leads of ECGs
+        :param ecg_ids: ECG IDs (uuid)
+        :param leads: Only return the leads with these names, None for every lead
+        """
+        query = select(Lead.id, Lead.ecg_id, Lead.name, Lead.signal).where(
+            Lead.ecg_id.in_(ecg_ids)
+        )
+        if leads is not None:
+            query = query.where(Lead.name.in_(leads))
+        return self.db_session.execute(query.order_by(Lead.id)).all()
+
+    def save_insights_many(
+        self, lead_rows: List[Dict], results: Dict[str, Dict[str, Tuple[int, Any]]]
+    ):
+        """
+        Store the insights of many ECGs in a single transaction.
+        Stored results of the same analyzers are replaced, even if they were
+        computed concurrently by the API since they were read.
+        :param lead_rows: Rows to update the insight columns of leads by
+        primary key, see insights_rows
+        :param results: Version and result of analyzers, by ECG ID and name
+        """
+        keys = [(ecg_id, name) for ecg_id, named in results.items() for name in named]
+        now = datetime.now()
+        try:
+            if lead_rows:
+                self.db_session.execute(update(Lead), lead_rows)
+            if keys:
+                self.db_session.execute(
+                    delete(Insight).where(
+                        tuple_(Insight.ecg_id, Insight.analyzer).in_(keys)
+                    )
+                )
+                self.db_session.execute(
+                    insert(Insight),
+                    [
+                        {
+                            "ecg_id": ecg_id,
+                            "analyzer": name,
+                            "version": version,
+                            "value": value,
+                            "computed_at": now,
+                        }
+                        for ecg_id, named in results.items()
+                        for name, (version, value) in named.items()
+                    ],
+                )
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
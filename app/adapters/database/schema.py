@@ -0,0 +1,111 @@
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from sqlalchemy import Connection, Engine, func, inspect, insert, select, text
+from adapters.database.models import Base, SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+# Key of the PostgreSQL advisory lock held while migrating
+MIGRATION_LOCK_KEY = 0x45434753
+
+
+def create_tables(connection: Connection):
+    """
+    Create the missing tables, and the missing indexes of existing tables,
+    which create_all skips.
+    """
+    Base.metadata.create_all(bind=connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+def add_token_version(connection: Connection):
+    """
+    Add the token version of the users, which create_all does not add to
+    existing tables
+    """
+    columns = {column["name"] for column in inspect(connection).get_columns("users")}
+    if "token_version" not in columns:
+        connection.execute(
+            text(
+                "ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"
+            )
+        )
+
+
+# Migrations by the version they bring the schema to, run in order.
+# Every migration must be idempotent: databases created before the
+# marker existed are migrated from scratch.
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {
+    1: create_tables,
+    2: add_token_version,
+}
+
+SCHEMA_VERSION = max(MIGRATIONS)
+
+
+def schema_version(connection: Connection) -> Optional[int]:
+    """
+    Version of the schema of a database, None if it has no marker
+    :param connection: Database connection
+    """
+    if not inspect(connection).has_table(SchemaVersion.__tablename__):
+        return None
+    return connection.scalar(select(func.max(SchemaVersion.version)))
+
+
+@contextmanager
+def migration_lock(engine: Engine):
+    """
+    Transaction holding a lock that serializes the migrations of the
+    workers booting at the same time. SQLite takes its write lock upfront,
+    other workers wait up to SQLITE_BUSY_TIMEOUT_MS.
+    :param engine: Database engine
+    """
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as connection:
+            if engine.dialect.name == "postgresql":
+                connection.execute(
+                    text("SELECT pg_advisory_xact_lock(:key)"),
+                    {"key": MIGRATION_LOCK_KEY},
+                )
+            yield connection
+        return
+
+    # pysqlite does not start transactions before DDL statements,
+    # the transaction is managed by hand in autocommit mode
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        connection.exec_driver_sql("COMMIT")
+
+
+def ensure_schema(engine: Engine) -> bool:
+    """
+    Bring the schema of a database to SCHEMA_VERSION. Once it is, only
+    the marker is read. Safe to run from several processes at once.
+    Returns whether migrations were run.
+    :param engine: Database engine
+    """
+    with engine.connect() as connection:
+        if (schema_version(connection) or 0) >= SCHEMA_VERSION:
+            return False
+
+    with migration_lock(engine) as connection:
+        # Another process may have migrated while waiting for the lock
+        current = schema_version(connection) or 0
+        pending = [version for version in sorted(MIGRATIONS) if version > current]
+        for version in pending:
+            logger.info("Migrating the database schema to version %s", version)
+            MIGRATIONS[version](connection)
+            connection.execute(
+                insert(SchemaVersion).values(version=version, applied_at=datetime.now())
+            )
+    return bool(pending)
@@ -14,4 +14,7 @@ def string_to_signal(signal_str: str) -> List[int]:
     Convert a comma-separated string to a list of integers
     :param signal_str: Comma-separated string representing the signal of a lead
     """
+    # An empty signal is stored as an empty string, not as one empty sample
+    if not signal_str:
+        return []
     return list(map(int, signal_str.split(",")))
@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, sessionmaker
+from adapters.database.codecs import decode_signal
+from adapters.database.engine import create_database_engine
+from adapters.database.repository import BackfillRepository, DatabaseBackfillRepository
+from core.config import config
+from services.analyzers import (
+    ZeroCrossingsAnalyzer,
+    analyzer_versions,
+    pending_analyzers,
+    required_leads,
+    run_analyzers,
+)
+
+logger = logging.getLogger(__name__)
+
+# Session factory of a backfill worker process, see init_backfill_worker
+_session_factory: Optional[Callable[[], Session]] = None
+
+
+def analyze_ecgs(
+    repository: BackfillRepository, ecg_ids: List[str], force: bool = False
+) -> Tuple[List[Dict], Dict[str, Dict], int]:
+    """
+    Run the pending analyzers of a chunk of ECGs, without writing anything.
+    The signals of the chunk are read with a single query and decoded once.
+    Returns the rows to update the leads, the results by ECG ID and the
+    number of analyzed samples.
+    :param repository: BackfillRepository instance
+    :param ecg_ids: ECG IDs (uuid)
+    :param force: Run every analyzer, even if its result is up to date
+    """
+    stored = repository.get_insight_versions_many(ecg_ids)
+    pending = {
+        ecg_id: pending_analyzers({} if force else stored[ecg_id]) for ecg_id in ecg_ids
+    }
+    pending = {ecg_id: analyzers for ecg_id, analyzers in pending.items() if analyzers}
+    if not pending:
+        return [], {}, 0
+
+    analyzers = {a.name: a for named in pending.values() for a in named}.values()
+    # Aligned lists in lead order, lead names are not unique
+    signals = {ecg_id: [] for ecg_id in pending}
+    lead_ids = {ecg_id: [] for ecg_id in pending}
+    for lead_id, ecg_id, name, payload in repository.get_signals(
+        list(pending), required_leads(analyzers)
+    ):
+        signals[ecg_id].append((name, decode_signal(payload)))
+        lead_ids[ecg_id].append(lead_id)
+
+    lead_rows = []
+    results = {}
+    samples = 0
+    for ecg_id, ecg_analyzers in pending.items():
+        results[ecg_id] = run_analyzers(ecg_analyzers, signals[ecg_id])
+        samples += sum(signal.size for _, signal in signals[ecg_id])
+
+        # Keep the `Lead.zero_crossings` column read by the API up to date
+        _, crossings = results[ecg_id].get(ZeroCrossingsAnalyzer.name, (None, None))
+        for lead_id, count in zip(lead_ids[ecg_id], crossings or []):
+            lead_rows.append({"id": lead_id, "zero_crossings": count})
+    return lead_rows, results, samples
+
+
+def init_backfill_worker(database_url: str):
+    """
+    Initialize a backfill worker process with its own engine.
+    Connections inherited from the parent process must not be reused.
+    :param database_url: Database URL
+    """
+    global _session_factory
+    _session_factory = sessionmaker(bind=create_database_engine(database_url))
+
+
+def analyze_chunk(ecg_ids: List[str], force: bool = False):
+    """
+    Run `analyze_ecgs` in a backfill worker process.
+    Only ECG IDs and results cross the process boundary.
+    :param ecg_ids: ECG IDs (uuid)
+    :param force: Run every analyzer, even if its result is up to date
+    """
+    db = _session_factory()
+    try:
+        return analyze_ecgs(DatabaseBackfillRepository(db), ecg_ids, force)
+    finally:
+        db.close()
+
+
+class InsightBackfill:
+    """
+    Recompute the insights of every ECG, e.g. after an analyzer was added
+    or upgraded, or jobs were lost.
+
+    ECGs are scanned in chunks by primary key, and every chunk is analyzed
+    by a pool of worker processes. Results are written by this process in
+    one transaction per chunk, in scan order, and the last written primary
+    key is saved to a checkpoint file, so an interrupted backfill resumes
+    where it stopped.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        database_url: str = config.DATABASE_URL,
+        chunk_size: int = config.BACKFILL_CHUNK_SIZE,
+        processes: int = config.BACKFILL_PROCESSES,
+        checkpoint_path: Optional[str] = config.BACKFILL_CHECKPOINT_PATH,
+        force: bool = False,
+    ):
+        """
+        :param session_factory: Callable returning a new database session
+        :param database_url: Database URL the worker processes connect to
+        :param chunk_size: Number of ECGs per chunk
+        :param processes: Number of worker processes, 1 to analyze the
+        chunks in this process
+        :param checkpoint_path: File to save progress to, None to disable
+        :param force: Run every analyzer, even if its result is up to date
+        """
+        self.session_factory = session_factory
+        self.database_url = database_url
+        self.chunk_size = chunk_size
+        self.processes = processes
+        self.checkpoint_path = checkpoint_path
+        self.force = force
+        self.scanned = 0
+        self.analyzed = 0
+        self.samples = 0
+        self.elapsed_seconds = 0.0
+
+    def run(self, restart: bool = False) -> Dict:
+        """
+        Returns the stats of the run
+        :param restart: Ignore the checkpoint and scan every ECG
+        """
+        after_id = 0 if restart else self._load_checkpoint()
+        executor = None
+        if self.processes > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=init_backfill_worker,
+                initargs=(self.database_url,),
+            )
+
+        db = self.session_factory()
+        repository = DatabaseBackfillRepository(db)
+        # Chunks being analyzed, with the primary key of their last ECG
+        in_flight: "deque[Tuple[int, int, Future]]" = deque()
+        started_at = time.perf_counter()
+        try:
+            scanned_all = False
+            while True:
+                # Keep every worker busy while the results are written
+                while not scanned_all and len(in_flight) < 2 * self.processes:
+                    chunk = repository.scan(after_id, self.chunk_size)
+                    if not chunk:
+                        scanned_all = True
+                        break
+                    after_id = chunk[-1][0]
+                    ecg_ids = [ecg_id for _, ecg_id in chunk]
+                    in_flight.append(
+                        (after_id, len(ecg_ids), self._submit(executor, db, ecg_ids))
+                    )
+                    # End the read transaction, so the WAL can be checkpointed
+                    db.rollback()
+
+                if not in_flight:
+                    break
+
+                last_id, count, future = in_flight.popleft()
+                lead_rows, results, samples = future.result()
+                repository.save_insights_many(lead_rows, results)
+                self._save_checkpoint(last_id)
+
+                self.scanned += count
+                self.analyzed += len(results)
+                self.samples += samples
+                self.elapsed_seconds = time.perf_counter() - started_at
+                logger.info("Backfilled up to ECG %d: %s", last_id, self.stats())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            db.close()
+            self.elapsed_seconds = time.perf_counter() - started_at
+
+        return self.stats()
+
+    def stats(self) -> Dict:
+        elapsed = self.elapsed_seconds or float("inf")
+        return {
+            "scanned": self.scanned,
+            "analyzed": self.analyzed,
+            "samples": self.samples,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "ecgs_per_second": round(self.scanned / elapsed, 1),
+            "samples_per_second": round(self.samples / elapsed, 1),
+        }
+
+    def _submit(self, executor, db: Session, ecg_ids: List[str]) -> Future:
+        if executor is not None:
+            return executor.submit(analyze_chunk, ecg_ids, self.force)
+
+        future = Future()
+        future.set_result(
+            analyze_ecgs(DatabaseBackfillRepository(db), ecg_ids, self.force)
+        )
+        return future
+
+    def _load_checkpoint(self) -> int:
+        """
+        Primary key of the last backfilled ECG, 0 to start from the first
+        one. Checkpoints of other analyzer versions are ignored: their
+        backfill did not compute the current results.
+        """
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return 0
+
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("versions") != analyzer_versions() or (
+            self.force and not checkpoint.get("force")
+        ):
+            logger.info("Ignoring checkpoint of other analyzers or options")
+            return 0
+
+        logger.info("Resuming after ECG %d", checkpoint["last_id"])
+        return checkpoint["last_id"]
+
+    def _save_checkpoint(self, last_id: int):
+        if self.checkpoint_path is None:
+            return
+
+        # Replace the file atomically, a crash never leaves a partial checkpoint
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(
+                {
+                    "last_id": last_id,
+                    "versions": analyzer_versions(),
+                    "force": self.force,
+                },
+                f,
+            )
+        os.replace(temporary_path, self.checkpoint_path)
@@ -0,0 +1,32 @@
+from typing import Dict
+from adapters.database.orm import get_sessionmaker
+from adapters.database.repository import DatabaseECGRepository
+from adapters.tasks.tasks import SynchronousBackgroundTask
+from core.config import config
+from services.ecg_service import ECGService
+
+
+def init_worker(settings: Dict):
+    """
+    Initialize a spawned worker process. Its modules are imported again,
+    so the settings of the parent process, which may have been changed
+    after they were read from the environment, are applied before the
+    worker creates its own engine on first use.
+    :param settings: Settings of the parent process
+    """
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+
+def compute_insights_job(ecg_id: str) -> None:
+    """
+    Compute the insights of an ECG in its own database session.
+    Only the ECG ID crosses the process boundary.
+    :param ecg_id: ECG ID (uuid)
+    """
+    db = get_sessionmaker()()
+    try:
+        ecg_service = ECGService(DatabaseECGRepository(db), SynchronousBackgroundTask())
+        ecg_service.compute_insights(ecg_id)
+    finally:
+        db.close()
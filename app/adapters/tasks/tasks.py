@@ -1,4 +1,71 @@
+import inspect
+import logging
+import multiprocessing
+import threading
+import time
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import wraps
+from typing import Callable, Iterator, Optional, Tuple
+from core.metrics import Gauge, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+TASK_DURATION = registry.register(
+    Histogram(
+        "background_task_duration_seconds",
+        "Duration of background tasks, from submission to completion for "
+        "the process backend",
+        ["backend"],
+    )
+)
+QUEUE_DEPTH = registry.register(
+    Gauge(
+        "background_queue_depth",
+        "Background tasks submitted and not completed yet",
+        ["backend"],
+    )
+)
+
+
+def observed_task(task_func: Callable, backend: str) -> Callable:
+    """
+    Wrap a task to count it in the queue depth until it completes,
+    and observe the duration of its run
+    :param task_func: Task function
+    :param backend: Name of the background task backend
+    """
+    QUEUE_DEPTH.inc(backend=backend)
+
+    # Coroutine functions stay coroutine functions, so they are awaited
+    if inspect.iscoroutinefunction(task_func):
+
+        @wraps(task_func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                with TASK_DURATION.time(backend=backend):
+                    return await task_func(*args, **kwargs)
+            finally:
+                QUEUE_DEPTH.dec(backend=backend)
+
+        return async_wrapper
+
+    @wraps(task_func)
+    def wrapper(*args, **kwargs):
+        try:
+            with TASK_DURATION.time(backend=backend):
+                return task_func(*args, **kwargs)
+        finally:
+            QUEUE_DEPTH.dec(backend=backend)
+
+    return wrapper
+
+
+class BackgroundTaskQueueFull(Exception):
+    """
+    Raised when a background task backend can not accept more tasks
+    """
 
 
 class AbstractBackgroundTask(ABC):
@@ -12,3 +79,199 @@ class AbstractBackgroundTask(ABC):
     def add_task(self, task_func, *args, **kwargs):
         """Add a task to the background processing system."""
         pass
+
+    def add_tasks(self, task_func, args_list):
+        """Add a task per argument tuple to the background processing system."""
+        for args in args_list:
+            self.add_task(task_func, *args)
+
+    def can_accept(self, count: int = 1) -> bool:
+        """Check whether the background processing system accepts new tasks."""
+        return True
+
+    @contextmanager
+    def reserve(self, count: int = 1) -> Iterator["AbstractBackgroundTask"]:
+        """
+        Reserve room for tasks before doing the work they depend on, e.g.
+        storing an ECG before scheduling its insights. The tasks are added
+        through the yielded backend, room left unused is released on exit.
+        :param count: Number of tasks
+        :raises BackgroundTaskQueueFull: if the tasks can not be accepted
+        """
+        if not self.can_accept(count):
+            raise BackgroundTaskQueueFull("Background task queue is full")
+        yield self
+
+
+class FastAPIBackgroundTask(AbstractBackgroundTask):
+    """
+    Background task backend that runs tasks with FastAPI background tasks,
+    in the process serving the request once the response is sent
+    """
+
+    def __init__(self, background_tasks):
+        """
+        :param background_tasks: FastAPI BackgroundTasks of the request
+        """
+        self.background_tasks = background_tasks
+
+    def add_task(self, task_func, *args, **kwargs):
+        self.background_tasks.add_task(
+            observed_task(task_func, "fastapi"), *args, **kwargs
+        )
+
+
+class SynchronousBackgroundTask(AbstractBackgroundTask):
+    """
+    Background task backend that runs tasks immediately in the caller.
+    Useful for code that already runs outside the web workers.
+    """
+
+    def add_task(self, task_func, *args, **kwargs):
+        return observed_task(task_func, "synchronous")(*args, **kwargs)
+
+
+class ProcessPoolBackgroundTask(AbstractBackgroundTask):
+    """
+    Background task backend that runs tasks in a pool of worker processes,
+    so CPU-bound work does not compete with the processes serving requests.
+    Tasks and their arguments must be picklable: pass identifiers, never
+    database sessions or models.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue_size: int,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+    ):
+        """
+        :param max_workers: Number of worker processes
+        :param max_queue_size: Maximum number of pending or running tasks,
+        new tasks are rejected once it is reached
+        :param initializer: Callable run once in every worker process
+        :param initargs: Arguments of the initializer, must be picklable
+        """
+        self.max_queue_size = max_queue_size
+        self.queue_depth = 0
+        self._lock = threading.Lock()
+        # Workers are spawned, never forked: a fork would copy the locks,
+        # threads and open connections of the serving process
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+    def add_task(self, task_func, *args, **kwargs) -> Future:
+        """
+        :raises BackgroundTaskQueueFull: if the queue is full
+        """
+        self._acquire(1)
+        return self._submit(task_func, *args, **kwargs)
+
+    def can_accept(self, count: int = 1) -> bool:
+        return self.queue_depth + count <= self.max_queue_size
+
+    @contextmanager
+    def reserve(self, count: int = 1) -> Iterator["ReservedBackgroundTask"]:
+        """
+        Slots are taken from the queue upfront, so concurrent requests
+        can not fill it between the check and the submission of the tasks
+        :param count: Number of tasks
+        :raises BackgroundTaskQueueFull: if the queue can not hold them
+        """
+        self._acquire(count)
+        reserved = ReservedBackgroundTask(self, count)
+        try:
+            yield reserved
+        finally:
+            if reserved.remaining:
+                self._release(reserved.remaining)
+
+    def shutdown(self, wait: bool = True):
+        """
+        :param wait: Wait for pending tasks to finish
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _acquire(self, count: int):
+        with self._lock:
+            if self.queue_depth + count > self.max_queue_size:
+                raise BackgroundTaskQueueFull("Background task queue is full")
+            self.queue_depth += count
+            QUEUE_DEPTH.set(self.queue_depth, backend="process")
+
+    def _release(self, count: int = 1):
+        with self._lock:
+            self.queue_depth -= count
+            QUEUE_DEPTH.set(self.queue_depth, backend="process")
+
+    def _submit(self, task_func, *args, **kwargs) -> Future:
+        """
+        Submit a task to the pool, its slot of the queue is already taken
+        """
+        submitted_at = time.perf_counter()
+        try:
+            future = self._executor.submit(task_func, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+
+        # Tasks run in other processes, their duration is measured here
+        future.add_done_callback(
+            lambda future: TASK_DURATION.observe(
+                time.perf_counter() - submitted_at, backend="process"
+            )
+        )
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, future: Future):
+        self._release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Background task failed", exc_info=future.exception())
+
+
+class ReservedBackgroundTask(AbstractBackgroundTask):
+    """
+    Tasks added to a process pool in slots reserved by
+    ProcessPoolBackgroundTask.reserve. Tasks beyond the reservation
+    take a new slot.
+    """
+
+    def __init__(self, pool: ProcessPoolBackgroundTask, count: int):
+        """
+        :param pool: Process pool backend the slots are reserved in
+        :param count: Number of reserved slots
+        """
+        self.pool = pool
+        self.remaining = count
+
+    def add_task(self, task_func, *args, **kwargs) -> Future:
+        if not self.remaining:
+            return self.pool.add_task(task_func, *args, **kwargs)
+        self.remaining -= 1
+        return self.pool._submit(task_func, *args, **kwargs)
+
+
+class QueueBackgroundTask(AbstractBackgroundTask):
+    """
+    Background task backend that records insight jobs in a durable queue.
+    Only the ECG ID is stored: the jobs are run by the insight worker
+    (see worker.py), which always computes the insights of the ECG.
+    """
+
+    def __init__(self, job_repository):
+        """
+        :param job_repository: JobRepository instance to store the jobs
+        """
+        self.job_repository = job_repository
+
+    def add_task(self, task_func, ecg_id: str):
+        self.job_repository.enqueue([ecg_id])
+
+    def add_tasks(self, task_func, args_list):
+        self.job_repository.enqueue([ecg_id for (ecg_id,) in args_list])
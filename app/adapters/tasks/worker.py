@@ -0,0 +1,102 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+from sqlalchemy.orm import Session
+from adapters.database.repository import DatabaseECGRepository, DatabaseJobRepository
+from adapters.tasks.tasks import SynchronousBackgroundTask
+from core.config import config
+from services.analyzers import analyzer_versions
+from services.ecg_service import ECGService
+
+logger = logging.getLogger(__name__)
+
+
+class InsightWorker:
+    """
+    Worker that drains the insight job queue in batches.
+    Failed jobs are retried with exponential backoff until
+    `max_attempts` is reached.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = config.JOB_BATCH_SIZE,
+        lease_seconds: int = config.JOB_LEASE_SECONDS,
+        max_attempts: int = config.JOB_MAX_ATTEMPTS,
+        retry_backoff_seconds: float = config.JOB_RETRY_BACKOFF_SECONDS,
+    ):
+        """
+        :param session_factory: Callable returning a new database session
+        :param batch_size: Maximum number of jobs claimed at once
+        :param lease_seconds: Time after which a claimed job is run again
+        :param max_attempts: Attempts before a job is marked as failed
+        :param retry_backoff_seconds: Delay before the first retry, doubled
+        on every attempt
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+    def recover(self) -> int:
+        """
+        Enqueue the ECGs whose insights are missing or outdated.
+        Returns the number of enqueued ECGs.
+        """
+        db = self.session_factory()
+        try:
+            return DatabaseJobRepository(db).enqueue_missing_insights(
+                analyzer_versions()
+            )
+        finally:
+            db.close()
+
+    def run_batch(self) -> int:
+        """
+        Claim and run a batch of jobs.
+        Returns the number of claimed jobs.
+        """
+        db = self.session_factory()
+        try:
+            job_repository = DatabaseJobRepository(db)
+            ecg_service = ECGService(
+                DatabaseECGRepository(db), SynchronousBackgroundTask()
+            )
+
+            jobs = job_repository.claim(self.batch_size, self.lease_seconds)
+            for job in jobs:
+                try:
+                    ecg_service.compute_insights(job.ecg_id)
+                except Exception as e:
+                    logger.exception("Insight job %s failed", job.id)
+                    db.rollback()
+                    job_repository.fail(job, str(e), self._retry_at(job.attempts))
+                else:
+                    job_repository.complete(job)
+            return len(jobs)
+        finally:
+            db.close()
+
+    def run(self, poll_interval: float = config.JOB_POLL_INTERVAL, once=False):
+        """
+        Recover lost jobs and drain the queue
+        :param poll_interval: Seconds to wait when the queue is empty
+        :param once: Stop when the queue is empty
+        """
+        logger.info("Enqueued %d ECGs with missing insights", self.recover())
+
+        while True:
+            if self.run_batch():
+                continue
+            if once:
+                return
+            time.sleep(poll_interval)
+
+    def _retry_at(self, attempts: int):
+        if attempts >= self.max_attempts:
+            return None
+        delay = self.retry_backoff_seconds * 2 ** (attempts - 1)
+        return datetime.now() + timedelta(seconds=delay)
@@ -0,0 +1,41 @@
+import argparse
+import json
+import logging
+from adapters.database.orm import get_engine, get_sessionmaker
+from adapters.database.schema import ensure_schema
+from adapters.tasks.backfill import InsightBackfill
+from core.config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute the missing or outdated insights of every ECG"
+    )
+    parser.add_argument("--chunk-size", type=int, default=config.BACKFILL_CHUNK_SIZE)
+    parser.add_argument("--processes", type=int, default=config.BACKFILL_PROCESSES)
+    parser.add_argument(
+        "--checkpoint", default=config.BACKFILL_CHECKPOINT_PATH, help="Progress file"
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recompute every insight, even if it is up to date",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ensure_schema(get_engine())
+
+    backfill = InsightBackfill(
+        get_sessionmaker(),
+        chunk_size=args.chunk_size,
+        processes=args.processes,
+        checkpoint_path=args.checkpoint,
+        force=args.force,
+    )
+    print(json.dumps(backfill.run(restart=args.restart)))
+
+
+if __name__ == "__main__":
+    main()
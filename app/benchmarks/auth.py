@@ -0,0 +1,81 @@
+"""
+Throughput of authenticated `GET /ecg/{ecg_id}` requests with and
+without the verified credentials cache.
+
+Run from the `app` directory:
+
+    python -m benchmarks.auth
+"""
+
+import secrets
+import tempfile
+import time
+from base64 import b64encode
+from core.config import config
+
+# The engine is created on first use, point it to a throwaway database first
+config.DATABASE_URL = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+config.AUTH_SECRET_KEY = config.AUTH_SECRET_KEY or secrets.token_urlsafe(32)
+
+from fastapi import Depends  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from main import app  # noqa: E402
+from adapters.api.dependencies import get_auth_service  # noqa: E402
+from adapters.database.orm import get_db, get_engine  # noqa: E402
+from adapters.database.repository import DatabaseUserRepository  # noqa: E402
+from adapters.database.schema import ensure_schema  # noqa: E402
+from services.auth_service import AuthService, credential_cache  # noqa: E402
+
+USERNAME = "bench"
+PASSWORD = "benchpassword"
+
+
+def uncached_auth_service(db: Session = Depends(get_db)) -> AuthService:
+    return AuthService(DatabaseUserRepository(db))
+
+
+def measure(client: TestClient, path: str, headers: dict, requests: int) -> float:
+    """
+    Returns the number of requests per second
+    """
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+    return requests / (time.perf_counter() - start)
+
+
+def run(requests: int = 50):
+    client = TestClient(app)
+    ensure_schema(get_engine())
+    db = next(get_db())
+    AuthService(DatabaseUserRepository(db)).create_user(USERNAME, PASSWORD)
+    db.close()
+
+    headers = {
+        "Authorization": f"Basic {b64encode(f'{USERNAME}:{PASSWORD}'.encode()).decode()}"
+    }
+    response = client.post(
+        "/ecg",
+        json={"leads": [{"name": "I", "signal": [1, -1] * 2500}]},
+        headers=headers,
+    )
+    path = f"/ecg/{response.json()['ecg_id']}"
+
+    app.dependency_overrides[get_auth_service] = uncached_auth_service
+    uncached = measure(client, path, headers, requests)
+    app.dependency_overrides = {}
+
+    credential_cache.clear()
+    cached = measure(client, path, headers, requests)
+
+    print(f"without cache: {uncached:.1f} req/s")
+    print(
+        f"with cache:    {cached:.1f} req/s "
+        f"(hits {credential_cache.hits}, misses {credential_cache.misses})"
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,61 @@
+"""
+Compare two results of the benchmark suite, e.g. of the base and the head
+of a branch. Exits with status 1 if a benchmark regressed by more than the
+threshold: a higher p50 for micro-benchmarks, a higher p95 or a lower
+throughput for endpoints.
+
+Run from the `app` directory:
+
+    python -m benchmarks.compare base.json head.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+# Compared statistics of every part of the suite, and whether higher is better
+METRICS = {
+    "micro": [("p50_ms", False)],
+    "load": [("p95_ms", False), ("requests_per_second", True)],
+}
+
+
+def compare(base: Dict, head: Dict, threshold: float) -> List[Tuple]:
+    """
+    Returns the name, statistic, base value, head value, relative change and
+    whether it is a regression of every benchmark of both results
+    :param base: Results of the suite to compare against
+    :param head: Results of the suite to compare
+    :param threshold: Relative change above which a benchmark regressed
+    """
+    rows = []
+    for part, metrics in METRICS.items():
+        for name, head_stats in head.get(part, {}).items():
+            base_stats = base.get(part, {}).get(name)
+            if base_stats is None:
+                continue
+            for metric, higher_is_better in metrics:
+                before, after = base_stats[metric], head_stats[metric]
+                change = (after - before) / before if before else 0.0
+                worse = -change if higher_is_better else change
+                rows.append((name, metric, before, after, change, worse > threshold))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with open(args.base) as base_file, open(args.head) as head_file:
+        rows = compare(json.load(base_file), json.load(head_file), args.threshold)
+
+    for name, metric, before, after, change, regressed in rows:
+        print(
+            f"{name:45} {metric:20} {before:10.3f} -> {after:10.3f} "
+            f"{change:+7.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
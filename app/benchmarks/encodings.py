@@ -0,0 +1,49 @@
+"""
+Encode time and payload size of the ECG response formats.
+
+Run from the `app` directory:
+
+    python -m benchmarks.encodings
+"""
+
+import timeit
+from datetime import datetime
+import numpy as np
+from adapters.api.encodings import ENCODERS, compress, encode_json
+from adapters.database.models import ECG, Lead
+
+SHAPES = [(12, 5000), (12, 300000)]
+
+
+def run(repeat: int = 3):
+    rng = np.random.default_rng(0)
+    for leads, samples in SHAPES:
+        # A random walk compresses like a real recording, white noise does not
+        signals = np.cumsum(
+            rng.integers(-20, 21, size=(leads, samples)), axis=1, dtype=np.int32
+        )
+        ecg = ECG(
+            ecg_id="benchmark",
+            date=datetime.now(),
+            leads=[
+                Lead(name=f"L{index}", signal=signal)
+                for index, signal in enumerate(signals)
+            ],
+        )
+
+        formats = {"json": encode_json}
+        formats["json+gzip"] = lambda ecg: compress(encode_json(ecg), "gzip")
+        formats["json+zstd"] = lambda ecg: compress(encode_json(ecg), "zstd")
+        formats.update(ENCODERS)
+
+        print(f"{leads}x{samples}:")
+        for name, encode in formats.items():
+            seconds = min(timeit.repeat(lambda: encode(ecg), number=1, repeat=repeat))
+            print(
+                f"  {name:38} {seconds * 1000:8.2f} ms "
+                f"{len(encode(ecg)) / 1024:10.1f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,76 @@
+"""
+Regression benchmark of the validation and encoding of the body of
+`POST /ecg` with a 12-lead x 5000-sample ECG: the `List[int]` lead schema,
+as originally written, against the vectorized `SignalArray` field.
+
+Run from the `app` directory:
+
+    python -m benchmarks.ingest
+"""
+
+import json
+import timeit
+from typing import List, Optional
+import numpy as np
+from pydantic import BaseModel
+from adapters.api.schemas import ECGRequestSchema
+from adapters.database.codecs import get_codec
+from core.config import config
+
+LEADS = 12
+SAMPLES = 5000
+
+
+class ListLeadRequestSchema(BaseModel):
+    name: str
+    signal: List[int]
+    num_samples: Optional[int] = None
+
+
+class ListECGRequestSchema(BaseModel):
+    leads: List[ListLeadRequestSchema]
+
+
+def ingest(schema, body: dict) -> List[bytes]:
+    codec = get_codec(config.SIGNAL_CODEC)
+    ecg_data = schema.model_validate(body)
+    return [codec.encode(lead.model_dump()["signal"]) for lead in ecg_data.leads]
+
+
+def run(repeat: int = 20):
+    rng = np.random.default_rng(0)
+    # Decoded once, as FastAPI does before validating the body
+    body = json.loads(
+        json.dumps(
+            {
+                "leads": [
+                    {
+                        "name": f"L{index}",
+                        "signal": rng.integers(-2000, 2000, size=SAMPLES).tolist(),
+                        "num_samples": SAMPLES,
+                    }
+                    for index in range(LEADS)
+                ]
+            }
+        )
+    )
+
+    # Both paths must store the same payloads
+    assert ingest(ListECGRequestSchema, body) == ingest(ECGRequestSchema, body)
+
+    listed = min(
+        timeit.repeat(
+            lambda: ingest(ListECGRequestSchema, body), number=1, repeat=repeat
+        )
+    )
+    vectorized = min(
+        timeit.repeat(lambda: ingest(ECGRequestSchema, body), number=1, repeat=repeat)
+    )
+    print(
+        f"{LEADS}x{SAMPLES}: List[int] {listed * 1000:.2f} ms, "
+        f"SignalArray {vectorized * 1000:.2f} ms, speedup x{listed / vectorized:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark of the zero crossings kernel against the original
+pure-Python loop.
+
+Run from the `app` directory:
+
+    python -m benchmarks.insights
+"""
+
+import timeit
+import numpy as np
+from services.insights import lead_zero_crossings
+
+SHAPES = [(12, 5000), (12, 300000)]
+
+
+def loop_zero_crossings(signals):
+    """
+    Reference implementation, as originally written in
+    `ECGService.compute_insights`
+    """
+    counts = []
+    for signal in signals:
+        count = 0
+        for i in range(1, len(signal)):
+            if signal[i - 1] * signal[i] < 0:
+                count += 1
+        counts.append(count)
+    return counts
+
+
+def run(repeat: int = 3):
+    rng = np.random.default_rng(0)
+    for leads, samples in SHAPES:
+        signals = list(rng.integers(-2000, 2000, size=(leads, samples), dtype=np.int32))
+        lists = [signal.tolist() for signal in signals]
+
+        assert loop_zero_crossings(lists) == lead_zero_crossings(signals)
+
+        loop = min(
+            timeit.repeat(lambda: loop_zero_crossings(lists), number=1, repeat=repeat)
+        )
+        vectorized = min(
+            timeit.repeat(lambda: lead_zero_crossings(signals), number=1, repeat=repeat)
+        )
+        print(
+            f"{leads}x{samples}: loop {loop * 1000:.1f} ms, "
+            f"vectorized {vectorized * 1000:.2f} ms, "
+            f"speedup x{loop / vectorized:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    run()
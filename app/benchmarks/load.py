@@ -0,0 +1,172 @@
+"""
+End-to-end load driver: concurrent requests against the real app, in
+process, on a throwaway SQLite database. Synthetic ECGs are uploaded,
+then read back, and the throughput and latency of every endpoint are
+reported.
+
+Uploads include the computation of insights: the in-process transport
+only returns once the background tasks of the request are done.
+
+Run from the `app` directory:
+
+    python -m benchmarks.load --requests 200 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import secrets
+import tempfile
+import time
+from itertools import count
+from typing import Awaitable, Callable, Dict, List
+from core.config import config
+
+# The engine is created on first use, point it to a throwaway database first
+config.DATABASE_URL = f"sqlite:///{tempfile.mkdtemp()}/load.db"
+config.AUTH_SECRET_KEY = config.AUTH_SECRET_KEY or secrets.token_urlsafe(32)
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from adapters.database.orm import get_engine, get_sessionmaker  # noqa: E402
+from adapters.database.repository import DatabaseUserRepository  # noqa: E402
+from adapters.database.schema import ensure_schema  # noqa: E402
+from benchmarks.results import summarize  # noqa: E402
+from benchmarks.synthetic import synthetic_ecg  # noqa: E402
+from services.auth_service import AuthService  # noqa: E402
+
+USERNAME = "load"
+PASSWORD = "loadpassword"
+
+
+async def drive(
+    requests: int, concurrency: int, send: Callable[[int], Awaitable[httpx.Response]]
+) -> Dict:
+    """
+    Send `requests` requests from `concurrency` concurrent clients
+    :param requests: Number of requests
+    :param concurrency: Number of requests in flight
+    :param send: Coroutine function sending the request of an index
+    """
+    durations: List[float] = []
+    errors = 0
+    indexes = count()
+
+    async def worker():
+        nonlocal errors
+        while (index := next(indexes)) < requests:
+            start = time.perf_counter()
+            response = await send(index)
+            durations.append(time.perf_counter() - start)
+            if response.is_error:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_second": requests / elapsed,
+        **summarize(durations),
+    }
+
+
+async def run_load(
+    requests: int = 100,
+    concurrency: int = 4,
+    leads: int = 12,
+    sample_rate: int = 500,
+    duration: float = 10.0,
+) -> Dict[str, Dict]:
+    """
+    Throughput and latency statistics of every endpoint, by route
+    :param requests: Number of requests per endpoint
+    :param concurrency: Number of requests in flight
+    :param leads: Number of leads of the synthetic ECGs
+    :param sample_rate: Samples per second of the synthetic ECGs
+    :param duration: Duration of the synthetic ECGs, in seconds
+    """
+    # The in-process transport does not run the lifespan of the app
+    ensure_schema(get_engine())
+    db = get_sessionmaker()()
+    if DatabaseUserRepository(db).get(USERNAME) is None:
+        AuthService(DatabaseUserRepository(db)).create_user(USERNAME, PASSWORD)
+    db.close()
+
+    # Encoded once, the client is not what is measured
+    bodies = [
+        json.dumps({"leads": synthetic_ecg(leads, sample_rate, duration, seed=seed)})
+        for seed in range(min(requests, 16))
+    ]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+        tokens = (
+            await client.post(
+                "/auth/login", json={"username": USERNAME, "password": PASSWORD}
+            )
+        ).json()
+        client.headers["Authorization"] = f"Bearer {tokens['access_token']}"
+        client.headers["Content-Type"] = "application/json"
+
+        ecg_ids: List[str] = []
+
+        async def upload(index: int):
+            response = await client.post("/ecg", content=bodies[index % len(bodies)])
+            if response.status_code == 201:
+                ecg_ids.append(response.json()["ecg_id"])
+            return response
+
+        results = {"POST /ecg": await drive(requests, concurrency, upload)}
+        if not ecg_ids:
+            raise RuntimeError("No ECG was uploaded")
+
+        reads = {
+            "GET /ecg/{ecg_id}": lambda index: client.get(
+                f"/ecg/{ecg_ids[index % len(ecg_ids)]}"
+            ),
+            "GET /ecg/{ecg_id}/insights": lambda index: client.get(
+                f"/ecg/{ecg_ids[index % len(ecg_ids)]}/insights"
+            ),
+            "GET /ecg": lambda index: client.get("/ecg", params={"limit": 50}),
+        }
+        for route, send in reads.items():
+            results[route] = await drive(requests, concurrency, send)
+    return results
+
+
+def run(**kwargs) -> Dict[str, Dict]:
+    """
+    :param kwargs: Parameters of run_load
+    """
+    return asyncio.run(run_load(**kwargs))
+
+
+def print_results(results: Dict[str, Dict]):
+    for route, stats in results.items():
+        print(
+            f"{route:28} {stats['requests_per_second']:8.1f} req/s  "
+            f"p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+            f"p99 {stats['p99_ms']:8.2f} ms  errors {stats['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--leads", type=int, default=12)
+    parser.add_argument("--sample-rate", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    print_results(
+        run(
+            requests=args.requests,
+            concurrency=args.concurrency,
+            leads=args.leads,
+            sample_rate=args.sample_rate,
+            duration=args.duration,
+        )
+    )
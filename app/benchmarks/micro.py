@@ -0,0 +1,221 @@
+"""
+Micro-benchmarks of the hot paths of the service, on a synthetic ECG:
+the signal codecs, the windows read by `GET /ecg/{ecg_id}?start=&end=`,
+`ECGService.compute_insights`, password hashing and the serialization of
+`GET /ecg/{ecg_id}` responses.
+
+Run from the `app` directory:
+
+    python -m benchmarks.micro
+"""
+
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from adapters.api.encodings import (
+    ENCODERS,
+    JSON,
+    available_media_types,
+    compress,
+    encode_json,
+)
+from adapters.database.codecs import CODECS, decode_signal, get_codec
+from adapters.database.models import ECG, Lead
+from adapters.database.repository import ECGRepository
+from adapters.tasks.tasks import SynchronousBackgroundTask
+from benchmarks.results import time_calls
+from benchmarks.synthetic import lead_names, synthetic_signals
+from services.auth_service import hash_password, verify_password_hash
+from services.ecg_service import ECGService
+
+# The archive codec writes to day files, it is benchmarked end to end
+CODEC_NAMES = [name for name in CODECS if name != "archive"]
+
+
+class MemoryECGRepository(ECGRepository):
+    """
+    Repository keeping a single ECG in memory, so that compute_insights
+    is measured without the database
+    """
+
+    def __init__(self, ecg: ECG):
+        self.ecg = ecg
+
+    def save(self, ecg: ECG):
+        self.ecg = ecg
+
+    def save_many(self, ecgs: List[ECG]):
+        self.ecg = ecgs[-1]
+
+    def save_insights(
+        self,
+        ecg: ECG,
+        results: Optional[Dict[str, Tuple[int, Any]]] = None,
+        outdated: Sequence[str] = (),
+    ):
+        pass
+
+    def get(self, ecg_id: str, leads: Optional[List[str]] = None) -> Optional[ECG]:
+        return ECG(
+            ecg_id=self.ecg.ecg_id,
+            user_id=self.ecg.user_id,
+            date=self.ecg.date,
+            leads=[
+                Lead(name=lead.name, signal=lead.signal, num_samples=lead.num_samples)
+                for lead in self.ecg.leads
+                if leads is None or lead.name in leads
+            ],
+        )
+
+    def get_insights(self, ecg_id: str) -> Optional[Dict]:
+        return None
+
+    def get_insight_versions(self, ecg_id: str) -> Dict[str, int]:
+        # Every analyzer runs on every call
+        return {}
+
+    def list_for_user(self, user_id: int, limit: int, *args, **kwargs) -> List[ECG]:
+        return [self.ecg]
+
+
+def build_ecg(signals, payloads: Optional[List] = None) -> ECG:
+    """
+    :param signals: Samples of every lead
+    :param payloads: Encoded signals, stored instead of the samples
+    """
+    payloads = payloads if payloads is not None else list(signals)
+    return ECG(
+        ecg_id="benchmark",
+        user_id=1,
+        date=datetime(2024, 1, 1),
+        leads=[
+            Lead(name=name, signal=payload, num_samples=signal.size, zero_crossings=0)
+            for name, signal, payload in zip(
+                lead_names(len(signals)), signals, payloads
+            )
+        ],
+    )
+
+
+def bench_codecs(signals, repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for name in CODEC_NAMES:
+        codec = get_codec(name)
+        # Uploaded signals are validated into arrays
+        payloads = [codec.encode(signal) for signal in signals]
+        results[f"codec.{name}.encode"] = time_calls(
+            lambda: [codec.encode(signal) for signal in signals], repeat
+        )
+        results[f"codec.{name}.decode"] = time_calls(
+            lambda: [decode_signal(payload) for payload in payloads], repeat
+        )
+    return results
+
+
+def bench_windows(signals, repeat: int, size: int = 500) -> Dict[str, Dict]:
+    """
+    Windows of `size` samples at the start and at the end of the leads:
+    the windows of delta and zlib payloads cost more the later they end
+    """
+    results = {}
+    length = min(len(signal) for signal in signals)
+    for name in CODEC_NAMES:
+        codec = get_codec(name)
+        payloads = [codec.encode(signal) for signal in signals]
+        for position, start in (("head", 0), ("tail", max(length - size, 0))):
+            results[f"window.{name}.{position}"] = time_calls(
+                lambda: [
+                    codec.decode_range(payload, start, start + size)
+                    for payload in payloads
+                ],
+                repeat,
+            )
+    return results
+
+
+def bench_insights(signals, repeat: int) -> Dict[str, Dict]:
+    codec = get_codec("binary-delta-zlib")
+    repository = MemoryECGRepository(
+        build_ecg(signals, [codec.encode(signal) for signal in signals])
+    )
+    service = ECGService(repository, SynchronousBackgroundTask(), codec=codec)
+    return {
+        "insights.compute_insights": time_calls(
+            lambda: service.compute_insights("benchmark"), repeat
+        )
+    }
+
+
+def bench_auth(repeat: int) -> Dict[str, Dict]:
+    hashed = hash_password("benchmark-password")
+    return {
+        "auth.hash_password": time_calls(
+            lambda: hash_password("benchmark-password"), repeat, warmup=0
+        ),
+        "auth.verify_password": time_calls(
+            lambda: verify_password_hash("benchmark-password", hashed),
+            repeat,
+            warmup=0,
+        ),
+    }
+
+
+def bench_serialization(signals, repeat: int) -> Dict[str, Dict]:
+    ecg = build_ecg(signals)
+    results = {
+        "serialize.json": time_calls(lambda: encode_json(ecg), repeat),
+        "serialize.json+gzip": time_calls(
+            lambda: compress(encode_json(ecg), "gzip"), repeat
+        ),
+        "serialize.json+zstd": time_calls(
+            lambda: compress(encode_json(ecg), "zstd"), repeat
+        ),
+    }
+    for media_type in available_media_types():
+        if media_type != JSON:
+            encode = ENCODERS[media_type]
+            results[f"serialize.{media_type}"] = time_calls(lambda: encode(ecg), repeat)
+    return results
+
+
+def run(
+    leads: int = 12,
+    sample_rate: int = 500,
+    duration: float = 10.0,
+    repeat: int = 20,
+    auth_repeat: int = 5,
+) -> Dict[str, Dict]:
+    """
+    Latency statistics of every micro-benchmark, by name
+    :param leads: Number of leads of the synthetic ECG
+    :param sample_rate: Samples per second of the synthetic ECG
+    :param duration: Duration of the synthetic ECG, in seconds
+    :param repeat: Number of measured calls of every benchmark
+    :param auth_repeat: Number of measured password hashes, bcrypt is slow
+    """
+    signals = synthetic_signals(leads, sample_rate, duration)
+    return {
+        **bench_codecs(signals, repeat),
+        **bench_windows(signals, repeat),
+        **bench_insights(signals, repeat),
+        **bench_auth(auth_repeat),
+        **bench_serialization(signals, repeat),
+    }
+
+
+def print_results(results: Dict[str, Dict]):
+    for name, stats in results.items():
+        print(
+            f"{name:45} p50 {stats['p50_ms']:9.3f} ms  "
+            f"p95 {stats['p95_ms']:9.3f} ms  p99 {stats['p99_ms']:9.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--leads", type=int, default=12)
+    parser.add_argument("--sample-rate", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print_results(run(args.leads, args.sample_rate, args.duration, args.repeat))
@@ -0,0 +1,79 @@
+"""
+Regression benchmark of the JSON response of `GET /ecg/{ecg_id}` on a
+12-lead x 5000-sample ECG: the validated path, as originally written in
+the router, against the trusted path serialized from the decoded arrays.
+
+Run from the `app` directory:
+
+    python -m benchmarks.responses
+"""
+
+import json
+import timeit
+from datetime import datetime
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from adapters.api.encodings import encode_json
+from adapters.api.schemas import ECGResponseSchema, LeadResponseSchema
+from adapters.database.models import ECG, Lead
+
+LEADS = 12
+SAMPLES = 5000
+
+response_adapter = TypeAdapter(ECGResponseSchema)
+
+
+def validated_json(ecg: ECG) -> bytes:
+    """
+    A LeadResponseSchema per lead, validated again against the response
+    model and serialized by FastAPI's default JSONResponse
+    """
+    content = {
+        "ecg_id": ecg.ecg_id,
+        "date": ecg.date,
+        "leads": [
+            LeadResponseSchema(
+                name=lead.name,
+                signal=lead.signal.tolist(),
+                num_samples=lead.num_samples,
+                zero_crossings=lead.zero_crossings,
+            )
+            for lead in ecg.leads
+        ],
+    }
+    validated = response_adapter.validate_python(content)
+    body = jsonable_encoder(response_adapter.dump_python(validated, mode="json"))
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+def run(repeat: int = 20):
+    rng = np.random.default_rng(0)
+    ecg = ECG(
+        ecg_id="benchmark",
+        date=datetime.now(),
+        leads=[
+            Lead(
+                name=f"L{index}",
+                signal=rng.integers(-2000, 2000, size=SAMPLES, dtype=np.int32),
+                num_samples=SAMPLES,
+                zero_crossings=0,
+            )
+            for index in range(LEADS)
+        ],
+    )
+
+    # Both paths must produce the same document
+    assert json.loads(validated_json(ecg)) == json.loads(encode_json(ecg))
+    ECGResponseSchema.model_validate_json(encode_json(ecg))
+
+    validated = min(timeit.repeat(lambda: validated_json(ecg), number=1, repeat=repeat))
+    trusted = min(timeit.repeat(lambda: encode_json(ecg), number=1, repeat=repeat))
+    print(
+        f"{LEADS}x{SAMPLES}: validated {validated * 1000:.2f} ms, "
+        f"trusted {trusted * 1000:.2f} ms, speedup x{validated / trusted:.0f}"
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,87 @@
+"""
+Timing statistics and JSON results of the benchmark suite
+"""
+
+import json
+import platform
+import subprocess
+import time
+import timeit
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Sequence
+import numpy as np
+from core.config import config
+
+
+def summarize(seconds: Sequence[float]) -> Dict:
+    """
+    Latency statistics of measurements, in milliseconds
+    :param seconds: Duration of every measurement, in seconds
+    """
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "min_ms": float(ms.min()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+def time_calls(func: Callable[[], object], repeat: int, warmup: int = 1) -> Dict:
+    """
+    Latency statistics of the calls of a function
+    :param func: Function to call without arguments
+    :param repeat: Number of measured calls
+    :param warmup: Number of calls before measuring, e.g. to fill caches
+    """
+    for _ in range(warmup):
+        func()
+    return summarize(
+        timeit.repeat(func, number=1, repeat=repeat, timer=time.perf_counter)
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict:
+    """
+    What the results depend on besides the code
+    """
+    return {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+        "numpy": np.__version__,
+        "signal_codec": config.SIGNAL_CODEC,
+        "leads_loading": config.LEADS_LOADING,
+        "background_task_backend": config.BACKGROUND_TASK_BACKEND,
+    }
+
+
+def write_results(results: Dict, path: Optional[str]):
+    """
+    :param results: Results of the suite
+    :param path: Path of the JSON file, None for the standard output
+    """
+    document = json.dumps(results, indent=2)
+    if path is None:
+        print(document)
+        return
+    with open(path, "w") as results_file:
+        results_file.write(document + "\n")
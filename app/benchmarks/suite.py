@@ -0,0 +1,82 @@
+"""
+Benchmark suite: the micro-benchmarks and the end-to-end load driver on
+synthetic ECGs, with their results written as JSON to compare commits
+(see benchmarks/compare.py).
+
+Run from the `app` directory:
+
+    python -m benchmarks.suite --output results.json
+"""
+
+import argparse
+from typing import Dict, Optional
+from benchmarks import micro
+from benchmarks.results import environment, write_results
+
+
+def run(
+    leads: int = 12,
+    sample_rate: int = 500,
+    duration: float = 10.0,
+    repeat: int = 20,
+    requests: int = 100,
+    concurrency: int = 4,
+    only: Optional[str] = None,
+) -> Dict:
+    """
+    :param leads: Number of leads of the synthetic ECGs
+    :param sample_rate: Samples per second of the synthetic ECGs
+    :param duration: Duration of the synthetic ECGs, in seconds
+    :param repeat: Number of measured calls of every micro-benchmark
+    :param requests: Number of requests per endpoint of the load driver
+    :param concurrency: Number of requests in flight of the load driver
+    :param only: "micro" or "load" to run a single part of the suite
+    """
+    results = {
+        "environment": environment(),
+        "parameters": {
+            "leads": leads,
+            "sample_rate": sample_rate,
+            "duration": duration,
+            "repeat": repeat,
+            "requests": requests,
+            "concurrency": concurrency,
+        },
+    }
+    if only in (None, "micro"):
+        results["micro"] = micro.run(leads, sample_rate, duration, repeat)
+    if only in (None, "load"):
+        # Imports the app on a throwaway database
+        from benchmarks import load
+
+        results["load"] = load.run(
+            requests=requests,
+            concurrency=concurrency,
+            leads=leads,
+            sample_rate=sample_rate,
+            duration=duration,
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", help="JSON file, the standard output if omitted")
+    parser.add_argument("--only", choices=["micro", "load"])
+    parser.add_argument("--leads", type=int, default=12)
+    parser.add_argument("--sample-rate", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    results = run(
+        leads=args.leads,
+        sample_rate=args.sample_rate,
+        duration=args.duration,
+        repeat=args.repeat,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        only=args.only,
+    )
+    write_results(results, args.output)
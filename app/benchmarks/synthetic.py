@@ -0,0 +1,93 @@
+"""
+Synthetic ECGs for the benchmarks: a train of P waves, QRS complexes and
+T waves at a steady heart rate, with baseline wander and noise, in
+microvolts. The waveform matters for the codecs and the analyzers: the
+delta codec and the compression of responses depend on how smooth the
+signal is, and zero crossings on its shape.
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+
+LEAD_NAMES = [
+    "I",
+    "II",
+    "III",
+    "aVR",
+    "aVL",
+    "aVF",
+    "V1",
+    "V2",
+    "V3",
+    "V4",
+    "V5",
+    "V6",
+]
+
+# Amplitude (uV), offset from the R peak (s) and width (s) of every wave
+WAVES = [(150, -0.2, 0.025), (-100, -0.03, 0.01), (1200, 0, 0.01), (-250, 0.03, 0.01)]
+T_WAVE = (300, 0.3, 0.04)
+
+
+def lead_names(leads: int) -> List[str]:
+    """
+    Standard 12-lead names, then L12, L13...
+    :param leads: Number of leads
+    """
+    return LEAD_NAMES[:leads] + [f"L{index}" for index in range(12, leads)]
+
+
+def synthetic_signals(
+    leads: int = 12,
+    sample_rate: int = 500,
+    duration: float = 10.0,
+    heart_rate: float = 70.0,
+    noise: float = 15.0,
+    seed: Optional[int] = 0,
+) -> np.ndarray:
+    """
+    Samples of every lead, as an int32 array of shape (leads, samples)
+    :param leads: Number of leads
+    :param sample_rate: Samples per second
+    :param duration: Duration of the recording, in seconds
+    :param heart_rate: Beats per minute
+    :param noise: Standard deviation of the noise, in microvolts
+    :param seed: Seed of the random generator, None for a random recording
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    period = 60 / heart_rate
+
+    # Time from the nearest R peak of every sample
+    offset = (t + period / 2) % period - period / 2
+    beat = sum(
+        amplitude * np.exp(-(((offset - center) / width) ** 2) / 2)
+        for amplitude, center, width in WAVES + [T_WAVE]
+    )
+
+    signals = np.empty((leads, t.size), dtype=np.int32)
+    for index in range(leads):
+        # Every lead sees the heart from another angle
+        gain = np.cos(index * np.pi / 6) + rng.uniform(-0.2, 0.2)
+        wander = 80 * np.sin(2 * np.pi * rng.uniform(0.15, 0.3) * t + rng.uniform(0, 6))
+        signals[index] = np.rint(
+            gain * beat + wander + rng.normal(0, noise, size=t.size)
+        )
+    return signals
+
+
+def synthetic_ecg(
+    leads: int = 12, sample_rate: int = 500, duration: float = 10.0, **kwargs
+) -> List[Dict]:
+    """
+    Leads of an ECG as sent to `POST /ecg`
+    :param leads: Number of leads
+    :param sample_rate: Samples per second
+    :param duration: Duration of the recording, in seconds
+    :param kwargs: Other parameters of synthetic_signals
+    """
+    signals = synthetic_signals(leads, sample_rate, duration, **kwargs)
+    return [
+        {"name": name, "signal": signal.tolist(), "num_samples": signal.size}
+        for name, signal in zip(lead_names(leads), signals)
+    ]
@@ -1,10 +1,111 @@
-class Settings:
+from typing import Optional
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    """
+    Every setting can be overridden with an environment variable
+    of the same name, e.g. DATABASE_URL=postgresql://...
+    """
+
     # Database settings
-    DATABASE_URL = "sqlite:///./test.db"
+    DATABASE_URL: str = "sqlite:///./test.db"
+    # Serve the main ECG, user and auth routes with async sessions. Their
+    # URL is DATABASE_URL with an async driver (aiosqlite, asyncpg) unless
+    # set, and must point to the same database
+    DATABASE_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Migrate the schema when a worker starts, see adapters/database/schema.py.
+    # Disable to run create_admin.py (which migrates) before the workers
+    DATABASE_MIGRATE_ON_STARTUP: bool = True
+
+    # Connection pool settings, ignored by in-memory SQLite databases
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30
+    # Connections older than this are replaced, -1 to keep them forever
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_POOL_PRE_PING: bool = False
+
+    # SQLite pragmas set on every new connection. WAL lets readers run
+    # concurrently with a writer, and writers wait for the lock for up to
+    # busy_timeout instead of failing with "database is locked".
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    # Negative values are in KiB, positive values in pages
+    SQLITE_CACHE_SIZE: int = -64 * 1024
+
+    # Strategy to load the leads of ECGs ("selectin", "joined" or "lazy")
+    LEADS_LOADING: str = "selectin"
+
+    # Signal storage settings
+    # "archive" stores the samples in day files of SIGNAL_ARCHIVE_DIR
+    # instead of the database, see adapters/database/archive.py
+    SIGNAL_CODEC: str = "binary-delta-zlib"
+    SIGNAL_ARCHIVE_DIR: str = "./signals"
+    # Uploaded samples must fit in this type ("int16" or "int32")
+    SIGNAL_SAMPLE_DTYPE: str = "int32"
+    # Maximum size of a lead frame in streamed uploads
+    STREAM_MAX_FRAME_BYTES: int = 1024 * 1024
+    # Maximum size of a streamed upload, its encoded signals are kept in
+    # memory until it is stored
+    STREAM_MAX_BODY_BYTES: int = 64 * 1024 * 1024
+    # Decoded ECG cache settings, a size of 0 disables the cache. Insights
+    # saved by other processes are served once cached entries expire
+    ECG_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    ECG_CACHE_TTL_SECONDS: Optional[float] = 300
+
+    # Number of ECGs per page of GET /ecg
+    ECG_LIST_DEFAULT_LIMIT: int = 50
+    ECG_LIST_MAX_LIMIT: int = 500
+
+    # Maximum number of ECGs per batch upload
+    ECG_BATCH_MAX_SIZE: int = 500
+    # Maximum number of rows per bulk insert statement
+    BULK_INSERT_CHUNK_SIZE: int = 1000
+
+    # Background task settings ("fastapi", "process" or "queue")
+    BACKGROUND_TASK_BACKEND: str = "fastapi"
+    BACKGROUND_WORKERS: int = 2
+    BACKGROUND_QUEUE_SIZE: int = 100
+
+    # Insight job queue settings, used by the "queue" backend and worker.py
+    JOB_BATCH_SIZE: int = 50
+    JOB_LEASE_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BACKOFF_SECONDS: float = 10
+    JOB_POLL_INTERVAL: float = 1
+
+    # Insight backfill settings, see backfill.py
+    BACKFILL_CHUNK_SIZE: int = 200
+    BACKFILL_PROCESSES: int = 2
+    BACKFILL_CHECKPOINT_PATH: str = "./backfill-checkpoint.json"
+
+    # Profiling settings, see core/profiling.py. Once enabled, admins profile
+    # a request with the X-Profile header or the profile query parameter
+    PROFILING_ENABLED: bool = False
+    PROFILING_SLOW_CALL_SECONDS: float = 1.0
+    PROFILING_SLOW_CALLS_MAX: int = 200
+    PROFILING_PROFILES_MAX: int = 20
+    # Number of functions in the statistics of a profiled request
+    PROFILING_STATS_LINES: int = 50
+
+    # Verified credentials cache settings. Every worker has its own cache,
+    # the TTL bounds how long the others accept changed credentials
+    AUTH_CACHE_TTL_SECONDS: float = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 1024
+
+    # Token settings. The secret key is required, workers do not start
+    # without it, and must be shared by every worker
+    AUTH_SECRET_KEY: Optional[str] = None
+    ACCESS_TOKEN_TTL_SECONDS: int = 15 * 60
+    REFRESH_TOKEN_TTL_SECONDS: int = 7 * 24 * 60 * 60
 
     # Admin user settings
-    ADMIN_USERNAME = "admin"
-    ADMIN_PASSWORD = "adminpass"
+    ADMIN_USERNAME: str = "admin"
+    ADMIN_PASSWORD: str = "adminpass"
 
 
 config = Settings()
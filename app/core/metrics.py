@@ -0,0 +1,273 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labelnames: Sequence[str], labelvalues: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape_label_value(str(value))}"'
+        for name, value in zip(labelnames, labelvalues)
+    )
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """
+    Base class of the metrics of a registry, rendered in the Prometheus
+    text exposition format
+    """
+
+    type: str
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        :param name: Metric name
+        :param documentation: Help text
+        :param labelnames: Names of the labels of every series
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        pass
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in cumulative buckets
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """
+        :param buckets: Upper bounds of the buckets, in increasing order
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets)
+        # Per series: count of every bucket (not cumulative), sum and count
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str):
+        """
+        :param value: Observed value
+        :param labels: Value of every label
+        """
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        """
+        Observe the duration of a block, in seconds
+        :param labels: Value of every label
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get(self, **labels: str) -> Optional[Dict]:
+        """
+        Count and sum of the observations of a series, None if there is none
+        :param labels: Value of every label
+        """
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return None
+            return {"count": series[2], "sum": series[1]}
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            series = {key: (list(b), s, c) for key, (b, s, c) in self._series.items()}
+
+        for key, (buckets, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), buckets):
+                cumulative += bucket_count
+                labels = format_labels(
+                    self.labelnames + ("le",), key + (format_value(bound),)
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Gauge(Metric):
+    """
+    Value that goes up and down. Gauges of values owned by other objects
+    read them with a callback when the metrics are rendered.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Iterable[Tuple[Dict, float]]]] = None,
+    ):
+        """
+        :param collect: Callable returning the labels and value of every
+        series, replaces the values set on the gauge
+        """
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        if self.collect is not None:
+            values = {self._key(labels): value for labels, value in self.collect()}
+        else:
+            with self._lock:
+                values = dict(self._values)
+
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+
+
+class MetricsRegistry:
+    """
+    Metrics of the process. Every worker process has its own registry,
+    scrape each of them, or run a single worker per container.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add a metric, or return the metric registered with its name
+        :param metric: Metric instance
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Duration of HTTP requests by route",
+        ["method", "route", "status"],
+    )
+)
+
+# Stages: "auth" (password hashing), "db" (SQL statements), "decode"
+# (signals), "serialize" (responses) and "insights" (analyzers)
+STAGE_DURATION = registry.register(
+    Histogram(
+        "stage_duration_seconds",
+        "Duration of the stages of request and task processing",
+        ["stage"],
+    )
+)
+
+
+def timed(stage: str):
+    """
+    Decorator observing the duration of every call of a function
+    as a stage of STAGE_DURATION
+    :param stage: Stage name
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with STAGE_DURATION.time(stage=stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,225 @@
+import cProfile
+import inspect
+import io
+import logging
+import pstats
+import reprlib
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+# Bounded representation of the arguments of slow calls, signals included
+ARGS_REPR = reprlib.Repr()
+ARGS_REPR.maxlist = ARGS_REPR.maxtuple = ARGS_REPR.maxdict = 4
+ARGS_REPR.maxstring = ARGS_REPR.maxother = 80
+
+# Frames of the stack recorded with a slow call
+STACK_LIMIT = 8
+
+
+class RingBuffer:
+    """
+    Thread-safe buffer keeping the last `max_entries` entries
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        :param max_entries: Maximum number of entries
+        """
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict):
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self) -> List[Dict]:
+        """
+        Entries, newest first
+        """
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_calls = RingBuffer(config.PROFILING_SLOW_CALLS_MAX)
+profiles = RingBuffer(config.PROFILING_PROFILES_MAX)
+
+
+class RequestProfile:
+    """
+    cProfile session of a request, enabled around the outermost profiled
+    calls made while serving it. Profilers hook the whole interpreter, so
+    a single request is profiled at a time: the lock is only taken once
+    the user is verified to be an admin, see authorize.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, method: str, path: str):
+        """
+        :param method: HTTP method of the request
+        :param path: Path of the request
+        """
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now()
+        # Set once the user is verified to be an admin, and holds the lock
+        self.authorized = False
+        # Set if another request was being profiled
+        self.busy = False
+        self.finished = False
+        self.calls: List[Dict] = []
+        self._profiler = cProfile.Profile()
+        self._profiled = False
+        self._depth = 0
+        self._start = time.perf_counter()
+
+    def authorize(self) -> bool:
+        """
+        Take the profiling lock once the user is verified to be an admin.
+        Returns False if another request is being profiled.
+        """
+        if not RequestProfile._lock.acquire(blocking=False):
+            self.busy = True
+            return False
+        self.authorized = True
+        return True
+
+    @property
+    def active(self) -> bool:
+        """
+        Background tasks run once the response is sent, after the profile
+        """
+        return self.authorized and not self.finished
+
+    def enter(self):
+        if self._depth == 0:
+            try:
+                self._profiler.enable()
+                self._profiled = True
+            except ValueError:
+                # Another profiler or debugger is active, only time the calls
+                logger.warning("Profiler unavailable for request %s", self.id)
+        self._depth += 1
+
+    def exit(self, name: str, duration: float):
+        self._depth -= 1
+        if self._depth == 0:
+            self._profiler.disable()
+        self.calls.append({"name": name, "duration_seconds": duration})
+
+    def finish(self) -> Optional[Dict]:
+        """
+        Release the profiling lock, and return the report of the request
+        if it was authorized
+        """
+        was_finished, self.finished = self.finished, True
+        if was_finished or not self.authorized:
+            return None
+        RequestProfile._lock.release()
+
+        # Statistics can not be built from a profiler that never ran
+        stats = io.StringIO()
+        if self._profiled:
+            pstats.Stats(self._profiler, stream=stats).sort_stats(
+                "cumulative"
+            ).print_stats(config.PROFILING_STATS_LINES)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": time.perf_counter() - self._start,
+            "calls": self.calls,
+            "stats": stats.getvalue(),
+        }
+
+
+# Profile of the request being served, if it asked to be profiled
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+def record_call(name: str, args, kwargs, duration: float):
+    """
+    Record a call slower than PROFILING_SLOW_CALL_SECONDS in the slow calls
+    """
+    if duration >= config.PROFILING_SLOW_CALL_SECONDS:
+        slow_calls.append(
+            {
+                "name": name,
+                "duration_seconds": duration,
+                "finished_at": datetime.now().isoformat(),
+                "thread": threading.current_thread().name,
+                "args": ARGS_REPR.repr(args),
+                "kwargs": ARGS_REPR.repr(kwargs),
+                # The callers are still on the stack, without the wrapper frames
+                "stack": traceback.format_stack(limit=STACK_LIMIT + 3)[:-3],
+            }
+        )
+
+
+def profiled(func):
+    """
+    Decorator recording slow calls of a function or coroutine function,
+    and profiling its calls in requests that asked to be profiled.
+    Calls of methods are recorded without `self`.
+    """
+    name = func.__qualname__
+    is_method = "." in name
+
+    def before():
+        profile = current_profile.get()
+        if profile is not None and profile.active:
+            profile.enter()
+            return profile
+        return None
+
+    def after(profile, args, kwargs, start):
+        duration = time.perf_counter() - start
+        if profile is not None:
+            profile.exit(name, duration)
+        record_call(name, args[1:] if is_method else args, kwargs, duration)
+
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not config.PROFILING_ENABLED:
+                return await func(*args, **kwargs)
+            profile = before()
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                after(profile, args, kwargs, start)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not config.PROFILING_ENABLED:
+            return func(*args, **kwargs)
+        profile = before()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            after(profile, args, kwargs, start)
+
+    return wrapper
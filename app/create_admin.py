@@ -0,0 +1,26 @@
+import argparse
+import logging
+from adapters.database.orm import create_admin_user, get_engine
+from adapters.database.schema import ensure_schema
+from core.config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create the schema and the admin user, if they do not exist"
+    )
+    parser.add_argument("--username", default=config.ADMIN_USERNAME)
+    parser.add_argument("--password", default=config.ADMIN_PASSWORD)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ensure_schema(get_engine())
+
+    if create_admin_user(args.username, args.password):
+        logging.info("Admin user %s created", args.username)
+    else:
+        logging.info("Admin user %s already exists", args.username)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,62 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.exceptions import RequestValidationError
+from fastapi.concurrency import run_in_threadpool
 from adapters.api.ecg_router import router as ecg_router
 from adapters.api.user_router import router as user_router
-from adapters.database.orm import engine, create_admin_user
-from adapters.database.models import Base
+from adapters.api.auth_router import router as auth_router
+from adapters.api.async_ecg_router import router as async_ecg_router
+from adapters.api.async_user_router import router as async_user_router
+from adapters.api.async_auth_router import router as async_auth_router
+from adapters.api.errors import validation_exception_handler
+from adapters.api.metrics import MetricsMiddleware, router as metrics_router
+from adapters.api.profiling import ProfilingMiddleware, router as profiling_router
+from adapters.api.dependencies import authorize_profiling, get_token_service
+from adapters.database.async_orm import get_async_database_url, get_async_engine
+from adapters.database.orm import get_engine
+from adapters.database.schema import ensure_schema
 from core.config import config
 
-app = FastAPI()
-app.include_router(ecg_router)
-app.include_router(user_router)
 
-Base.metadata.create_all(bind=engine)
-create_admin_user()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Brings the schema up to date when a worker starts, which only reads
+    the migration marker once it is. The admin user is created by
+    create_admin.py, not by every worker.
+    """
+    # Fails without AUTH_SECRET_KEY
+    get_token_service()
+    # Fails when the async routes would use another database
+    if config.DATABASE_ASYNC:
+        get_async_database_url()
+    if config.DATABASE_MIGRATE_ON_STARTUP:
+        await run_in_threadpool(ensure_schema, get_engine())
+    yield
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+
+
+def create_app() -> FastAPI:
+    """
+    Application factory, nothing connects to the database before startup
+    """
+    app = FastAPI(lifespan=lifespan, dependencies=[Depends(authorize_profiling)])
+    app.add_exception_handler(RequestValidationError, validation_exception_handler)
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    if config.DATABASE_ASYNC:
+        app.include_router(async_ecg_router)
+        app.include_router(async_user_router)
+        app.include_router(async_auth_router)
+    app.include_router(ecg_router)
+    app.include_router(user_router)
+    app.include_router(auth_router)
+    app.include_router(metrics_router)
+    app.include_router(profiling_router)
+    return app
+
+
+app = create_app()
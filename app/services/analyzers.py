@@ -0,0 +1,139 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from adapters.database.models import ECG
+from core.metrics import STAGE_DURATION
+from services.insights import lead_zero_crossings
+
+# Decoded signals of the leads of an ECG, as (name, signal) pairs in lead
+# order. Names are not unique: an ECG may have several leads with a name.
+LeadSignals = List[Tuple[str, np.ndarray]]
+
+
+class Analyzer(ABC):
+    """
+    Abstract class for analyzers.
+    An analyzer computes an insight from the decoded signals of an ECG.
+    Its results are stored with its version: bump the version whenever
+    the results change, so the stored results are recomputed.
+    """
+
+    name: str
+    version: int
+    # Names of the leads the analyzer needs, None for every lead
+    leads: Optional[Tuple[str, ...]] = None
+
+    @abstractmethod
+    def analyze(self, signals: LeadSignals) -> Any:
+        """
+        Compute a JSON-serializable result.
+        Signals are read-only and shared with the other analyzers.
+        :param signals: Name and decoded signal of every required lead
+        """
+        pass
+
+
+class ZeroCrossingsAnalyzer(Analyzer):
+    """
+    Number of zero crossings of every lead, in lead order
+    """
+
+    name = "zero_crossings"
+    version = 1
+
+    def analyze(self, signals: LeadSignals) -> List[int]:
+        return lead_zero_crossings([signal for _, signal in signals])
+
+
+ANALYZERS: Dict[str, Analyzer] = {}
+
+
+def register_analyzer(analyzer: Analyzer) -> Analyzer:
+    """
+    Add an analyzer to the insights computed for every ECG
+    :param analyzer: Analyzer instance, replaces any analyzer with its name
+    """
+    ANALYZERS[analyzer.name] = analyzer
+    return analyzer
+
+
+register_analyzer(ZeroCrossingsAnalyzer())
+
+
+def analyzer_versions() -> Dict[str, int]:
+    """
+    Current version of every registered analyzer, by name
+    """
+    return {name: analyzer.version for name, analyzer in ANALYZERS.items()}
+
+
+def pending_analyzers(stored: Dict[str, int]) -> List[Analyzer]:
+    """
+    Registered analyzers without a stored result of their current version
+    :param stored: Version of the stored result of every analyzer, by name
+    """
+    return [
+        analyzer
+        for name, analyzer in ANALYZERS.items()
+        if stored.get(name) != analyzer.version
+    ]
+
+
+def required_leads(analyzers: Iterable[Analyzer]) -> Optional[Tuple[str, ...]]:
+    """
+    Names of the leads needed by some analyzers, None if one needs every lead
+    :param analyzers: Analyzer instances
+    """
+    names = set()
+    for analyzer in analyzers:
+        if analyzer.leads is None:
+            return None
+        names.update(analyzer.leads)
+    return tuple(sorted(names))
+
+
+def run_analyzers(
+    analyzers: Iterable[Analyzer], signals: LeadSignals
+) -> Dict[str, Tuple[int, Any]]:
+    """
+    Run analyzers on signals decoded once for all of them.
+    Returns the version and the result of every analyzer, by name. The
+    result is None when the ECG does not have the leads of the analyzer.
+    :param analyzers: Analyzer instances
+    :param signals: Name and decoded signal of every lead, in lead order
+    """
+    names = set()
+    for name, signal in signals:
+        signal.flags.writeable = False
+        names.add(name)
+
+    results = {}
+    with STAGE_DURATION.time(stage="insights"):
+        for analyzer in analyzers:
+            if analyzer.leads is None:
+                results[analyzer.name] = (analyzer.version, analyzer.analyze(signals))
+            elif names.issuperset(analyzer.leads):
+                lead_signals = [
+                    (name, signal) for name, signal in signals if name in analyzer.leads
+                ]
+                results[analyzer.name] = (
+                    analyzer.version,
+                    analyzer.analyze(lead_signals),
+                )
+            else:
+                results[analyzer.name] = (analyzer.version, None)
+    return results
+
+
+def project_zero_crossings(ecg: ECG, results: Dict[str, Tuple[int, Any]]):
+    """
+    Copy the zero crossings result onto the `Lead.zero_crossings` column,
+    which the ECG and insights endpoints read
+    :param ecg: ECG database model, with the leads the results were computed on
+    :param results: Results of `run_analyzers`
+    """
+    _, crossings = results.get(ZeroCrossingsAnalyzer.name, (None, None))
+    if crossings is None:
+        return
+    for lead, count in zip(ecg.leads, crossings):
+        lead.zero_crossings = count
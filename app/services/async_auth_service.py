@@ -0,0 +1,126 @@
+from typing import Optional
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPBasicCredentials
+from adapters.database.async_repository import AsyncUserRepository
+from adapters.database.models import User, UserRole
+from services.auth_service import hash_password, verify_password_hash
+from services.credential_cache import CredentialCache
+
+
+class AsyncAuthService:
+    """
+    Asynchronous version of AuthService. Password hashing and
+    verification run in the threadpool, bcrypt is deliberately slow
+    and would block the event loop.
+    """
+
+    def __init__(
+        self,
+        repository: AsyncUserRepository,
+        credential_cache: Optional[CredentialCache] = None,
+    ):
+        """
+        :param repository: AsyncUserRepository instance to
+        interact with the database
+        :param credential_cache: CredentialCache instance to skip the
+        verification of recently verified credentials
+        """
+        self.repository = repository
+        self.credential_cache = credential_cache
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        :param plain_password: str - plain text password
+        :param hashed_password: str - hashed password
+        """
+        return await run_in_threadpool(
+            verify_password_hash, plain_password, hashed_password
+        )
+
+    async def get_password_hash(self, password: str) -> str:
+        """
+        :param password: str - plain text password
+        """
+        return await run_in_threadpool(hash_password, password)
+
+    async def get_user(self, username: str) -> Optional[User]:
+        """
+        :param username: str - username
+        """
+        return await self.repository.get(username)
+
+    async def create_user(
+        self, username: str, password: str, role: UserRole = UserRole.USER
+    ) -> User:
+        """
+        :param username: str - username
+        :param password: str - plain text password
+        :param role: UserRole - user role
+        """
+        if await self.get_user(username):
+            raise HTTPException(status_code=400, detail="Username already registered")
+
+        hashed_password = await self.get_password_hash(password)
+        user = User(username=username, hashed_password=hashed_password, role=role)
+        await self.repository.save(user)
+        return user
+
+    async def update_password(self, username: str, password: str) -> User:
+        """
+        :param username: str - username
+        :param password: str - new plain text password
+        """
+        user = await self._get_existing_user(username)
+        user.hashed_password = await self.get_password_hash(password)
+        # Refresh tokens issued before the change are no longer accepted
+        user.token_version = (user.token_version or 0) + 1
+        await self.repository.save(user)
+        self._invalidate_credentials(username)
+        return user
+
+    async def update_role(self, username: str, role: UserRole) -> User:
+        """
+        :param username: str - username
+        :param role: UserRole - new user role
+        """
+        user = await self._get_existing_user(username)
+        user.role = role
+        await self.repository.save(user)
+        self._invalidate_credentials(username)
+        return user
+
+    async def authenticate_user(self, credentials: HTTPBasicCredentials) -> User:
+        """
+        Authenticate a user using HTTPBasic credentials
+        :param credentials: HTTPBasicCredentials - username and password
+        """
+
+        if self.credential_cache is not None:
+            user = self.credential_cache.get(credentials.username, credentials.password)
+            if user is not None:
+                return user
+
+        user = await self.get_user(credentials.username)
+        if not user or not await self.verify_password(
+            credentials.password, user.hashed_password
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid credentials",
+                headers={"WWW-Authenticate": "Basic"},
+            )
+
+        if self.credential_cache is not None:
+            self.credential_cache.add(credentials.password, user)
+        return user
+
+    async def _get_existing_user(self, username: str) -> User:
+        user = await self.get_user(username)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    def _invalidate_credentials(self, username: str):
+        if self.credential_cache is not None:
+            self.credential_cache.invalidate(username)
@@ -0,0 +1,159 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from adapters.database.async_repository import AsyncECGRepository
+from adapters.database.codecs import SignalCodec, decode_signal, get_codec
+from adapters.database.models import ECG, Lead
+from adapters.tasks.tasks import AbstractBackgroundTask
+from services.analyzers import (
+    pending_analyzers,
+    project_zero_crossings,
+    required_leads,
+    run_analyzers,
+)
+from services.downsampling import window_signal
+from core.config import config
+from core.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncECGService:
+    """
+    Asynchronous service class for ECG operations.
+    Database calls are awaited, and the CPU-bound work (encoding and
+    decoding signals, computing insights) runs in the threadpool so it
+    never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        repository: AsyncECGRepository,
+        background_task: AbstractBackgroundTask,
+        codec: Optional[SignalCodec] = None,
+        insights_task: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """
+        :param repository: Asynchronous ECG repository instance
+        :param background_task: Background task instance to compute insights
+        asynchronously
+        :param codec: Codec used to encode signals before storing them
+        :param insights_task: Task scheduled with the ECG ID to compute its
+        insights. Defaults to `compute_insights`, backends running in other
+        processes need a picklable function instead.
+        """
+        self.repository = repository
+        self.background_task = background_task
+        self.codec = codec or get_codec(config.SIGNAL_CODEC)
+        self.insights_task = insights_task or self.compute_insights
+
+    @profiled
+    async def get(
+        self,
+        ecg_id: str,
+        leads: Optional[List[str]] = None,
+        start: int = 0,
+        end: Optional[int] = None,
+        decimate: Optional[int] = None,
+        max_points: Optional[int] = None,
+    ) -> Optional[ECG]:
+        """
+        Retrieve an ECG by ID, see ECGService.get
+        :param ecg_id: ECG ID (uuid)
+        :param leads: Names of the leads to return, None for every lead
+        :param start: First sample of the window
+        :param end: Sample after the last one of the window, None for the end
+        :param decimate: Number of samples per min/max bucket
+        :param max_points: Maximum number of samples per lead
+        """
+        ecg_model = await self.repository.get(ecg_id, leads=leads)
+
+        if ecg_model is None:
+            return None
+
+        signals = await run_in_threadpool(
+            lambda: [
+                window_signal(lead.signal, start, end, decimate, max_points)
+                for lead in ecg_model.leads
+            ]
+        )
+        for lead, signal in zip(ecg_model.leads, signals):
+            lead.signal = signal
+
+        return ecg_model
+
+    @profiled
+    async def get_insights(self, ecg_id: str) -> Optional[Dict]:
+        """
+        Retrieve the owner and the insights of an ECG, without its signals
+        :param ecg_id: ECG ID (uuid)
+        """
+        return await self.repository.get_insights(ecg_id)
+
+    @profiled
+    async def process(self, leads: List[Dict], user_id: int) -> str:
+        """
+        Save an ECG to the repository
+        :param leads: List of lead data
+        :raises BackgroundTaskQueueFull: if insights can not be scheduled
+        """
+
+        signals = await run_in_threadpool(
+            lambda: [self.codec.encode(lead["signal"]) for lead in leads]
+        )
+
+        ecg_id = uuid.uuid4().hex
+        ecg = ECG(
+            ecg_id=ecg_id,
+            date=datetime.now(),
+            user_id=user_id,
+            leads=[
+                Lead(
+                    name=lead["name"],
+                    signal=signal,
+                    num_samples=lead.get("num_samples"),
+                )
+                for lead, signal in zip(leads, signals)
+            ],
+        )
+
+        # Reject the ECG before storing it if its insights can not be
+        # computed, the slot of its task is kept until it is added
+        with self.background_task.reserve() as background_task:
+            await self.repository.save(ecg)
+
+            # Some backends write to the database to schedule a task
+            await run_in_threadpool(
+                background_task.add_task, self.insights_task, ecg_id
+            )
+
+        return ecg_id
+
+    @profiled
+    async def compute_insights(self, ecg_id: str) -> None:
+        """
+        Run the registered analyzers whose result for an ECG is missing or
+        outdated, see ECGService.compute_insights
+        :param ecg_id: ECG ID (uuid)
+        """
+
+        logger.debug("Computing insights for ECG %s", ecg_id)
+        stored = await self.repository.get_insight_versions(ecg_id)
+        analyzers = pending_analyzers(stored)
+        if not analyzers:
+            return
+
+        ecg = await self.repository.get(ecg_id, leads=required_leads(analyzers))
+        results = await run_in_threadpool(
+            lambda: run_analyzers(
+                analyzers,
+                [(lead.name, decode_signal(lead.signal)) for lead in ecg.leads],
+            )
+        )
+
+        project_zero_crossings(ecg, results)
+        await self.repository.save_insights(
+            ecg, results, outdated=[name for name in results if name in stored]
+        )
@@ -1,25 +1,53 @@
+from typing import Optional
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from adapters.database.models import User, UserRole
 from adapters.database.repository import UserRepository
+from core.config import config
+from core.metrics import timed
+from services.credential_cache import CredentialCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBasic()
 
 
+@timed("auth")
+def verify_password_hash(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+@timed("auth")
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+# Verified credentials shared by every AuthService of the process
+credential_cache = CredentialCache(
+    ttl_seconds=config.AUTH_CACHE_TTL_SECONDS,
+    max_entries=config.AUTH_CACHE_MAX_ENTRIES,
+)
+
+
 class AuthService:
     """
     AuthService is a service class that provides
     authentication and user management functionality.
     """
 
-    def __init__(self, repository: UserRepository):
+    def __init__(
+        self,
+        repository: UserRepository,
+        credential_cache: Optional[CredentialCache] = None,
+    ):
         """
         :param repository: UserRepository instance to
         interact with the database
+        :param credential_cache: CredentialCache instance to skip the
+        verification of recently verified credentials
         """
         self.repository = repository
+        self.credential_cache = credential_cache
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """
@@ -27,14 +55,14 @@ class AuthService:
         :param plain_password: str - plain text password
         :param hashed_password: str - hashed password
         """
-        return pwd_context.verify(plain_password, hashed_password)
+        return verify_password_hash(plain_password, hashed_password)
 
     def get_password_hash(self, password: str) -> str:
         """
         Generate a hashed password
         :param password: str - plain text password
         """
-        return pwd_context.hash(password)
+        return hash_password(password)
 
     def get_user(self, username: str) -> User:
         """
@@ -60,12 +88,43 @@ class AuthService:
         self.repository.save(user)
         return user
 
+    def update_password(self, username: str, password: str) -> User:
+        """
+        Change the password of a user
+        :param username: str - username
+        :param password: str - new plain text password
+        """
+        user = self._get_existing_user(username)
+        user.hashed_password = self.get_password_hash(password)
+        # Refresh tokens issued before the change are no longer accepted
+        user.token_version = (user.token_version or 0) + 1
+        self.repository.save(user)
+        self._invalidate_credentials(username)
+        return user
+
+    def update_role(self, username: str, role: UserRole) -> User:
+        """
+        Change the role of a user
+        :param username: str - username
+        :param role: UserRole - new user role
+        """
+        user = self._get_existing_user(username)
+        user.role = role
+        self.repository.save(user)
+        self._invalidate_credentials(username)
+        return user
+
     def authenticate_user(self, credentials: HTTPBasicCredentials) -> User:
         """
         Authenticate a user using HTTPBasic credentials
         :param credentials: HTTPBasicCredentials - username and password
         """
 
+        if self.credential_cache is not None:
+            user = self.credential_cache.get(credentials.username, credentials.password)
+            if user is not None:
+                return user
+
         user = self.get_user(credentials.username)
         if not user or not self.verify_password(
             credentials.password, user.hashed_password
@@ -75,4 +134,17 @@ class AuthService:
                 detail="Invalid credentials",
                 headers={"WWW-Authenticate": "Basic"},
             )
+
+        if self.credential_cache is not None:
+            self.credential_cache.add(credentials.password, user)
         return user
+
+    def _get_existing_user(self, username: str) -> User:
+        user = self.get_user(username)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    def _invalidate_credentials(self, username: str):
+        if self.credential_cache is not None:
+            self.credential_cache.invalidate(username)
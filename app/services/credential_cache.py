@@ -0,0 +1,113 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from adapters.database.models import User
+
+
+class CredentialCache:
+    """
+    In-memory cache of verified credentials, so repeated requests
+    do not pay the cost of a bcrypt verification.
+    Entries are keyed on a keyed hash of the username and password, so
+    plain passwords are never stored, expire after `ttl_seconds` and are
+    evicted in LRU order once `max_entries` is reached.
+    The cache is local to the process: a password or role change only
+    invalidates the entries of the worker serving it, other workers
+    keep accepting the old credentials until their entries expire.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        """
+        :param ttl_seconds: Time an entry is valid for
+        :param max_entries: Maximum number of cached credentials
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._key = secrets.token_bytes(32)
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict]]" = OrderedDict()
+        self._keys_by_username: Dict[str, Set[bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, username: str, password: str) -> Optional[User]:
+        """
+        Retrieve the user of verified credentials
+        :param username: str - username
+        :param password: str - plain text password
+        """
+        key = self._hash(username, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key, username)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            user_data = entry[1]
+
+        # Return a new detached instance, never one bound to another session
+        return User(**user_data)
+
+    def add(self, password: str, user: User):
+        """
+        Cache verified credentials
+        :param password: str - plain text password
+        :param user: User - authenticated user
+        """
+        if self.max_entries <= 0:
+            return
+
+        key = self._hash(user.username, password)
+        user_data = {
+            "id": user.id,
+            "username": user.username,
+            "hashed_password": user.hashed_password,
+            "role": user.role,
+            "token_version": user.token_version,
+        }
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, user_data)
+            self._entries.move_to_end(key)
+            self._keys_by_username.setdefault(user.username, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest_key, (_, oldest_user) = next(iter(self._entries.items()))
+                self._remove(oldest_key, oldest_user["username"])
+
+    def invalidate(self, username: str):
+        """
+        Remove every cached credential of a user
+        :param username: str - username
+        """
+        with self._lock:
+            for key in self._keys_by_username.pop(username, set()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_username.clear()
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+    def _hash(self, username: str, password: str) -> bytes:
+        message = username.encode() + b"\0" + password.encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def _remove(self, key: bytes, username: str):
+        self._entries.pop(key, None)
+        keys = self._keys_by_username.get(username)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_username[username]
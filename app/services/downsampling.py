@@ -0,0 +1,63 @@
+import math
+from typing import Optional
+import numpy as np
+from adapters.database.codecs import decode_signal
+
+
+def bucket_size(
+    num_samples: int, decimate: Optional[int] = None, max_points: Optional[int] = None
+) -> int:
+    """
+    Number of samples reduced to a min/max pair by `min_max_downsample`.
+    The largest bucket required by either parameter is used.
+    :param num_samples: Number of samples to downsample
+    :param decimate: Number of samples per bucket
+    :param max_points: Maximum number of points to return, at least 2
+    """
+    size = decimate or 1
+    if max_points is not None:
+        size = max(size, math.ceil(num_samples / (max_points // 2)))
+    return size
+
+
+def min_max_downsample(signal: np.ndarray, size: int) -> np.ndarray:
+    """
+    Downsample a signal by keeping the minimum and the maximum of every
+    bucket of `size` samples, in the order they occur, so peaks such as
+    QRS complexes survive any downsampling factor.
+    :param signal: Samples of a lead
+    :param size: Number of samples per bucket
+    """
+    if size <= 1 or signal.size <= 2:
+        return signal
+
+    # Pad the last bucket with its last sample, it does not change its
+    # minimum or maximum
+    num_buckets = math.ceil(signal.size / size)
+    buckets = np.pad(signal, (0, num_buckets * size - signal.size), mode="edge")
+    buckets = buckets.reshape(num_buckets, size)
+
+    rows = np.arange(num_buckets)
+    first = np.minimum(buckets.argmin(axis=1), buckets.argmax(axis=1))
+    last = np.maximum(buckets.argmin(axis=1), buckets.argmax(axis=1))
+    pairs = np.column_stack((buckets[rows, first], buckets[rows, last]))
+    return pairs.ravel()
+
+
+def window_signal(
+    payload,
+    start: int = 0,
+    end: Optional[int] = None,
+    decimate: Optional[int] = None,
+    max_points: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Decode a window of a stored signal and downsample it
+    :param payload: Stored `Lead.signal` value, or a decoded signal
+    :param start: First sample of the window
+    :param end: Sample after the last one of the window, None for the end
+    :param decimate: Number of samples per min/max bucket
+    :param max_points: Maximum number of samples to return
+    """
+    signal = decode_signal(payload, start, end)
+    return min_max_downsample(signal, bucket_size(signal.size, decimate, max_points))
@@ -1,11 +1,29 @@
+import logging
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 from adapters.database.repository import ECGRepository
-from adapters.database.utils import signal_to_string, string_to_signal
+from adapters.database.codecs import (
+    SignalCodec,
+    SignalEncoder,
+    decode_signal,
+    get_codec,
+)
 from adapters.database.models import ECG, Lead
 from adapters.tasks.tasks import AbstractBackgroundTask
+from services.analyzers import (
+    pending_analyzers,
+    project_zero_crossings,
+    required_leads,
+    run_analyzers,
+)
+from services.downsampling import window_signal
+from services.pagination import decode_cursor, encode_cursor
+from core.config import config
+from core.profiling import profiled
 import uuid
 
+logger = logging.getLogger(__name__)
+
 
 class ECGService:
     """
@@ -13,76 +31,224 @@ class ECGService:
     """
 
     def __init__(
-        self, repository: ECGRepository, background_task: AbstractBackgroundTask
+        self,
+        repository: ECGRepository,
+        background_task: AbstractBackgroundTask,
+        codec: Optional[SignalCodec] = None,
+        insights_task: Optional[Callable[[str], None]] = None,
     ) -> None:
         """
         :param repository: ECG repository instance
         :param background_task: Background task instance to compute insights
         asynchronously
+        :param codec: Codec used to encode signals before storing them
+        :param insights_task: Task scheduled with the ECG ID to compute its
+        insights. Defaults to `compute_insights`, backends running in other
+        processes need a picklable function instead.
         """
         self.repository = repository
         self.background_task = background_task
-
-    def get(self, ecg_id: str) -> ECG:
+        self.codec = codec or get_codec(config.SIGNAL_CODEC)
+        self.insights_task = insights_task or self.compute_insights
+
+    @profiled
+    def get(
+        self,
+        ecg_id: str,
+        leads: Optional[List[str]] = None,
+        start: int = 0,
+        end: Optional[int] = None,
+        decimate: Optional[int] = None,
+        max_points: Optional[int] = None,
+    ) -> ECG:
         """
-        Retrieve an ECG by ID
+        Retrieve an ECG by ID, with its signals decoded into int32 arrays.
+        Archived signals are read-only views of the archive files.
+        Only the requested leads and window are decoded, then the window is
+        downsampled to the min/max envelope of buckets of samples.
         :param ecg_id: ECG ID (uuid)
+        :param leads: Names of the leads to return, None for every lead
+        :param start: First sample of the window
+        :param end: Sample after the last one of the window, None for the end
+        :param decimate: Number of samples per min/max bucket
+        :param max_points: Maximum number of samples per lead
         """
 
-        ecg_model = self.repository.get(ecg_id)
-
-        for lead in ecg_model.leads:
-            lead.signal = string_to_signal(lead.signal)
+        ecg_model = self.repository.get(ecg_id, leads=leads)
 
         if ecg_model is None:
             return None
 
+        for lead in ecg_model.leads:
+            lead.signal = window_signal(
+                lead.signal, start, end, decimate=decimate, max_points=max_points
+            )
+
         return ecg_model
 
+    @profiled
+    def get_insights(self, ecg_id: str) -> Optional[Dict]:
+        """
+        Retrieve the owner and the insights of an ECG, without its signals
+        :param ecg_id: ECG ID (uuid)
+        """
+        return self.repository.get_insights(ecg_id)
+
+    @profiled
+    def list_for_user(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        include_insights: bool = False,
+    ) -> Dict:
+        """
+        List the ECGs of a user, newest first, without their signals.
+        Returns a page of ECGs and the cursor of the next page, None on the
+        last page.
+        :param user_id: User ID
+        :param limit: Maximum number of ECGs
+        :param cursor: Cursor of the page, None for the first page
+        :param date_from: Only list ECGs recorded at or after this date
+        :param date_to: Only list ECGs recorded before this date
+        :param include_insights: Load the insights of the leads
+        :raises ValueError: if the cursor is invalid
+        """
+        after = decode_cursor(cursor) if cursor is not None else None
+        # One more ECG tells whether there is a next page
+        ecgs = self.repository.list_for_user(
+            user_id, limit + 1, after, date_from, date_to, include_insights
+        )
+
+        next_cursor = None
+        if len(ecgs) > limit:
+            ecgs = ecgs[:limit]
+            next_cursor = encode_cursor(ecgs[-1].date, ecgs[-1].id)
+        return {"ecgs": ecgs, "next_cursor": next_cursor}
+
+    @profiled
     def process(self, leads: List[Dict], user_id: int) -> str:
         """
         Save an ECG to the repository
         :param leads: List of lead data
+        :raises BackgroundTaskQueueFull: if insights can not be scheduled
+        """
+        return self.process_encoded(
+            leads=[
+                {**lead, "signal": self.codec.encode(lead["signal"])} for lead in leads
+            ],
+            user_id=user_id,
+        )
+
+    @profiled
+    def process_many(self, ecgs: List[List[Dict]], user_id: int) -> List[Dict]:
+        """
+        Save several ECGs to the repository at once.
+        ECGs whose signals can not be encoded are skipped, the others are
+        stored in bulk and their insights are scheduled as a single batch.
+        Returns the ECG ID or the error of every ECG, in order.
+        :param ecgs: List of lead data of every ECG
+        :raises BackgroundTaskQueueFull: if insights can not be scheduled
+        """
+        results = []
+        ecg_models = []
+        now = datetime.now()
+        for leads in ecgs:
+            try:
+                ecg = ECG(
+                    ecg_id=uuid.uuid4().hex,
+                    date=now,
+                    user_id=user_id,
+                    leads=[
+                        Lead(
+                            name=lead["name"],
+                            signal=self.codec.encode(lead["signal"]),
+                            num_samples=lead.get("num_samples"),
+                        )
+                        for lead in leads
+                    ],
+                )
+            except ValueError as e:
+                results.append({"ecg_id": None, "error": str(e)})
+                continue
+
+            ecg_models.append(ecg)
+            results.append({"ecg_id": ecg.ecg_id, "error": None})
+
+        if not ecg_models:
+            return results
+
+        # The slots of every task are kept until they are added
+        with self.background_task.reserve(len(ecg_models)) as background_task:
+            self.repository.save_many(ecg_models)
+
+            background_task.add_tasks(
+                self.insights_task, [(ecg.ecg_id,) for ecg in ecg_models]
+            )
+
+        return results
+
+    def signal_encoder(self) -> SignalEncoder:
+        """
+        Create an encoder to receive the signal of a lead in chunks.
+        Its payload can be stored with `process_encoded`.
+        """
+        return self.codec.encoder()
+
+    @profiled
+    def process_encoded(self, leads: List[Dict], user_id: int) -> str:
+        """
+        Save an ECG whose signals are already encoded to the repository
+        :param leads: List of lead data with encoded signals
+        :raises BackgroundTaskQueueFull: if insights can not be scheduled
         """
 
         # Create Lead instances from incoming lead data
         leads = [
             Lead(
                 name=lead["name"],
-                signal=signal_to_string(lead["signal"]),
+                signal=lead["signal"],
                 num_samples=lead.get("num_samples"),
             )
             for lead in leads
         ]
 
-        # Create an ECG instance
-        ecg = ECG(
-            ecg_id=uuid.uuid4().hex, date=datetime.now(), leads=leads, user_id=user_id
-        )
+        # Create an ECG instance. Its ID is kept aside, reading it from the
+        # instance once saved would reload the expired instance.
+        ecg_id = uuid.uuid4().hex
+        ecg = ECG(ecg_id=ecg_id, date=datetime.now(), leads=leads, user_id=user_id)
 
-        self.repository.save(ecg)
+        # Reject the ECG before storing it if its insights can not be
+        # computed, the slot of its task is kept until it is added
+        with self.background_task.reserve() as background_task:
+            self.repository.save(ecg)
 
-        # Add a background task to compute insights
-        self.background_task.add_task(self.compute_insights, ecg.ecg_id)
+            # Add a background task to compute insights
+            background_task.add_task(self.insights_task, ecg_id)
 
-        return ecg.ecg_id
+        return ecg_id
 
+    @profiled
     def compute_insights(self, ecg_id: str) -> None:
         """
-        Compute insights for an ECG
-        :param ecg: ECG instance
+        Run the registered analyzers whose result for an ECG is missing or
+        outdated. The leads they need are decoded once for all of them.
+        :param ecg_id: ECG ID (uuid)
         """
 
-        print(f"Computing insights for ECG {ecg_id}")
-        ecg = self.repository.get(ecg_id)
-
-        # Compute zero crossings for each lead and save it to the DB
-        for lead in ecg.leads:
-            lead.zero_crossings = 0
+        logger.debug("Computing insights for ECG %s", ecg_id)
+        stored = self.repository.get_insight_versions(ecg_id)
+        analyzers = pending_analyzers(stored)
+        if not analyzers:
+            return
 
-            signal = string_to_signal(lead.signal)
-            for i in range(1, len(signal)):
-                if signal[i - 1] * signal[i] < 0:
-                    lead.zero_crossings += 1
+        ecg = self.repository.get(ecg_id, leads=required_leads(analyzers))
+        signals = [(lead.name, decode_signal(lead.signal)) for lead in ecg.leads]
+        results = run_analyzers(analyzers, signals)
 
-        self.repository.save(ecg)
+        project_zero_crossings(ecg, results)
+        self.repository.save_insights(
+            ecg, results, outdated=[name for name in results if name in stored]
+        )
@@ -0,0 +1,29 @@
+from typing import List, Sequence
+import numpy as np
+
+
+def zero_crossings(signals: np.ndarray) -> np.ndarray:
+    """
+    Count the zero crossings of every row of a 2-D array of signals.
+    A crossing is a sign change between two consecutive samples,
+    so samples equal to zero never count as a crossing.
+    :param signals: Array of shape (leads, samples)
+    """
+    signs = np.sign(np.atleast_2d(signals)).astype(np.int8)
+    return np.count_nonzero(signs[:, 1:] * signs[:, :-1] < 0, axis=1)
+
+
+def lead_zero_crossings(signals: Sequence[np.ndarray]) -> List[int]:
+    """
+    Count the zero crossings of each lead of an ECG.
+    Leads with the same length are stacked and processed in a single pass,
+    otherwise every lead is processed on its own.
+    :param signals: Decoded signal of each lead
+    """
+    if not signals:
+        return []
+
+    if len({len(signal) for signal in signals}) == 1:
+        return zero_crossings(np.vstack(signals)).tolist()
+
+    return [int(zero_crossings(signal)[0]) for signal in signals]
@@ -0,0 +1,26 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(date: datetime, id: int) -> str:
+    """
+    Opaque cursor of the position after an ECG in a listing
+    :param date: Date of the last listed ECG
+    :param id: Primary key of the last listed ECG
+    """
+    return base64.urlsafe_b64encode(f"{date.isoformat()}|{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Date and primary key of the last ECG of the previous page
+    :param cursor: Cursor returned by `encode_cursor`
+    :raises ValueError: if the cursor is invalid
+    """
+    try:
+        date, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(date), int(id)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
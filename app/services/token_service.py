@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Dict
+from fastapi import HTTPException, status
+from adapters.database.models import User, UserRole
+
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
+# Tokens use the JWT compact format, signed with HMAC-SHA256 (HS256)
+TOKEN_HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+def b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenService:
+    """
+    TokenService is a service class that issues and verifies
+    short-lived signed tokens. Verification only needs the secret key,
+    the user ID and role are read from the token claims.
+    """
+
+    def __init__(
+        self, secret_key: str, access_ttl_seconds: int, refresh_ttl_seconds: int
+    ):
+        """
+        :param secret_key: str - key used to sign the tokens
+        :param access_ttl_seconds: int - lifetime of access tokens
+        :param refresh_ttl_seconds: int - lifetime of refresh tokens
+        """
+        self.secret_key = secret_key.encode()
+        self.ttl_seconds = {
+            ACCESS_TOKEN: access_ttl_seconds,
+            REFRESH_TOKEN: refresh_ttl_seconds,
+        }
+        self._encoded_header = b64encode(
+            json.dumps(TOKEN_HEADER, separators=(",", ":")).encode()
+        )
+
+    def create_token(self, user: User, token_type: str) -> str:
+        """
+        Create a signed token for a user
+        :param user: User - authenticated user
+        :param token_type: str - ACCESS_TOKEN or REFRESH_TOKEN
+        """
+        now = int(time.time())
+        claims = {
+            "sub": user.username,
+            "uid": user.id,
+            "role": UserRole(user.role).value,
+            "ver": user.token_version or 0,
+            "type": token_type,
+            "iat": now,
+            "exp": now + self.ttl_seconds[token_type],
+        }
+        payload = b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        signing_input = f"{self._encoded_header}.{payload}"
+        return f"{signing_input}.{self._sign(signing_input)}"
+
+    def create_token_pair(self, user: User) -> Dict:
+        """
+        Create an access token and a refresh token for a user
+        :param user: User - authenticated user
+        """
+        return {
+            "access_token": self.create_token(user, ACCESS_TOKEN),
+            "refresh_token": self.create_token(user, REFRESH_TOKEN),
+            "token_type": "bearer",
+            "expires_in": self.ttl_seconds[ACCESS_TOKEN],
+        }
+
+    def verify_token(self, token: str, token_type: str = ACCESS_TOKEN) -> Dict:
+        """
+        Verify a token and return its claims
+        :param token: str - signed token
+        :param token_type: str - expected token type
+        """
+        try:
+            header, payload, signature = token.split(".")
+            signing_input = f"{header}.{payload}"
+            if header != self._encoded_header or not hmac.compare_digest(
+                signature, self._sign(signing_input)
+            ):
+                raise ValueError("Invalid signature")
+            claims = json.loads(b64decode(payload))
+        except (TypeError, ValueError) as e:
+            raise self._invalid_token() from e
+
+        if claims.get("type") != token_type or claims.get("exp", 0) < time.time():
+            raise self._invalid_token()
+        return claims
+
+    def authenticate_token(self, token: str) -> User:
+        """
+        Authenticate a user using an access token
+        :param token: str - signed access token
+        """
+        claims = self.verify_token(token, ACCESS_TOKEN)
+        return User(
+            id=claims["uid"], username=claims["sub"], role=UserRole(claims["role"])
+        )
+
+    def _sign(self, signing_input: str) -> str:
+        return b64encode(
+            hmac.new(self.secret_key, signing_input.encode(), hashlib.sha256).digest()
+        )
+
+    def _invalid_token(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,22 @@
+import pytest
+from adapters.database.orm import create_admin_user, get_engine
+from adapters.database.schema import ensure_schema
+from core.config import config
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database(tmp_path_factory):
+    """
+    Tests against the app use a throwaway database, with the default
+    admin user, as after running create_admin.py. The engine is created
+    on first use, after DATABASE_URL points to it.
+    """
+    config.DATABASE_URL = f"sqlite:///{tmp_path_factory.mktemp('db')}/test.db"
+    config.ASYNC_DATABASE_URL = None
+    ensure_schema(get_engine())
+    create_admin_user()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def secret_key():
+    config.AUTH_SECRET_KEY = "test-secret-key"
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from adapters.database.codecs import get_codec
+from adapters.database.models import Base, ECG, Lead
+from adapters.database.repository import DatabaseECGRepository
+from services import analyzers
+from services.analyzers import (
+    Analyzer,
+    ZeroCrossingsAnalyzer,
+    analyzer_versions,
+    pending_analyzers,
+    register_analyzer,
+    required_leads,
+    run_analyzers,
+)
+from services.ecg_service import ECGService
+from tests.test_ecg_service import MockBackgroundTask, MockECGRepository
+
+
+class PeakAnalyzer(Analyzer):
+    name = "peak"
+    version = 1
+    leads = ("II",)
+
+    def __init__(self):
+        self.calls = 0
+
+    def analyze(self, signals):
+        self.calls += 1
+        return int(np.abs(dict(signals)["II"]).max())
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(analyzers, "ANALYZERS", {})
+    register_analyzer(ZeroCrossingsAnalyzer())
+    return register_analyzer(PeakAnalyzer())
+
+
+def test_pending_analyzers(registry):
+    assert analyzer_versions() == {"zero_crossings": 1, "peak": 1}
+    assert [a.name for a in pending_analyzers({})] == ["zero_crossings", "peak"]
+    assert [a.name for a in pending_analyzers({"zero_crossings": 1})] == ["peak"]
+    # Results of an older version are outdated
+    assert [a.name for a in pending_analyzers({"zero_crossings": 1, "peak": 0})] == [
+        "peak"
+    ]
+    assert pending_analyzers({"zero_crossings": 1, "peak": 1}) == []
+
+
+def test_required_leads(registry):
+    assert required_leads([registry]) == ("II",)
+    assert required_leads(pending_analyzers({})) is None
+
+
+def test_run_analyzers_skips_missing_leads(registry):
+    signals = [("I", np.array([1, -1, 1], dtype=np.int32))]
+
+    results = run_analyzers(pending_analyzers({}), signals)
+
+    assert results == {"zero_crossings": (1, [2]), "peak": (1, None)}
+    assert not signals[0][1].flags.writeable
+
+
+def test_compute_insights_only_runs_pending_analyzers(registry):
+    codec = get_codec("binary")
+    repository = MockECGRepository()
+    repository.save(
+        ECG(
+            ecg_id="ecg",
+            user_id=1,
+            leads=[
+                Lead(name="I", signal=codec.encode([1, -1, 1])),
+                Lead(name="II", signal=codec.encode([2, -5, 3])),
+            ],
+        )
+    )
+    ecg_service = ECGService(repository, MockBackgroundTask())
+
+    ecg_service.compute_insights("ecg")
+    assert repository.insights["ecg"] == {
+        "zero_crossings": (1, [2, 2]),
+        "peak": (1, 5),
+    }
+    assert repository.ecgs["ecg"].leads[1].zero_crossings == 2
+
+    # Up to date: nothing is loaded nor computed again
+    ecg_service.compute_insights("ecg")
+    assert registry.calls == 1
+
+    registry.version = 2
+    ecg_service.compute_insights("ecg")
+    assert registry.calls == 2
+    assert repository.insights["ecg"]["peak"] == (2, 5)
+
+
+def test_compute_insights_leads_with_the_same_name():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db_session = sessionmaker(bind=engine)()
+    codec = get_codec("binary")
+    repository = DatabaseECGRepository(db_session)
+    repository.save(
+        ECG(
+            ecg_id="ecg",
+            user_id=1,
+            leads=[
+                Lead(name="I", signal=codec.encode([1, -1, 2])),
+                Lead(name="I", signal=codec.encode([1, 2, 3])),
+            ],
+        )
+    )
+
+    ECGService(repository, MockBackgroundTask()).compute_insights("ecg")
+
+    db_session.expire_all()
+    leads = db_session.query(Lead).order_by(Lead.id).all()
+    assert [lead.zero_crossings for lead in leads] == [2, 0]
+    db_session.close()
@@ -1,13 +1,17 @@
+import numpy as np
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from unittest.mock import Mock
 from datetime import datetime
 from uuid import uuid4
 from base64 import b64encode
 from main import app
-from adapters.api.schemas import ECGRequestSchema, LeadRequestSchema, LeadResponseSchema
+from adapters.api.schemas import ECGRequestSchema, LeadRequestSchema
 from adapters.api.dependencies import get_ecg_service, get_auth_service
-from adapters.database.models import User, UserRole
+from adapters.database.models import Lead, User, UserRole
+from adapters.tasks.tasks import BackgroundTaskQueueFull
+from adapters.database.codecs import decode_signal, get_codec
 
 client = TestClient(app)
 
@@ -61,8 +65,8 @@ def test_get_ecg_success(
         date=datetime.now(),
         user_id=mock_user.id,
         leads=[
-            LeadResponseSchema(name="I", signal=[1, -1, 2, -2], num_samples=4),
-            LeadResponseSchema(name="II", signal=[3, -3, 4, -4], num_samples=4),
+            Lead(name="I", signal=np.array([1, -1, 2, -2]), num_samples=4),
+            Lead(name="II", signal=np.array([3, -3, 4, -4]), num_samples=4),
         ],
     )
 
@@ -74,6 +78,98 @@ def test_get_ecg_success(
     assert len(data["leads"]) == 2
 
 
+def test_get_ecg_window(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.get.return_value = Mock(
+        ecg_id="ecg",
+        date=datetime.now(),
+        user_id=mock_user.id,
+        leads=[Lead(name="II", signal=np.array([3, -3]), num_samples=4)],
+    )
+
+    response = client.get(
+        "/ecg/ecg?leads=II,V1&leads=V2&start=2&end=10&max_points=2",
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 200
+    assert response.json()["leads"][0]["signal"] == [3, -3]
+    mock_ecg_service.get.assert_called_once_with(
+        ecg_id="ecg",
+        leads=["II", "V1", "V2"],
+        start=2,
+        end=10,
+        decimate=None,
+        max_points=2,
+    )
+
+
+@pytest.mark.parametrize(
+    "query", ["start=5&end=2", "start=-1", "decimate=0", "max_points=1"]
+)
+def test_get_ecg_invalid_window(
+    query, mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+
+    response = client.get(f"/ecg/ecg?{query}", headers=user_auth_headers)
+
+    assert response.status_code == 422
+    mock_ecg_service.get.assert_not_called()
+
+
+@pytest.fixture
+def mock_long_ecg(mock_ecg_service, mock_auth_service, mock_user):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.get.return_value = Mock(
+        ecg_id="ecg",
+        date=datetime.now(),
+        user_id=mock_user.id,
+        leads=[Lead(name="I", signal=np.arange(5000, dtype=np.int32))],
+    )
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_get_ecg_compressed(mock_long_ecg, user_auth_headers, encoding):
+    response = client.get(
+        "/ecg/ecg", headers={**user_auth_headers, "Accept-Encoding": encoding}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == encoding
+    assert response.json()["leads"][0]["signal"] == list(range(5000))
+
+
+def test_get_ecg_raw(mock_long_ecg, user_auth_headers):
+    response = client.get(
+        "/ecg/ecg", headers={**user_auth_headers, "Accept": "application/vnd.ecg.raw"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.ecg.raw"
+    assert "Accept" in response.headers["vary"]
+    assert np.frombuffer(response.content[-20000:], "<i4").tolist() == list(range(5000))
+
+
+def test_get_ecg_not_acceptable(mock_long_ecg, user_auth_headers):
+    response = client.get(
+        "/ecg/ecg", headers={**user_auth_headers, "Accept": "text/html"}
+    )
+
+    assert response.status_code == 406
+
+
+def test_get_ecg_openapi_schema():
+    responses = app.openapi()["paths"]["/ecg/{ecg_id}"]["get"]["responses"]
+
+    assert responses["200"]["content"]["application/json"]["schema"] == {
+        "$ref": "#/components/schemas/ECGResponseSchema"
+    }
+    assert "application/vnd.ecg.raw" in responses["200"]["content"]
+
+
 def test_get_ecg_unauthorized(mock_ecg_service):
     ecg_id = str(uuid4())
     response = client.get(f"/ecg/{ecg_id}")
@@ -102,6 +198,33 @@ def test_get_ecg_wrong_user(
     assert response.status_code == 404
 
 
+def test_get_ecg_insights_success(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.get_insights.return_value = {
+        "user_id": mock_user.id,
+        "leads": [{"name": "I", "zero_crossings": 3}],
+    }
+
+    response = client.get("/ecg/ecg/insights", headers=user_auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"leads": [{"name": "I", "zero_crossings": 3}]}
+    mock_ecg_service.get.assert_not_called()
+
+
+def test_get_ecg_insights_wrong_user(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.get_insights.return_value = {"user_id": 999, "leads": []}
+
+    response = client.get("/ecg/ecg/insights", headers=user_auth_headers)
+
+    assert response.status_code == 404
+
+
 def test_upload_ecg_success(
     mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
 ):
@@ -119,16 +242,382 @@ def test_upload_ecg_success(
     )
 
     response = client.post(
-        "/ecg/", json=ecg_data.model_dump(), headers=user_auth_headers
+        "/ecg/", json=ecg_data.model_dump(mode="json"), headers=user_auth_headers
     )
 
     assert response.status_code == 201
     assert response.json() == {"ecg_id": ecg_id}
 
-    mock_ecg_service.process.assert_called_once_with(
-        leads=[lead.model_dump() for lead in ecg_data.leads], user_id=mock_user.id
+    # Signals are passed through as the int32 arrays parsed from the body
+    call = mock_ecg_service.process.call_args
+    assert call.kwargs["user_id"] == mock_user.id
+    leads = call.kwargs["leads"]
+    assert [lead["name"] for lead in leads] == ["I", "II"]
+    assert [lead["num_samples"] for lead in leads] == [4, 4]
+    assert leads[0]["signal"].dtype == np.int32
+    assert leads[1]["signal"].tolist() == [3, -3, 4, -4]
+
+
+@pytest.mark.parametrize(
+    "lead",
+    [
+        {"name": "I", "signal": [1, 2], "num_samples": 3},
+        {"name": "I", "signal": [1, 2.5]},
+        {"name": "I", "signal": [1, "2"]},
+        {"name": "I", "signal": [[1, 2]]},
+        {"name": "I", "signal": [2**31]},
+        {"name": "I", "signal": [2**70]},
+        {"name": "I", "signal": "1,2"},
+    ],
+)
+def test_upload_ecg_invalid_signal(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers, lead
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+
+    response = client.post("/ecg/", json={"leads": [lead]}, headers=user_auth_headers)
+
+    assert response.status_code == 422
+    mock_ecg_service.process.assert_not_called()
+
+
+def test_upload_ecg_invalid_signal_input_is_truncated(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+
+    response = client.post(
+        "/ecg/",
+        json={"leads": [{"name": "I", "signal": [0.5] * 10000}]},
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 422
+    error = response.json()["detail"][0]
+    assert error["loc"] == ["body", "leads", 0, "signal"]
+    assert error["input"] == [0.5] * 10 + ["..."]
+
+
+def test_upload_ecg_int16_signal(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers, monkeypatch
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.process.return_value = "ecg"
+    monkeypatch.setattr("core.config.config.SIGNAL_SAMPLE_DTYPE", "int16")
+
+    for sample, status_code in ((-(2**15), 201), (2**15, 422)):
+        response = client.post(
+            "/ecg/",
+            json={"leads": [{"name": "I", "signal": [sample]}]},
+            headers=user_auth_headers,
+        )
+        assert response.status_code == status_code
+
+
+def test_upload_ecg_openapi_signal_schema():
+    schema = client.get("/openapi.json").json()["components"]["schemas"]
+    assert schema["LeadRequestSchema"]["properties"]["signal"] == {
+        "type": "array",
+        "items": {"type": "integer"},
+        "title": "Signal",
+    }
+
+
+def test_upload_ecg_queue_full(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.process.side_effect = BackgroundTaskQueueFull()
+
+    response = client.post(
+        "/ecg/",
+        json={"leads": [{"name": "I", "signal": [1, -1]}]},
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_upload_ecg_stream_success(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.signal_encoder.side_effect = get_codec("binary-delta-zlib").encoder
+    ecg_id = str(uuid4())
+    mock_ecg_service.process_encoded.return_value = ecg_id
+
+    frames = (
+        b'{"name": "I", "signal": [1, -1]}\n'
+        b'{"name": "II", "signal": [3, -3, 4]}\n'
+        b'{"name": "I", "signal": [2, -2], "num_samples": 4}\n'
+    )
+    response = client.post(
+        "/ecg/stream",
+        content=(frames[i : i + 7] for i in range(0, len(frames), 7)),
+        headers={**user_auth_headers, "Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 201
+    assert response.json() == {"ecg_id": ecg_id}
+
+    leads = mock_ecg_service.process_encoded.call_args.kwargs["leads"]
+    assert [lead["name"] for lead in leads] == ["I", "II"]
+    assert decode_signal(leads[0]["signal"]).tolist() == [1, -1, 2, -2]
+    assert decode_signal(leads[1]["signal"]).tolist() == [3, -3, 4]
+    assert leads[0]["num_samples"] == 4
+    assert leads[1]["num_samples"] is None
+
+
+def test_upload_ecg_stream_invalid_frame(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+
+    response = client.post(
+        "/ecg/stream",
+        content=b'{"name": "I", "signal": ["a"]}\n',
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 422
+    mock_ecg_service.process_encoded.assert_not_called()
+
+
+def test_upload_ecg_stream_num_samples_mismatch(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.signal_encoder.side_effect = get_codec("binary").encoder
+
+    response = client.post(
+        "/ecg/stream",
+        content=b'{"name": "I", "signal": [1, -1], "num_samples": 3}\n',
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 422
+    mock_ecg_service.process_encoded.assert_not_called()
+
+
+def test_upload_ecg_stream_frame_too_large(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers, monkeypatch
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    monkeypatch.setattr("core.config.config.STREAM_MAX_FRAME_BYTES", 16)
+
+    response = client.post(
+        "/ecg/stream",
+        content=b'{"name": "I", "signal": [1, 2, 3, 4, 5, 6]}\n',
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("content_length", ["abc", "-1"])
+def test_upload_ecg_stream_invalid_content_length(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers, content_length
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+
+    response = client.post(
+        "/ecg/stream",
+        content=b'{"name": "I", "signal": [1]}\n',
+        headers={**user_auth_headers, "content-length": content_length},
+    )
+
+    assert response.status_code == 400
+    mock_ecg_service.process_encoded.assert_not_called()
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_upload_ecg_stream_body_too_large(
+    mock_ecg_service,
+    mock_auth_service,
+    mock_user,
+    user_auth_headers,
+    monkeypatch,
+    chunked,
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.signal_encoder.side_effect = get_codec("binary").encoder
+    monkeypatch.setattr("core.config.config.STREAM_MAX_BODY_BYTES", 64)
+
+    frames = b'{"name": "I", "signal": [1, -1]}\n' * 4
+    response = client.post(
+        "/ecg/stream",
+        # Chunked bodies have no Content-Length, they are counted as read
+        content=iter([frames]) if chunked else frames,
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 413
+    mock_ecg_service.process_encoded.assert_not_called()
+
+
+def test_upload_ecg_batch(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.process_many.return_value = [
+        {"ecg_id": "first", "error": None},
+        {"ecg_id": "second", "error": None},
+    ]
+
+    response = client.post(
+        "/ecg/batch",
+        json={
+            "ecgs": [
+                {"leads": [{"name": "I", "signal": [1, -1]}]},
+                {"leads": [{"name": "I", "signal": ["a"]}]},
+                {"leads": [{"name": "II", "signal": [2, -2]}]},
+            ]
+        },
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 201
+    results = response.json()["results"]
+    assert results[0] == {"ecg_id": "first", "error": None}
+    assert results[1]["ecg_id"] is None and results[1]["error"]
+    assert results[2] == {"ecg_id": "second", "error": None}
+
+    ecgs = mock_ecg_service.process_many.call_args.kwargs["ecgs"]
+    assert [ecg[0]["name"] for ecg in ecgs] == ["I", "II"]
+
+
+def test_upload_ecg_batch_too_large(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers, monkeypatch
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    monkeypatch.setattr("core.config.config.ECG_BATCH_MAX_SIZE", 1)
+
+    response = client.post(
+        "/ecg/batch",
+        json={"ecgs": [{"leads": []}, {"leads": []}]},
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 413
+
+
+def test_upload_and_get_ecg(admin_auth_headers):
+    # Uses the real services and database
+    response = client.post(
+        "/ecg/",
+        json={"leads": [{"name": "I", "signal": [1, -1, 2], "num_samples": 3}]},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == 201
+    ecg_id = response.json()["ecg_id"]
+
+    response = client.get(f"/ecg/{ecg_id}", headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert response.json()["leads"][0]["signal"] == [1, -1, 2]
+
+    response = client.get(f"/ecg/{ecg_id}/insights", headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"leads": [{"name": "I", "zero_crossings": 2}]}
+
+
+def test_get_pending_insights(admin_auth_headers, monkeypatch):
+    # Queued insights are only computed once a worker runs the job
+    monkeypatch.setattr("core.config.config.BACKGROUND_TASK_BACKEND", "queue")
+    response = client.post(
+        "/ecg/",
+        json={"leads": [{"name": "I", "signal": [1, -1, 2], "num_samples": 3}]},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == 201
+    ecg_id = response.json()["ecg_id"]
+
+    response = client.get(f"/ecg/{ecg_id}/insights", headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"leads": [{"name": "I", "zero_crossings": None}]}
+
+
+def test_login_and_use_bearer_token(mock_ecg_service, mock_auth_service, mock_user):
+    mock_auth_service.authenticate_user.return_value = mock_user
+
+    response = client.post(
+        "/auth/login", json={"username": "testuser", "password": "password123"}
+    )
+
+    assert response.status_code == 200
+    tokens = response.json()
+    assert tokens["token_type"] == "bearer"
+
+    mock_auth_service.reset_mock()
+    mock_ecg_service.get.return_value = Mock(
+        ecg_id="ecg", date=datetime.now(), user_id=mock_user.id, leads=[]
     )
 
+    response = client.get(
+        "/ecg/ecg", headers={"Authorization": f"Bearer {tokens['access_token']}"}
+    )
+
+    assert response.status_code == 200
+    # The password and the user are not checked again
+    mock_auth_service.authenticate_user.assert_not_called()
+    mock_auth_service.get_user.assert_not_called()
+
+
+def test_refresh_token(mock_auth_service, mock_user, mock_admin):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    tokens = client.post(
+        "/auth/login", json={"username": "testuser", "password": "password123"}
+    ).json()
+
+    # The role of the user changed after the login
+    mock_auth_service.get_user.return_value = mock_admin
+    response = client.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+
+    assert response.status_code == 200
+    response = client.post(
+        "/users/",
+        json={"username": "newuser", "password": "password123"},
+        headers={"Authorization": f"Bearer {response.json()['access_token']}"},
+    )
+    assert response.status_code == 201
+
+
+def test_refresh_with_access_token(mock_auth_service, mock_user):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    tokens = client.post(
+        "/auth/login", json={"username": "testuser", "password": "password123"}
+    ).json()
+
+    response = client.post(
+        "/auth/refresh", json={"refresh_token": tokens["access_token"]}
+    )
+
+    assert response.status_code == 401
+
+
+def test_refresh_after_password_change(mock_auth_service, mock_user):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    tokens = client.post(
+        "/auth/login", json={"username": "testuser", "password": "password123"}
+    ).json()
+
+    mock_auth_service.get_user.return_value = User(
+        id=1, username="testuser", role=UserRole.USER, token_version=1
+    )
+    response = client.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+
+    assert response.status_code == 401
+
+
+def test_get_ecg_invalid_bearer_token(mock_ecg_service):
+    response = client.get("/ecg/ecg", headers={"Authorization": "Bearer invalid"})
+
+    assert response.status_code == 401
+
 
 def test_create_user_admin_success(mock_auth_service, mock_admin, admin_auth_headers):
     # Prepare mock authentication
@@ -159,3 +648,104 @@ def test_create_user_unauthorized(mock_auth_service, mock_user, user_auth_header
     )
 
     assert response.status_code == 403
+
+
+def test_update_password(mock_auth_service, mock_user, user_auth_headers):
+    mock_auth_service.authenticate_user.return_value = mock_user
+
+    response = client.put(
+        "/users/me/password",
+        json={"current_password": "password123", "new_password": "newpassword"},
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 200
+    mock_auth_service.update_password.assert_called_once_with("testuser", "newpassword")
+
+
+def test_update_password_wrong_current_password(
+    mock_auth_service, mock_user, user_auth_headers
+):
+    # The credentials of the request are valid, the confirmation is not
+    mock_auth_service.authenticate_user.side_effect = [
+        mock_user,
+        HTTPException(status_code=401, detail="Invalid credentials"),
+    ]
+
+    response = client.put(
+        "/users/me/password",
+        json={"current_password": "wrong", "new_password": "newpassword"},
+        headers=user_auth_headers,
+    )
+
+    assert response.status_code == 401
+    mock_auth_service.update_password.assert_not_called()
+
+
+def test_update_role(mock_auth_service, mock_admin, admin_auth_headers):
+    mock_auth_service.authenticate_user.return_value = mock_admin
+    mock_auth_service.update_role.return_value = User(
+        username="testuser", role=UserRole.ADMIN
+    )
+
+    response = client.put(
+        "/users/testuser/role", json={"role": "admin"}, headers=admin_auth_headers
+    )
+
+    assert response.status_code == 200
+    mock_auth_service.update_role.assert_called_once_with("testuser", UserRole.ADMIN)
+
+
+def test_update_role_unauthorized(mock_auth_service, mock_user, user_auth_headers):
+    mock_auth_service.authenticate_user.return_value = mock_user
+
+    response = client.put(
+        "/users/testuser/role", json={"role": "admin"}, headers=user_auth_headers
+    )
+
+    assert response.status_code == 403
+    mock_auth_service.update_role.assert_not_called()
+
+
+def test_list_ecgs(mock_ecg_service, mock_auth_service, mock_user, user_auth_headers):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    date = datetime(2024, 1, 2, 3, 4, 5)
+    mock_ecg_service.list_for_user.return_value = {
+        "ecgs": [
+            Mock(ecg_id="ecg", date=date, leads=[Lead(name="I", zero_crossings=None)])
+        ],
+        "next_cursor": "cursor",
+    }
+
+    response = client.get(
+        "/ecg?limit=1&date_from=2024-01-01T00:00:00", headers=user_auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "ecgs": [{"ecg_id": "ecg", "date": "2024-01-02T03:04:05"}],
+        "next_cursor": "cursor",
+    }
+    mock_ecg_service.list_for_user.assert_called_once_with(
+        mock_user.id,
+        1,
+        cursor=None,
+        date_from=datetime(2024, 1, 1),
+        date_to=None,
+        include_insights=False,
+    )
+
+    response = client.get("/ecg?include_insights=true", headers=user_auth_headers)
+    assert response.json()["ecgs"][0]["leads"] == [
+        {"name": "I", "zero_crossings": None}
+    ]
+
+
+def test_list_ecgs_invalid_cursor(
+    mock_ecg_service, mock_auth_service, mock_user, user_auth_headers
+):
+    mock_auth_service.authenticate_user.return_value = mock_user
+    mock_ecg_service.list_for_user.side_effect = ValueError("Invalid cursor")
+
+    response = client.get("/ecg?cursor=invalid", headers=user_auth_headers)
+
+    assert response.status_code == 422
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from adapters.database.archive import SignalArchive
+from adapters.database.codecs import (
+    CODECS,
+    ArchiveSignalCodec,
+    decode_signal,
+    is_legacy_payload,
+)
+from adapters.database.models import Base
+from adapters.database.repository import DatabaseECGRepository
+from adapters.tasks.tasks import SynchronousBackgroundTask
+from services.ecg_service import ECGService
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return SignalArchive(str(tmp_path))
+
+
+def test_append_and_read(archive):
+    first = archive.append(np.array([1, -1, 2]), day=date(2024, 1, 2))
+    second = archive.append(np.array([3, -3]), day=date(2024, 1, 2))
+
+    assert first == (20240102, 0)
+    assert second == (20240102, 12)
+    assert archive.read(20240102, 0, 3).tolist() == [1, -1, 2]
+    # The file grew after it was first mapped
+    assert archive.read(20240102, 12, 2).tolist() == [3, -3]
+
+
+def test_read_window(archive):
+    day, offset = archive.append(np.arange(10))
+
+    assert archive.read(day, offset, 10, start=2, end=5).tolist() == [2, 3, 4]
+    assert archive.read(day, offset, 10, start=8).tolist() == [8, 9]
+    assert archive.read(day, offset, 10, start=5, end=5).size == 0
+
+
+def test_archive_codec(archive):
+    codec = ArchiveSignalCodec(archive)
+
+    payload = codec.encode([1, -1, 2, -2])
+    signal = codec.decode(payload)
+
+    assert not is_legacy_payload(payload)
+    assert signal.tolist() == [1, -1, 2, -2]
+    # Signals are zero-copy views of the archive file
+    assert not signal.flags.writeable
+    assert not signal.flags.owndata
+    assert codec.decode_range(payload, 1, 3).tolist() == [-1, 2]
+
+
+def test_decode_archived_signal(archive, monkeypatch):
+    monkeypatch.setitem(CODECS, "archive", ArchiveSignalCodec(archive))
+    payload = ArchiveSignalCodec(archive).encode([5, 6, 7])
+
+    assert decode_signal(payload).tolist() == [5, 6, 7]
+    assert decode_signal(payload, start=1).tolist() == [6, 7]
+
+
+def test_ecg_service_with_archive(archive, monkeypatch):
+    codec = ArchiveSignalCodec(archive)
+    monkeypatch.setitem(CODECS, "archive", codec)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db_session = sessionmaker(bind=engine)()
+    ecg_service = ECGService(
+        DatabaseECGRepository(db_session, codec=codec),
+        SynchronousBackgroundTask(),
+        codec=codec,
+    )
+
+    ecg_id = ecg_service.process([{"name": "I", "signal": [1, -1, 1]}], user_id=1)
+    ecg = ecg_service.get(ecg_id)
+
+    assert ecg.leads[0].signal.tolist() == [1, -1, 1]
+    assert ecg.leads[0].zero_crossings == 2
+    db_session.close()
@@ -0,0 +1,229 @@
+import pytest
+from base64 import b64encode
+from fastapi import FastAPI, HTTPException
+from fastapi.security import HTTPBasicCredentials
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from adapters.api.async_auth_router import router as async_auth_router
+from adapters.api.async_ecg_router import router as async_ecg_router
+from adapters.api.async_user_router import router as async_user_router
+from adapters.database.async_orm import get_async_db
+from adapters.database.async_repository import (
+    AsyncDatabaseECGRepository,
+    AsyncDatabaseUserRepository,
+)
+from adapters.database.codecs import decode_signal
+from adapters.database.models import Base, UserRole
+from adapters.tasks.tasks import SynchronousBackgroundTask
+from services.async_auth_service import AsyncAuthService
+from services.async_ecg_service import AsyncECGService
+from tests.test_repository import make_ecg
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_async_ecg_repository(session_factory):
+    async with session_factory() as db_session:
+        repository = AsyncDatabaseECGRepository(db_session, chunk_size=2)
+        await repository.save_many(
+            [make_ecg("a", {"I": [1, -1], "II": [2, -2, 2]}), make_ecg("b", {})]
+        )
+
+        ecg = await repository.get("a")
+        assert [lead.name for lead in ecg.leads] == ["I", "II"]
+        assert decode_signal(ecg.leads[1].signal).tolist() == [2, -2, 2]
+        assert await repository.get("missing") is None
+
+        for lead in ecg.leads:
+            lead.zero_crossings = 1
+        await repository.save_insights(ecg, {"zero_crossings": (1, {"I": 1})})
+        assert await repository.get_insight_versions("a") == {"zero_crossings": 1}
+
+        await repository.save_insights(
+            ecg, {"zero_crossings": (2, {"I": 1})}, outdated=["zero_crossings"]
+        )
+        assert await repository.get_insight_versions("a") == {"zero_crossings": 2}
+
+        assert await repository.get_insights("a") == {
+            "user_id": 1,
+            "leads": [
+                {"name": "I", "zero_crossings": 1},
+                {"name": "II", "zero_crossings": 1},
+            ],
+        }
+        assert await repository.get_insights("b") == {"user_id": 1, "leads": []}
+
+
+@pytest.mark.anyio
+async def test_async_save_insights_updates_leads_once(session_factory):
+    async with session_factory() as db_session:
+        repository = AsyncDatabaseECGRepository(db_session)
+        await repository.save(make_ecg("a", {"I": [1, -1], "II": [2, 2]}))
+        ecg = await repository.get("a")
+        for lead in ecg.leads:
+            lead.zero_crossings = 1
+
+        statements = []
+        event.listen(
+            db_session.bind.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        await repository.save_insights(ecg, {"zero_crossings": (2, [1, 1])})
+        assert [statement.split()[0] for statement in statements] == [
+            "UPDATE",
+            "INSERT",
+        ]
+
+
+def test_async_ecg_repository_rejects_lazy_loading():
+    with pytest.raises(ValueError):
+        AsyncDatabaseECGRepository(None, leads_loading="lazy")
+
+
+@pytest.mark.anyio
+async def test_async_ecg_service(session_factory):
+    async with session_factory() as db_session:
+        repository = AsyncDatabaseECGRepository(db_session, leads_loading="joined")
+        background_task = SynchronousBackgroundTask()
+        ecg_service = AsyncECGService(repository, background_task)
+        # The synchronous backend only calls the task, await its coroutine
+        coroutines = []
+        ecg_service.insights_task = lambda ecg_id: coroutines.append(
+            ecg_service.compute_insights(ecg_id)
+        )
+
+        ecg_id = await ecg_service.process(
+            [{"name": "I", "signal": [1, -1, 1]}], user_id=1
+        )
+        await coroutines.pop()
+
+        ecg = await ecg_service.get(ecg_id)
+        assert ecg.leads[0].signal.tolist() == [1, -1, 1]
+        assert ecg.leads[0].zero_crossings == 2
+
+
+@pytest.mark.anyio
+async def test_async_auth_service(session_factory):
+    async with session_factory() as db_session:
+        auth_service = AsyncAuthService(AsyncDatabaseUserRepository(db_session))
+        await auth_service.create_user("user", "password")
+
+        user = await auth_service.authenticate_user(
+            HTTPBasicCredentials(username="user", password="password")
+        )
+        assert user.username == "user"
+
+        with pytest.raises(HTTPException) as e:
+            await auth_service.authenticate_user(
+                HTTPBasicCredentials(username="user", password="wrong")
+            )
+        assert e.value.status_code == 401
+
+
+@pytest.fixture
+def client(session_factory):
+    app = FastAPI()
+    app.include_router(async_ecg_router)
+    app.include_router(async_user_router)
+    app.include_router(async_auth_router)
+
+    async def get_test_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_test_db
+    return TestClient(app)
+
+
+def auth_headers(username, password):
+    credentials = b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {credentials}"}
+
+
+@pytest.mark.anyio
+async def test_async_routes(client, session_factory):
+    async with session_factory() as db_session:
+        await AsyncAuthService(AsyncDatabaseUserRepository(db_session)).create_user(
+            "admin", "adminpass", role=UserRole.ADMIN
+        )
+
+    response = client.post(
+        "/users",
+        json={"username": "user", "password": "password"},
+        headers=auth_headers("admin", "adminpass"),
+    )
+    assert response.status_code == 201
+
+    headers = auth_headers("user", "password")
+    response = client.post(
+        "/ecg", json={"leads": [{"name": "I", "signal": [1, -1, 1]}]}, headers=headers
+    )
+    assert response.status_code == 201
+    ecg_id = response.json()["ecg_id"]
+
+    # Insights are computed by the background task once the response is sent
+    response = client.get(f"/ecg/{ecg_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["leads"][0]["signal"] == [1, -1, 1]
+    assert response.json()["leads"][0]["zero_crossings"] == 2
+
+    response = client.get(f"/ecg/{ecg_id}/insights", headers=headers)
+    assert response.json() == {"leads": [{"name": "I", "zero_crossings": 2}]}
+
+    response = client.get(f"/ecg/{ecg_id}", headers=auth_headers("admin", "adminpass"))
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_async_auth_routes(client, session_factory):
+    async with session_factory() as db_session:
+        await AsyncAuthService(AsyncDatabaseUserRepository(db_session)).create_user(
+            "tokenuser", "password"
+        )
+
+    response = client.post(
+        "/auth/login", json={"username": "tokenuser", "password": "password"}
+    )
+    assert response.status_code == 200
+    tokens = response.json()
+
+    response = client.put(
+        "/users/me/password",
+        json={"current_password": "password", "new_password": "newpassword"},
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert response.status_code == 200
+
+    # Refresh tokens issued before the password change are refused
+    response = client.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+    tokens = client.post(
+        "/auth/login", json={"username": "tokenuser", "password": "newpassword"}
+    ).json()
+    response = client.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 200
@@ -3,7 +3,8 @@ from fastapi import HTTPException
 from fastapi.security import HTTPBasicCredentials
 from adapters.database.repository import UserRepository
 from services.auth_service import AuthService
-from adapters.database.models import UserRole
+from services.credential_cache import CredentialCache
+from adapters.database.models import User, UserRole
 
 
 class MockUserRepository(UserRepository):
@@ -33,6 +34,16 @@ def auth_service(user_repository):
     return AuthService(user_repository)
 
 
+@pytest.fixture
+def credential_cache():
+    return CredentialCache(ttl_seconds=60, max_entries=2)
+
+
+@pytest.fixture
+def cached_auth_service(user_repository, credential_cache):
+    return AuthService(user_repository, credential_cache)
+
+
 @pytest.fixture
 def test_user(auth_service):
     """Create a test user and store in repository"""
@@ -131,3 +142,96 @@ def test_verify_password(auth_service):
 
     assert auth_service.verify_password(password, hashed)
     assert not auth_service.verify_password("wrongpassword", hashed)
+
+
+def test_authenticate_user_uses_credential_cache(
+    cached_auth_service, credential_cache, test_user, monkeypatch
+):
+    credentials = HTTPBasicCredentials(
+        username=test_user.username, password="password123"
+    )
+    cached_auth_service.authenticate_user(credentials)
+
+    # Cached credentials are not verified again
+    monkeypatch.setattr(cached_auth_service, "verify_password", None)
+    user = cached_auth_service.authenticate_user(credentials)
+
+    assert user.username == test_user.username
+    assert user.role == test_user.role
+    assert user is not test_user
+    assert (credential_cache.hits, credential_cache.misses) == (1, 1)
+
+
+def test_credential_cache_does_not_cache_wrong_password(
+    cached_auth_service, credential_cache, test_user
+):
+    credentials = HTTPBasicCredentials(
+        username=test_user.username, password="wrongpassword"
+    )
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            cached_auth_service.authenticate_user(credentials)
+
+    assert credential_cache.size == 0
+
+
+def test_update_password_invalidates_credential_cache(
+    cached_auth_service, credential_cache, test_user
+):
+    old_credentials = HTTPBasicCredentials(
+        username=test_user.username, password="password123"
+    )
+    cached_auth_service.authenticate_user(old_credentials)
+
+    cached_auth_service.update_password(test_user.username, "newpassword")
+
+    with pytest.raises(HTTPException):
+        cached_auth_service.authenticate_user(old_credentials)
+    assert cached_auth_service.authenticate_user(
+        HTTPBasicCredentials(username=test_user.username, password="newpassword")
+    )
+    assert test_user.token_version == 1
+
+
+def test_update_role_invalidates_credential_cache(
+    cached_auth_service, credential_cache, test_user
+):
+    credentials = HTTPBasicCredentials(
+        username=test_user.username, password="password123"
+    )
+    cached_auth_service.authenticate_user(credentials)
+
+    cached_auth_service.update_role(test_user.username, UserRole.ADMIN)
+
+    assert credential_cache.size == 0
+    assert cached_auth_service.authenticate_user(credentials).role == UserRole.ADMIN
+
+
+def test_update_nonexistent_user(cached_auth_service):
+    with pytest.raises(HTTPException) as exc_info:
+        cached_auth_service.update_role("nonexistent", UserRole.ADMIN)
+
+    assert exc_info.value.status_code == 404
+
+
+def test_credential_cache_expires_entries(test_user, monkeypatch):
+    credential_cache = CredentialCache(ttl_seconds=10, max_entries=10)
+    credential_cache.add("password123", test_user)
+
+    monkeypatch.setattr("time.monotonic", lambda: float("inf"))
+
+    assert credential_cache.get(test_user.username, "password123") is None
+    assert credential_cache.size == 0
+
+
+def test_credential_cache_evicts_least_recently_used(credential_cache):
+    users = [User(id=i, username=f"user{i}", role=UserRole.USER) for i in range(3)]
+    credential_cache.add("password", users[0])
+    credential_cache.add("password", users[1])
+    credential_cache.get("user0", "password")
+    credential_cache.add("password", users[2])
+
+    assert credential_cache.get("user0", "password") is not None
+    assert credential_cache.get("user1", "password") is None
+    assert credential_cache.get("user2", "password") is not None
@@ -0,0 +1,121 @@
+import json
+import pytest
+from sqlalchemy.orm import sessionmaker
+from adapters.database.codecs import get_codec
+from adapters.database.engine import create_database_engine
+from adapters.database.models import Base, Insight, Lead
+from adapters.database.repository import (
+    DatabaseBackfillRepository,
+    DatabaseECGRepository,
+)
+from adapters.tasks.backfill import InsightBackfill, analyze_ecgs
+from tests.test_repository import make_ecg
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path}/backfill.db"
+
+
+@pytest.fixture
+def session_factory(database_url):
+    engine = create_database_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(session_factory):
+    session = session_factory()
+    DatabaseECGRepository(session).save_many(
+        [
+            make_ecg(f"ecg-{i}", {"I": [1, -1] * (i + 1), "II": [2, 2, -2]})
+            for i in range(5)
+        ]
+    )
+    yield session
+    session.close()
+
+
+def zero_crossings(db_session):
+    db_session.expire_all()
+    return [lead.zero_crossings for lead in db_session.query(Lead).order_by(Lead.id)]
+
+
+def test_scan_is_keyset_paginated(db_session):
+    repository = DatabaseBackfillRepository(db_session)
+
+    first = repository.scan(0, 3)
+    second = repository.scan(first[-1][0], 3)
+
+    assert [ecg_id for _, ecg_id in first + second] == [f"ecg-{i}" for i in range(5)]
+    assert repository.scan(second[-1][0], 3) == []
+
+
+def test_analyze_ecgs_skips_up_to_date_insights(db_session):
+    repository = DatabaseBackfillRepository(db_session)
+
+    lead_rows, results, samples = analyze_ecgs(repository, ["ecg-0", "ecg-1"])
+    assert results == {
+        "ecg-0": {"zero_crossings": (1, [1, 1])},
+        "ecg-1": {"zero_crossings": (1, [3, 1])},
+    }
+    assert len(lead_rows) == 4
+    assert samples == 2 + 3 + 4 + 3
+
+    repository.save_insights_many(lead_rows, results)
+    assert analyze_ecgs(repository, ["ecg-0", "ecg-1"]) == ([], {}, 0)
+    assert len(analyze_ecgs(repository, ["ecg-0"], force=True)[1]) == 1
+
+
+def test_backfill_resumes_from_checkpoint(db_session, session_factory, tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    backfill = InsightBackfill(
+        session_factory, chunk_size=2, processes=1, checkpoint_path=checkpoint_path
+    )
+
+    stats = backfill.run()
+    assert stats["scanned"] == stats["analyzed"] == 5
+    assert stats["samples"] > 0
+    assert None not in zero_crossings(db_session)
+    assert db_session.query(Insight).count() == 5
+    with open(checkpoint_path) as f:
+        assert json.load(f)["versions"] == {"zero_crossings": 1}
+
+    # Every ECG was scanned already
+    resumed = InsightBackfill(
+        session_factory, chunk_size=2, processes=1, checkpoint_path=checkpoint_path
+    )
+    assert resumed.run()["scanned"] == 0
+    stats = resumed.run(restart=True)
+    assert (stats["scanned"], stats["analyzed"]) == (5, 0)
+
+
+def test_backfill_with_worker_processes(db_session, session_factory, database_url):
+    backfill = InsightBackfill(
+        session_factory,
+        database_url=database_url,
+        chunk_size=2,
+        processes=2,
+        checkpoint_path=None,
+    )
+
+    assert backfill.run()["analyzed"] == 5
+    assert zero_crossings(db_session) == [1, 1, 3, 1, 5, 1, 7, 1, 9, 1]
+
+
+def test_analyze_ecgs_leads_with_the_same_name(db_session):
+    codec = get_codec("binary")
+    ecg = make_ecg("ecg-same-names", {})
+    ecg.leads = [
+        Lead(name="I", signal=codec.encode([1, -1, 1]), num_samples=3),
+        Lead(name="I", signal=codec.encode([1, 1, 1]), num_samples=3),
+    ]
+    DatabaseECGRepository(db_session).save(ecg)
+    repository = DatabaseBackfillRepository(db_session)
+
+    lead_rows, results, _ = analyze_ecgs(repository, ["ecg-same-names"])
+    assert results == {"ecg-same-names": {"zero_crossings": (1, [2, 0])}}
+    assert [row["zero_crossings"] for row in lead_rows] == [2, 0]
+    assert len({row["id"] for row in lead_rows}) == 2
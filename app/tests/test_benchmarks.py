@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from benchmarks.compare import compare
+from benchmarks.results import summarize
+from benchmarks.synthetic import lead_names, synthetic_ecg, synthetic_signals
+from services.insights import lead_zero_crossings
+
+
+def test_synthetic_signals():
+    signals = synthetic_signals(leads=3, sample_rate=250, duration=2)
+
+    assert signals.shape == (3, 500)
+    assert signals.dtype == np.int32
+    # Deterministic for a seed
+    assert np.array_equal(signals, synthetic_signals(3, 250, 2))
+    assert not np.array_equal(signals, synthetic_signals(3, 250, 2, seed=1))
+    # QRS complexes peak around a millivolt
+    assert 500 < np.abs(signals).max() < 3000
+    assert all(count > 0 for count in lead_zero_crossings(list(signals)))
+
+
+def test_synthetic_ecg():
+    leads = synthetic_ecg(leads=14, sample_rate=100, duration=1)
+
+    assert [lead["name"] for lead in leads] == lead_names(14)
+    assert lead_names(14)[-3:] == ["V6", "L12", "L13"]
+    assert all(len(lead["signal"]) == lead["num_samples"] == 100 for lead in leads)
+
+
+def test_summarize():
+    stats = summarize([i / 1000 for i in range(1, 101)])
+
+    assert stats["count"] == 100
+    assert stats["min_ms"] == pytest.approx(1)
+    assert stats["p50_ms"] == pytest.approx(50.5)
+    assert stats["p99_ms"] == pytest.approx(99.01)
+    assert stats["max_ms"] == pytest.approx(100)
+
+
+def test_compare():
+    base = {
+        "micro": {"codec": {"p50_ms": 10.0}, "removed": {"p50_ms": 1.0}},
+        "load": {"GET /ecg": {"p95_ms": 20.0, "requests_per_second": 100.0}},
+    }
+    head = {
+        "micro": {"codec": {"p50_ms": 12.0}, "added": {"p50_ms": 1.0}},
+        "load": {"GET /ecg": {"p95_ms": 19.0, "requests_per_second": 80.0}},
+    }
+
+    rows = compare(base, head, threshold=0.1)
+
+    assert [(row[0], row[1], row[-1]) for row in rows] == [
+        ("codec", "p50_ms", True),
+        ("GET /ecg", "p95_ms", False),
+        ("GET /ecg", "requests_per_second", True),
+    ]
+    assert rows[0][4] == pytest.approx(0.2)
@@ -0,0 +1,171 @@
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+from adapters.database.cache import CachedECGRepository, ECGCache
+from adapters.database.codecs import get_codec
+from adapters.database.models import ECG, Lead
+from adapters.tasks.tasks import SynchronousBackgroundTask
+from services.analyzers import analyzer_versions
+from services.ecg_service import ECGService
+
+
+def make_ecg(ecg_id, zero_crossings=1, samples=4):
+    codec = get_codec("binary")
+    return ECG(
+        id=1,
+        ecg_id=ecg_id,
+        date=datetime.now(),
+        user_id=1,
+        leads=[
+            Lead(
+                id=1,
+                name="I",
+                signal=codec.encode([1, -1] * (samples // 2)),
+                zero_crossings=zero_crossings,
+            )
+        ],
+    )
+
+
+@pytest.fixture
+def inner_repository():
+    ecgs = {"ecg": make_ecg("ecg"), "pending": make_ecg("pending", None)}
+    repository = Mock()
+    repository.get.side_effect = ecgs.get
+    repository.get_insight_versions.return_value = analyzer_versions()
+    return repository
+
+
+@pytest.fixture
+def cache():
+    return ECGCache(max_bytes=1024 * 1024)
+
+
+@pytest.fixture
+def cached_repository(inner_repository, cache):
+    return CachedECGRepository(inner_repository, cache)
+
+
+def test_cached_repository_hit(cached_repository, inner_repository, cache):
+    first = cached_repository.get("ecg")
+    second = cached_repository.get("ecg")
+
+    assert inner_repository.get.call_count == 1
+    assert first is not second
+    assert second.leads[0].signal.tolist() == [1, -1, 1, -1]
+    assert not second.leads[0].signal.flags.writeable
+    assert second.leads[0].zero_crossings == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+    assert cache.stats()["size_bytes"] > 0
+
+
+def test_cached_repository_skips_ecgs_without_insights(
+    cached_repository, inner_repository, cache
+):
+    cached_repository.get("pending")
+    cached_repository.get("pending")
+
+    assert inner_repository.get.call_count == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_cached_repository_skips_outdated_insights(
+    cached_repository, inner_repository, cache
+):
+    inner_repository.get_insight_versions.return_value = {"zero_crossings": 0}
+    cached_repository.get("ecg")
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_analyzer_version_bump_misses_cache(
+    cached_repository, inner_repository, monkeypatch
+):
+    cached_repository.get("ecg")
+    monkeypatch.setattr(
+        "adapters.database.cache.analyzer_versions", lambda: {"zero_crossings": 99}
+    )
+
+    cached_repository.get("ecg")
+    assert inner_repository.get.call_count == 2
+    inner_repository.get_insights.return_value = {"user_id": 1, "leads": []}
+    assert cached_repository.get_insights("ecg") == {"user_id": 1, "leads": []}
+
+
+def test_save_invalidates_cache(cached_repository, inner_repository):
+    ecg = cached_repository.get("ecg")
+
+    cached_repository.save(ecg)
+    cached_repository.save_many([ecg])
+    cached_repository.get("ecg")
+
+    assert inner_repository.get.call_count == 2
+
+
+def test_cached_repository_missing_ecg(cached_repository):
+    assert cached_repository.get("missing") is None
+
+
+def test_save_insights_invalidates_cache(cached_repository, inner_repository):
+    ecg = cached_repository.get("ecg")
+
+    cached_repository.save_insights(ecg)
+    cached_repository.get("ecg")
+
+    inner_repository.save_insights.assert_called_once_with(ecg, None, ())
+    assert inner_repository.get.call_count == 2
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = ECGCache(max_bytes=100)
+
+    cache.add("a", {}, 60)
+    cache.add("b", {}, 30)
+    cache.get("a")
+    cache.add("c", {}, 30)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.size_bytes == 90
+    assert cache.evictions == 1
+
+    cache.add("too large", {}, 101)
+    assert cache.get("too large") is None
+
+
+def test_cache_expires_entries(monkeypatch):
+    cache = ECGCache(max_bytes=100, ttl_seconds=10)
+    cache.add("a", {}, 10)
+
+    monkeypatch.setattr("time.monotonic", lambda: float("inf"))
+
+    assert cache.get("a") is None
+    assert cache.size_bytes == 0
+
+
+def test_ecg_service_with_cached_repository(cached_repository, inner_repository):
+    ecg_service = ECGService(cached_repository, SynchronousBackgroundTask())
+    # Insights are recomputed when the stored ones are outdated
+    inner_repository.get_insight_versions.return_value = {}
+
+    assert ecg_service.get("ecg").leads[0].signal.tolist() == [1, -1, 1, -1]
+    # The cached snapshot is not modified by the service
+    assert ecg_service.get("ecg").leads[0].signal.tolist() == [1, -1, 1, -1]
+
+    ecg_service.compute_insights("ecg")
+    saved = inner_repository.save_insights.call_args.args[0]
+    assert saved.leads[0].zero_crossings == 3
+
+
+def test_cached_repository_get_insights(cached_repository, inner_repository):
+    inner_repository.get_insights.return_value = {"user_id": 1, "leads": []}
+    assert cached_repository.get_insights("ecg") == {"user_id": 1, "leads": []}
+
+    cached_repository.get("ecg")
+    assert cached_repository.get_insights("ecg") == {
+        "user_id": 1,
+        "leads": [{"name": "I", "zero_crossings": 1}],
+    }
+    inner_repository.get_insights.assert_called_once_with("ecg")
@@ -0,0 +1,123 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from adapters.database.codecs import (
+    CODECS,
+    BinarySignalCodec,
+    TextSignalCodec,
+    decode_signal,
+    get_codec,
+    is_legacy_payload,
+)
+from adapters.database.models import Base, ECG
+from adapters.database.repository import DatabaseECGRepository
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize(
+    "codec",
+    [
+        TextSignalCodec(),
+        BinarySignalCodec(),
+        BinarySignalCodec(delta=True),
+        BinarySignalCodec(delta=True, compress=True),
+    ],
+)
+@pytest.mark.parametrize(
+    "signal",
+    [
+        [1, -1, 2, -2],
+        [0, 32767, -32768, 0],
+        [70000, -70000, 2**31 - 1, -(2**31)],
+        [],
+    ],
+)
+def test_codec_round_trip(codec, signal):
+    payload = codec.encode(signal)
+
+    assert codec.decode(payload).tolist() == signal
+    assert decode_signal(payload).tolist() == signal
+
+
+@pytest.mark.parametrize(
+    "codec_name", ["text", "binary", "binary-delta", "binary-delta-zlib"]
+)
+@pytest.mark.parametrize("start, end", [(0, None), (2, 5), (7, None), (4, 4), (9, 20)])
+def test_decode_range(codec_name, start, end):
+    signal = [5, -3, 70000, -70000, 0, 7, 1, 2, -2]
+    codec = CODECS.get(codec_name) or BinarySignalCodec(delta=True)
+    payload = codec.encode(signal)
+
+    assert codec.decode_range(payload, start, end).tolist() == signal[start:end]
+    assert decode_signal(payload, start, end).tolist() == signal[start:end]
+
+
+@pytest.mark.parametrize("codec_name", ["text", "binary", "binary-delta-zlib"])
+def test_encoder_round_trip(codec_name):
+    signal = [5, -3, 2**31 - 1, -(2**31), 0, 7, 1]
+    encoder = get_codec(codec_name).encoder()
+
+    for i in range(0, len(signal), 3):
+        encoder.write(signal[i : i + 3])
+
+    assert encoder.num_samples == len(signal)
+    assert decode_signal(encoder.finish()).tolist() == signal
+
+
+def test_encoder_rejects_out_of_range_values():
+    with pytest.raises(ValueError):
+        get_codec("binary").encoder().write([2**31])
+
+
+def test_binary_codec_uses_int16_when_possible():
+    small = BinarySignalCodec().encode([1, 2, 3])
+    large = BinarySignalCodec().encode([1, 2, 70000])
+
+    assert len(small) < len(large)
+
+
+def test_binary_codec_rejects_out_of_range_values():
+    with pytest.raises(ValueError):
+        BinarySignalCodec().encode([2**31])
+
+
+def test_binary_codec_empty_signal():
+    codec = get_codec("binary-delta-zlib")
+
+    assert codec.decode(codec.encode([])).tolist() == []
+
+
+def test_decode_legacy_text_payload():
+    assert is_legacy_payload("1,-2,3")
+    assert decode_signal("1,-2,3").tolist() == [1, -2, 3]
+
+
+def test_get_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("unknown")
+
+
+def test_repository_migrates_legacy_signals(db_session):
+    db_session.add(ECG(ecg_id="legacy", date=datetime.now(), user_id=1))
+    # Rows written before the codec layer hold comma-separated text
+    db_session.execute(
+        text(
+            "INSERT INTO leads (ecg_id, name, signal) VALUES ('legacy', 'I', '1,-1,2')"
+        )
+    )
+    db_session.commit()
+
+    repository = DatabaseECGRepository(db_session, codec=BinarySignalCodec())
+    migrated = repository.get("legacy")
+
+    assert not is_legacy_payload(migrated.leads[0].signal)
+    assert decode_signal(migrated.leads[0].signal).tolist() == [1, -1, 2]
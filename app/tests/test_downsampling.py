@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from adapters.database.codecs import get_codec
+from services.downsampling import bucket_size, min_max_downsample, window_signal
+
+
+@pytest.mark.parametrize(
+    "decimate, max_points, expected",
+    [(None, None, 1), (4, None, 4), (None, 10, 20), (50, 10, 50), (None, 1000, 1)],
+)
+def test_bucket_size(decimate, max_points, expected):
+    assert bucket_size(100, decimate, max_points) == expected
+
+
+def test_min_max_downsample_keeps_peaks():
+    signal = np.zeros(1000, dtype=np.int32)
+    signal[123] = 900
+    signal[700] = -400
+
+    downsampled = min_max_downsample(signal, 100)
+
+    assert downsampled.size == 20
+    assert downsampled.max() == 900
+    assert downsampled.min() == -400
+
+
+def test_min_max_downsample_keeps_order():
+    signal = np.array([3, 9, 1, 5, -2, 4, 8])
+
+    # The last bucket is shorter than the others
+    assert min_max_downsample(signal, 3).tolist() == [9, 1, 5, -2, 8, 8]
+    assert min_max_downsample(signal, 1) is signal
+
+
+def test_window_signal():
+    payload = get_codec("binary-delta-zlib").encode(list(range(100)))
+
+    assert window_signal(payload, 10, 14).tolist() == [10, 11, 12, 13]
+    assert window_signal(payload, 10, 30, max_points=4).tolist() == [10, 19, 20, 29]
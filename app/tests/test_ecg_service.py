@@ -1,6 +1,13 @@
 import pytest
+from datetime import datetime
+from types import SimpleNamespace
 from adapters.database.repository import ECGRepository
-from adapters.tasks.tasks import AbstractBackgroundTask
+from adapters.database.codecs import decode_signal
+from adapters.tasks.tasks import (
+    AbstractBackgroundTask,
+    BackgroundTaskQueueFull,
+    ProcessPoolBackgroundTask,
+)
 from services.ecg_service import ECGService
 
 
@@ -12,12 +19,68 @@ class MockECGRepository(ECGRepository):
 
     def __init__(self):
         self.ecgs = {}
+        self.insights = {}
 
     def save(self, ecg):
         self.ecgs[ecg.ecg_id] = ecg
 
-    def get(self, uuid):
-        return self.ecgs.get(uuid)
+    def save_many(self, ecgs):
+        for ecg in ecgs:
+            self.save(ecg)
+
+    def save_insights(self, ecg, results=None, outdated=()):
+        for name, result in (results or {}).items():
+            self.insights.setdefault(ecg.ecg_id, {})[name] = result
+
+    def get(self, uuid, leads=None):
+        ecg = self.ecgs.get(uuid)
+        if ecg is None or leads is None:
+            return ecg
+        return SimpleNamespace(
+            ecg_id=ecg.ecg_id,
+            user_id=ecg.user_id,
+            leads=[lead for lead in ecg.leads if lead.name in leads],
+        )
+
+    def get_insight_versions(self, uuid):
+        return {
+            name: version for name, (version, _) in self.insights.get(uuid, {}).items()
+        }
+
+    def list_for_user(
+        self,
+        user_id,
+        limit,
+        after=None,
+        date_from=None,
+        date_to=None,
+        with_insights=False,
+    ):
+        ecgs = sorted(
+            (
+                ecg
+                for ecg in self.ecgs.values()
+                if ecg.user_id == user_id
+                and (after is None or (ecg.date, ecg.id) < after)
+                and (date_from is None or ecg.date >= date_from)
+                and (date_to is None or ecg.date < date_to)
+            ),
+            key=lambda ecg: (ecg.date, ecg.id),
+            reverse=True,
+        )
+        return ecgs[:limit]
+
+    def get_insights(self, uuid):
+        ecg = self.ecgs.get(uuid)
+        if ecg is None:
+            return None
+        return {
+            "user_id": ecg.user_id,
+            "leads": [
+                {"name": lead.name, "zero_crossings": lead.zero_crossings}
+                for lead in ecg.leads
+            ],
+        }
 
 
 class MockBackgroundTask(AbstractBackgroundTask):
@@ -57,10 +120,10 @@ def test_ecg_service_process(ecg_service):
 
     assert ecg.ecg_id == ecg_id
     assert ecg.leads[0].name == "I"
-    assert ecg.leads[0].signal == "1,2,3"
+    assert decode_signal(ecg.leads[0].signal).tolist() == [1, 2, 3]
     assert ecg.leads[0].zero_crossings == 0
     assert ecg.leads[1].name == "II"
-    assert ecg.leads[1].signal == "-1,1,2"
+    assert decode_signal(ecg.leads[1].signal).tolist() == [-1, 1, 2]
     assert ecg.leads[1].zero_crossings == 1
     assert ecg.leads[0].num_samples is None
     assert ecg.leads[1].num_samples == 3
@@ -78,8 +141,144 @@ def test_ecg_service_get(ecg_service):
 
     assert ecg.ecg_id == ecg_id
     assert ecg.leads[0].name == "I"
-    assert ecg.leads[0].signal == [1, 2, 3]
+    assert ecg.leads[0].signal.tolist() == [1, 2, 3]
     assert ecg.leads[1].name == "II"
-    assert ecg.leads[1].signal == [-1, 1, 2]
+    assert ecg.leads[1].signal.tolist() == [-1, 1, 2]
     assert ecg.leads[0].num_samples is None
     assert ecg.leads[1].num_samples == 3
+
+
+def test_ecg_service_process_rejects_when_queue_is_full(mock_ecg_repository):
+    class FullBackgroundTask(MockBackgroundTask):
+        def can_accept(self, count=1):
+            return False
+
+    ecg_service = ECGService(mock_ecg_repository, FullBackgroundTask())
+
+    with pytest.raises(BackgroundTaskQueueFull):
+        ecg_service.process([{"name": "I", "signal": [1, 2, 3]}], user_id=1)
+
+    assert mock_ecg_repository.ecgs == {}
+
+
+def test_ecg_service_process_schedules_insights_task(
+    mock_ecg_repository, mock_background_task
+):
+    scheduled = []
+    ecg_service = ECGService(
+        mock_ecg_repository, mock_background_task, insights_task=scheduled.append
+    )
+
+    ecg_id = ecg_service.process([{"name": "I", "signal": [1, -1]}], user_id=1)
+
+    assert scheduled == [ecg_id]
+
+
+def test_ecg_service_process_many(ecg_service):
+    ecgs = [
+        [{"name": "I", "signal": [1, -1, 2]}],
+        [{"name": "I", "signal": [2**31]}],
+        [{"name": "I", "signal": [1, 2]}, {"name": "II", "signal": [-1, 1]}],
+    ]
+
+    results = ecg_service.process_many(ecgs, user_id=1)
+
+    assert [result["error"] is None for result in results] == [True, False, True]
+    assert results[1]["ecg_id"] is None
+
+    first = ecg_service.get(results[0]["ecg_id"])
+    assert first.leads[0].signal.tolist() == [1, -1, 2]
+    assert first.leads[0].zero_crossings == 2
+
+    last = ecg_service.repository.get(results[2]["ecg_id"])
+    assert [lead.zero_crossings for lead in last.leads] == [0, 1]
+
+
+def test_ecg_service_process_many_schedules_one_batch(mock_ecg_repository):
+    class RecordingBackgroundTask(MockBackgroundTask):
+        batches = []
+
+        def add_tasks(self, task_func, args_list):
+            self.batches.append(args_list)
+
+    background_task = RecordingBackgroundTask()
+    ecg_service = ECGService(mock_ecg_repository, background_task)
+
+    results = ecg_service.process_many(
+        [[{"name": "I", "signal": [1]}], [{"name": "I", "signal": [2]}]], user_id=1
+    )
+
+    assert background_task.batches == [[(result["ecg_id"],) for result in results]]
+
+
+def test_ecg_service_process_many_reserves_every_task(mock_ecg_repository):
+    pool = ProcessPoolBackgroundTask(max_workers=1, max_queue_size=2)
+    ecg_service = ECGService(mock_ecg_repository, pool)
+    ecgs = [[{"name": "I", "signal": [1]}]] * 3
+
+    with pytest.raises(BackgroundTaskQueueFull):
+        ecg_service.process_many(ecgs, user_id=1)
+    assert mock_ecg_repository.ecgs == {}
+
+    # The slots are released when the ECGs can not be saved
+    mock_ecg_repository.save_many = lambda ecgs: 1 / 0
+    with pytest.raises(ZeroDivisionError):
+        ecg_service.process_many(ecgs[:2], user_id=1)
+    assert pool.queue_depth == 0
+    pool.shutdown()
+
+
+def test_ecg_service_get_insights(ecg_service):
+    ecg_id = ecg_service.process(
+        [{"name": "I", "signal": [1, -1, 1]}, {"name": "II", "signal": [1, 2]}],
+        user_id=1,
+    )
+
+    assert ecg_service.get_insights(ecg_id) == {
+        "user_id": 1,
+        "leads": [
+            {"name": "I", "zero_crossings": 2},
+            {"name": "II", "zero_crossings": 0},
+        ],
+    }
+    assert ecg_service.get_insights("missing") is None
+
+
+def test_ecg_service_get_window(ecg_service):
+    ecg_id = ecg_service.process(
+        [
+            {"name": "I", "signal": list(range(10))},
+            {"name": "II", "signal": [5, -5, 6, -6, 7, -7, 8, -8]},
+        ],
+        user_id=1,
+    )
+
+    ecg = ecg_service.get(ecg_id, leads=["II"], start=1, end=7, max_points=4)
+
+    assert [lead.name for lead in ecg.leads] == ["II"]
+    # Buckets of 3 samples reduced to their min and max, in order
+    assert ecg.leads[0].signal.tolist() == [6, -6, -7, 8]
+
+
+def test_ecg_service_list_for_user(ecg_service, mock_ecg_repository):
+    for id in range(5):
+        mock_ecg_repository.save(
+            SimpleNamespace(
+                id=id, ecg_id=f"ecg-{id}", user_id=1, date=datetime(2024, 1, id + 1)
+            )
+        )
+
+    first = ecg_service.list_for_user(1, limit=2)
+    second = ecg_service.list_for_user(1, limit=2, cursor=first["next_cursor"])
+    last = ecg_service.list_for_user(1, limit=2, cursor=second["next_cursor"])
+
+    assert [ecg.ecg_id for ecg in first["ecgs"]] == ["ecg-4", "ecg-3"]
+    assert [ecg.ecg_id for ecg in second["ecgs"]] == ["ecg-2", "ecg-1"]
+    assert [ecg.ecg_id for ecg in last["ecgs"]] == ["ecg-0"]
+    assert last["next_cursor"] is None
+    assert ecg_service.list_for_user(2, limit=2) == {"ecgs": [], "next_cursor": None}
+
+
+def test_ecg_service_list_for_user_invalid_cursor(ecg_service):
+    with pytest.raises(ValueError):
+        ecg_service.list_for_user(1, limit=2, cursor="invalid")
@@ -0,0 +1,156 @@
+import gzip
+import json
+import sys
+import msgpack
+import numpy as np
+import pytest
+import zstandard
+from datetime import datetime
+from fastapi import HTTPException
+from adapters.api.encodings import (
+    ARROW,
+    ARROW_AVAILABLE,
+    JSON,
+    MSGPACK,
+    RAW,
+    RAW_HEADER_SIZE,
+    binary_response,
+    compress,
+    encode_arrow,
+    encode_json,
+    encode_msgpack,
+    encode_raw,
+    negotiate_encoding,
+    negotiate_media_type,
+)
+from adapters.api.schemas import ECGResponseSchema
+from adapters.database.models import ECG, Lead
+
+
+@pytest.fixture
+def ecg():
+    return ECG(
+        ecg_id="ecg",
+        date=datetime(2024, 1, 2, 3, 4, 5),
+        leads=[
+            Lead(name="I", signal=np.array([1, -1, 70000], dtype=np.int32)),
+            Lead(name="II", signal=np.array([], dtype=np.int32), zero_crossings=0),
+        ],
+    )
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, JSON),
+        ("*/*", JSON),
+        ("application/json", JSON),
+        (f"{RAW}, application/json;q=0.5", RAW),
+        (f"application/json;q=0.5, {MSGPACK}", MSGPACK),
+        ("application/x-msgpack", MSGPACK),
+        pytest.param(
+            f"text/html, {ARROW};q=0.9",
+            ARROW,
+            marks=pytest.mark.skipif(
+                not ARROW_AVAILABLE, reason="pyarrow is not installed"
+            ),
+        ),
+    ],
+)
+def test_negotiate_media_type(accept, expected):
+    assert negotiate_media_type(accept) == expected
+
+
+@pytest.mark.parametrize("accept", ["text/html", f"{RAW};q=0"])
+def test_negotiate_unsupported_media_type(accept):
+    with pytest.raises(HTTPException) as e:
+        negotiate_media_type(accept)
+    assert e.value.status_code == 406
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, None),
+        ("identity", None),
+        ("gzip, deflate, br, zstd", "zstd"),
+        ("gzip, zstd;q=0.5", "gzip"),
+        ("*", "zstd"),
+        ("*, zstd;q=0", "gzip"),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_compress():
+    body = b'{"signal": [' + b"1, " * 1000 + b"1]}"
+
+    assert gzip.decompress(compress(body, "gzip")) == body
+    assert (
+        zstandard.ZstdDecompressor().decompressobj().decompress(compress(body, "zstd"))
+        == body
+    )
+
+
+def test_encode_json(ecg):
+    content = ECGResponseSchema.model_validate_json(encode_json(ecg))
+
+    assert content.date == ecg.date
+    assert content.leads[0].signal == [1, -1, 70000]
+    assert content.leads[1].model_dump() == {
+        "name": "II",
+        "signal": [],
+        "num_samples": None,
+        "zero_crossings": 0,
+    }
+
+
+def test_encode_raw(ecg):
+    payload = encode_raw(ecg)
+
+    (header_size,) = RAW_HEADER_SIZE.unpack_from(payload)
+    header = json.loads(
+        payload[RAW_HEADER_SIZE.size : RAW_HEADER_SIZE.size + header_size]
+    )
+    samples = np.frombuffer(
+        payload, dtype=header["dtype"], offset=RAW_HEADER_SIZE.size + header_size
+    )
+
+    assert header["ecg_id"] == "ecg"
+    assert header["date"] == "2024-01-02T03:04:05"
+    assert [lead["length"] for lead in header["leads"]] == [3, 0]
+    assert header["leads"][1]["zero_crossings"] == 0
+    assert samples.tolist() == [1, -1, 70000]
+
+
+def test_encode_msgpack(ecg):
+    content = msgpack.unpackb(encode_msgpack(ecg))
+
+    signal = np.frombuffer(content["leads"][0]["signal"], dtype=content["dtype"])
+    assert signal.tolist() == [1, -1, 70000]
+    assert content["leads"][1]["signal"] == b""
+
+
+def test_encode_arrow(ecg):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.ipc.open_stream(encode_arrow(ecg)).read_all()
+
+    assert table.schema.metadata[b"ecg_id"] == b"ecg"
+    assert table.column("name").to_pylist() == ["I", "II"]
+    assert table.column("signal").to_pylist() == [[1, -1, 70000], []]
+    assert table.column("zero_crossings").to_pylist() == [None, 0]
+
+
+def test_arrow_not_available(ecg, monkeypatch):
+    monkeypatch.setattr("adapters.api.encodings.ARROW_AVAILABLE", False)
+    with pytest.raises(HTTPException) as e:
+        negotiate_media_type(ARROW)
+    assert e.value.status_code == 406
+
+    # Installed, but can not be imported
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(HTTPException) as e:
+        binary_response(ecg, ARROW)
+    assert e.value.status_code == 406
+    assert ARROW not in e.value.detail
@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import text
+from adapters.database.async_orm import get_async_database_url
+from adapters.database.engine import (
+    async_database_url,
+    create_async_database_engine,
+    create_database_engine,
+    engine_options,
+)
+from core.config import Settings
+
+
+def test_settings_from_environment(monkeypatch):
+    monkeypatch.setenv("DATABASE_POOL_SIZE", "20")
+    monkeypatch.setenv("DATABASE_ASYNC", "true")
+
+    settings = Settings()
+
+    assert settings.DATABASE_POOL_SIZE == 20
+    assert settings.DATABASE_ASYNC is True
+
+
+def test_sqlite_pragmas(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path}/pragmas.db")
+
+    with engine.connect() as connection:
+
+        def pragma(name):
+            return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1
+        assert pragma("busy_timeout") == 5000
+        assert pragma("cache_size") == -64 * 1024
+
+    assert engine.pool.size() == 5
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("sqlite:///./ecg.db", "sqlite+aiosqlite:///./ecg.db"),
+        ("postgresql://user:pass@db/ecg", "postgresql+asyncpg://user:pass@db/ecg"),
+        ("postgresql+psycopg2://db/ecg", "postgresql+asyncpg://db/ecg"),
+    ],
+)
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+
+def test_async_database_url_of_another_database(monkeypatch):
+    monkeypatch.setattr("core.config.config.DATABASE_URL", "sqlite:///./ecg.db")
+    monkeypatch.setattr("core.config.config.ASYNC_DATABASE_URL", None)
+    assert get_async_database_url() == "sqlite+aiosqlite:///./ecg.db"
+
+    monkeypatch.setattr(
+        "core.config.config.ASYNC_DATABASE_URL", "sqlite+aiosqlite:///./other.db"
+    )
+    with pytest.raises(RuntimeError):
+        get_async_database_url()
+
+
+def test_memory_sqlite_is_not_pooled():
+    options = engine_options("sqlite://")
+
+    assert "pool_size" not in options
+    with create_database_engine("sqlite://").connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_server_database_options():
+    options = engine_options("postgresql://user@localhost/ecg")
+
+    assert "connect_args" not in options
+    assert options["pool_size"] == 5
+    assert options["pool_recycle"] == 1800
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.mark.anyio
+async def test_async_sqlite_pragmas(tmp_path):
+    engine = create_async_database_engine(f"sqlite+aiosqlite:///{tmp_path}/async.db")
+
+    async with engine.connect() as connection:
+        result = await connection.execute(text("PRAGMA journal_mode"))
+        assert result.scalar() == "wal"
+
+    await engine.dispose()
@@ -0,0 +1,36 @@
+import numpy as np
+from services.insights import lead_zero_crossings, zero_crossings
+from benchmarks.insights import loop_zero_crossings
+
+
+def test_zero_crossings_2d():
+    signals = np.array([[1, -1, 2, -2], [1, 2, 3, 4]])
+
+    assert zero_crossings(signals).tolist() == [3, 0]
+
+
+def test_zeros_do_not_count_as_crossings():
+    assert zero_crossings(np.array([1, 0, -1, 0, 0, 1])).tolist() == [0]
+
+
+def test_large_values_do_not_overflow():
+    assert zero_crossings(np.array([2**31 - 1, -(2**31)])).tolist() == [1]
+
+
+def test_lead_zero_crossings_matches_loop():
+    rng = np.random.default_rng(0)
+    signals = list(rng.integers(-3, 3, size=(12, 500)))
+
+    assert lead_zero_crossings(signals) == loop_zero_crossings(
+        [signal.tolist() for signal in signals]
+    )
+
+
+def test_lead_zero_crossings_different_lengths():
+    signals = [np.array([1, -1, 1]), np.array([-1, 1]), np.array([], dtype=int)]
+
+    assert lead_zero_crossings(signals) == [2, 1, 0]
+
+
+def test_lead_zero_crossings_no_leads():
+    assert lead_zero_crossings([]) == []
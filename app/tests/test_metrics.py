@@ -0,0 +1,138 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from fastapi.testclient import TestClient
+from main import app
+from adapters.database.engine import create_database_engine, pool_stats
+from adapters.tasks.tasks import TASK_DURATION, SynchronousBackgroundTask
+from core.metrics import (
+    STAGE_DURATION,
+    Gauge,
+    Histogram,
+    Metric,
+    MetricsRegistry,
+    timed,
+)
+
+client = TestClient(app)
+
+
+def test_histogram_render():
+    registry = MetricsRegistry()
+    histogram = registry.register(
+        Histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1))
+    )
+
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route='/"b"')
+
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/\\"b\\"",le="0.1"} 0',
+        'latency_seconds_bucket{route="/\\"b\\"",le="1.0"} 0',
+        'latency_seconds_bucket{route="/\\"b\\"",le="+Inf"} 1',
+        'latency_seconds_sum{route="/\\"b\\""} 5.0',
+        'latency_seconds_count{route="/\\"b\\""} 1',
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 2',
+        'latency_seconds_sum{route="/a"} 0.55',
+        'latency_seconds_count{route="/a"} 2',
+    ]
+    # Metrics are registered once per name
+    assert registry.register(Histogram("latency_seconds", "Other")) is histogram
+
+
+def test_gauge_render():
+    registry = MetricsRegistry()
+    gauge = registry.register(Gauge("depth", "Depth", ["backend"]))
+    gauge.inc(backend="a")
+    gauge.inc(backend="a")
+    gauge.dec(backend="a")
+    registry.register(
+        Gauge("pool", "Pool", ["state"], collect=lambda: [({"state": "idle"}, 3)])
+    )
+
+    assert registry.render().splitlines()[2::3] == [
+        'depth{backend="a"} 1',
+        'pool{state="idle"} 3',
+    ]
+
+
+def test_timed_stage():
+    before = (STAGE_DURATION.get(stage="test") or {"count": 0})["count"]
+
+    timed("test")(lambda: None)()
+
+    assert STAGE_DURATION.get(stage="test")["count"] == before + 1
+
+
+def test_synchronous_task_duration():
+    before = (TASK_DURATION.get(backend="synchronous") or {"count": 0})["count"]
+
+    assert SynchronousBackgroundTask().add_task(lambda x: x * 2, 2) == 4
+
+    assert TASK_DURATION.get(backend="synchronous")["count"] == before + 1
+
+
+def test_metric_requires_samples():
+    with pytest.raises(TypeError):
+        Metric("metric", "Metric without samples")
+
+
+def test_failed_query_duration(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path}/queries.db")
+    with engine.connect() as connection:
+        before = STAGE_DURATION.get(stage="db")["count"]
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM missing"))
+        connection.execute(text("SELECT 1"))
+
+        # Only the statements that ran are observed, nothing is left behind
+        assert STAGE_DURATION.get(stage="db")["count"] == before + 1
+        assert "query_start_times" not in connection.info
+
+
+def test_pool_stats(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path}/pool.db")
+    with engine.connect():
+        assert pool_stats(engine)["checked_out"] == 1
+    assert pool_stats(engine)["checked_out"] == 0
+    assert pool_stats(create_database_engine("sqlite://")) == {}
+
+
+def test_metrics_endpoint():
+    auth = ("admin", "adminpass")
+    response = client.post(
+        "/ecg", json={"leads": [{"name": "I", "signal": [1, -1, 1]}]}, auth=auth
+    )
+    client.get(f"/ecg/{response.json()['ecg_id']}", auth=auth)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    body = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/ecg/{ecg_id}",'
+        'status="200"}' in body
+    )
+    for stage in ("auth", "db", "decode", "serialize", "insights"):
+        assert f'stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert 'background_task_duration_seconds_count{backend="fastapi"}' in body
+    assert 'background_queue_depth{backend="fastapi"} 0' in body
+    assert 'db_pool_connections{engine="sync",state="checked_out"}' in body
+    for cache, event in [("ecg", "hit"), ("ecg", "eviction"), ("credential", "miss")]:
+        assert f'cache_events{{cache="{cache}",event="{event}"}}' in body
+    assert 'cache_entries{cache="credential"}' in body
+
+
+@pytest.mark.parametrize("path", ["/unknown", "/ecg/missing"])
+def test_metrics_route_labels(path):
+    client.get(path)
+
+    body = client.get("/metrics").text
+    assert 'route="/unknown"' not in body
+    assert 'route="/ecg/missing"' not in body
@@ -0,0 +1,177 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from adapters.api.dependencies import get_token_service
+from adapters.database.models import User, UserRole
+from core.config import config
+from core.profiling import RequestProfile, current_profile, profiled, slow_calls
+
+client = TestClient(app)
+
+admin_auth = ("admin", "adminpass")
+
+
+@pytest.fixture
+def user_headers():
+    token = get_token_service().create_token(
+        User(id=1000, username="testuser", role=UserRole.USER), "access"
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(autouse=True)
+def profiling_enabled(monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_ENABLED", True)
+
+
+@pytest.fixture
+def slow_threshold(monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_SLOW_CALL_SECONDS", 0.01)
+    slow_calls.clear()
+    yield
+    slow_calls.clear()
+
+
+class Repository:
+    @profiled
+    def get(self, ecg_id: str, signal=None):
+        time.sleep(0.02)
+        return ecg_id
+
+    @profiled
+    async def get_async(self, ecg_id: str):
+        return ecg_id
+
+
+def test_slow_calls(slow_threshold):
+    repository = Repository()
+
+    assert repository.get("ecg", signal=list(range(10000))) == "ecg"
+
+    (call,) = slow_calls.entries()
+    assert call["name"] == "Repository.get"
+    assert call["duration_seconds"] >= 0.02
+    assert call["args"] == "('ecg',)"
+    # Arguments are truncated
+    assert call["kwargs"] == "{'signal': [0, 1, 2, 3, ...]}"
+    assert "test_slow_calls" in call["stack"][-1]
+
+
+def test_slow_calls_disabled(slow_threshold, monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_ENABLED", False)
+
+    Repository().get("ecg")
+
+    assert slow_calls.entries() == []
+
+
+@pytest.mark.anyio
+async def test_profiled_coroutine():
+    profile = RequestProfile("GET", "/ecg")
+    assert profile.authorize()
+    token = current_profile.set(profile)
+    try:
+        assert await Repository().get_async("ecg") == "ecg"
+    finally:
+        current_profile.reset(token)
+    report = profile.finish()
+
+    assert [call["name"] for call in report["calls"]] == ["Repository.get_async"]
+    assert "get_async" in report["stats"]
+
+
+def test_single_profiled_request():
+    profile = RequestProfile("GET", "/ecg")
+    assert profile.authorize()
+
+    other = RequestProfile("GET", "/ecg")
+    assert not other.authorize()
+    assert other.busy
+    assert other.finish() is None
+    assert profile.finish() is not None
+
+    # Unauthorized profiles do not take the lock, and are not reported
+    assert RequestProfile("GET", "/ecg").finish() is None
+    assert not RequestProfile._lock.locked()
+
+
+def test_profile_request_busy():
+    profile = RequestProfile("GET", "/ecg")
+    profile.authorize()
+    try:
+        response = client.get("/ecg", params={"profile": "1"}, auth=admin_auth)
+    finally:
+        profile.finish()
+
+    assert response.status_code == 200
+    assert response.headers["x-profile"] == "busy"
+    assert "x-profile-id" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "params,headers", [({"profile": "1"}, {}), ({}, {"X-Profile": "true"})]
+)
+def test_profile_request(params, headers):
+    response = client.post(
+        "/ecg",
+        json={"leads": [{"name": "I", "signal": [1, -1, 1]}]},
+        params=params,
+        headers=headers,
+        auth=admin_auth,
+    )
+
+    assert response.status_code == 201
+    profile_id = response.headers["x-profile-id"]
+
+    response = client.get("/debug/profiles", auth=admin_auth)
+    assert response.json()[0]["id"] == profile_id
+    assert response.json()[0]["path"] == "/ecg"
+
+    report = client.get(f"/debug/profiles/{profile_id}", auth=admin_auth).json()
+    names = [call["name"] for call in report["calls"]]
+    assert "ECGService.process" in names
+    assert "DatabaseECGRepository.save" in names
+    assert "cumulative" in report["stats"]
+
+
+def test_profile_request_not_admin(user_headers):
+    response = client.get("/ecg", params={"profile": "1"}, headers=user_headers)
+
+    assert response.status_code == 403
+    assert "x-profile-id" not in response.headers
+
+    # Rejected before waiting for the profiling lock
+    profile = RequestProfile("GET", "/ecg")
+    profile.authorize()
+    try:
+        response = client.get("/ecg", params={"profile": "1"}, headers=user_headers)
+    finally:
+        profile.finish()
+    assert response.status_code == 403
+    # The same request without the flag is allowed
+    assert client.get("/ecg", headers=user_headers).status_code == 200
+
+
+def test_profile_request_not_authenticated():
+    response = client.get("/metrics", headers={"X-Profile": "1"})
+
+    assert response.status_code == 401
+
+
+def test_debug_routes_admin_only(user_headers):
+    assert client.get("/debug/slow-calls", headers=user_headers).status_code == 403
+    assert client.get("/debug/profiles", headers=user_headers).status_code == 403
+    assert client.get("/debug/profiles/unknown", auth=admin_auth).status_code == 404
+
+
+def test_get_slow_calls(slow_threshold):
+    Repository().get("ecg")
+
+    response = client.get("/debug/slow-calls", auth=admin_auth)
+
+    assert response.status_code == 200
+    assert [call["name"] for call in response.json()] == ["Repository.get"]
+
+    assert client.delete("/debug/slow-calls", auth=admin_auth).status_code == 204
+    assert client.get("/debug/slow-calls", auth=admin_auth).json() == []
@@ -0,0 +1,222 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from adapters.database.codecs import decode_signal, get_codec
+from adapters.database.models import Base, ECG, Lead
+from adapters.database.repository import DatabaseECGRepository
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db_session(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    """Records the SQL statements run on the engine"""
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+def make_ecg(ecg_id, signals):
+    codec = get_codec("binary")
+    return ECG(
+        ecg_id=ecg_id,
+        date=datetime.now(),
+        user_id=1,
+        leads=[
+            Lead(name=name, signal=codec.encode(signal), num_samples=len(signal))
+            for name, signal in signals.items()
+        ],
+    )
+
+
+def test_save_many(db_session):
+    repository = DatabaseECGRepository(db_session, chunk_size=2)
+
+    repository.save_many(
+        [
+            make_ecg("a", {"I": [1, -1], "II": [2, -2], "III": [3]}),
+            make_ecg("b", {"I": [4]}),
+        ]
+    )
+
+    ecg = repository.get("a")
+    assert [lead.name for lead in ecg.leads] == ["I", "II", "III"]
+    assert decode_signal(ecg.leads[1].signal).tolist() == [2, -2]
+    assert ecg.leads[2].num_samples == 1
+    assert len(repository.get("b").leads) == 1
+
+
+def test_save_many_is_atomic(db_session):
+    repository = DatabaseECGRepository(db_session)
+    repository.save_many([make_ecg("a", {"I": [1]})])
+
+    # "a" already exists, so nothing of the batch is stored
+    with pytest.raises(Exception):
+        repository.save_many([make_ecg("b", {"I": [1]}), make_ecg("a", {"I": [1]})])
+
+    assert repository.get("b") is None
+    assert db_session.query(Lead).count() == 1
+
+
+def test_get_insights_does_not_load_signals(db_session, statements):
+    repository = DatabaseECGRepository(db_session)
+    ecg = make_ecg("a", {"I": [1, -1], "II": [2, -2]})
+    ecg.leads[0].zero_crossings = 1
+    repository.save(ecg)
+    statements.clear()
+
+    insights = repository.get_insights("a")
+
+    assert insights == {
+        "user_id": 1,
+        "leads": [
+            {"name": "I", "zero_crossings": 1},
+            {"name": "II", "zero_crossings": None},
+        ],
+    }
+    assert len(statements) == 1
+    assert "signal" not in statements[0]
+
+
+def test_get_insights_missing_ecg(db_session):
+    assert DatabaseECGRepository(db_session).get_insights("missing") is None
+
+
+def test_get_insights_ecg_without_leads(db_session):
+    repository = DatabaseECGRepository(db_session)
+    repository.save(make_ecg("a", {}))
+
+    assert repository.get_insights("a") == {"user_id": 1, "leads": []}
+
+
+def test_get_loads_signals(db_session, statements):
+    repository = DatabaseECGRepository(db_session)
+    repository.save(make_ecg("a", {"I": [1, -1], "II": [2, -2]}))
+    db_session.expunge_all()
+    statements.clear()
+
+    ecg = repository.get("a")
+
+    assert [decode_signal(lead.signal).tolist() for lead in ecg.leads] == [
+        [1, -1],
+        [2, -2],
+    ]
+    # One query for the ECG and one for its leads with their signals
+    assert len(statements) == 2
+
+
+@pytest.mark.parametrize(
+    "leads_loading, queries", [("selectin", 2), ("joined", 1), ("lazy", 2)]
+)
+def test_get_leads_loading(db_session, statements, leads_loading, queries):
+    repository = DatabaseECGRepository(db_session, leads_loading=leads_loading)
+    repository.save(make_ecg("a", {"I": [1, -1], "II": [2, -2]}))
+    statements.clear()
+
+    ecg = repository.get("a")
+    signals = [decode_signal(lead.signal).tolist() for lead in ecg.leads]
+
+    assert signals == [[1, -1], [2, -2]]
+    assert len(statements) == queries
+
+
+@pytest.mark.parametrize("leads_loading", ["selectin", "joined", "lazy"])
+def test_get_subset_of_leads(db_session, leads_loading):
+    repository = DatabaseECGRepository(db_session, leads_loading=leads_loading)
+    repository.save(make_ecg("a", {"I": [1], "II": [2], "III": [3]}))
+
+    ecg = repository.get("a", leads=["III", "I"])
+    assert [lead.name for lead in ecg.leads] == ["I", "III"]
+
+    # The subset loaded previously in the session is replaced
+    ecg = repository.get("a")
+    assert [lead.name for lead in ecg.leads] == ["I", "II", "III"]
+
+
+def test_unknown_leads_loading(db_session):
+    with pytest.raises(ValueError):
+        DatabaseECGRepository(db_session, leads_loading="unknown")
+
+
+def test_save_insights_replaces_outdated_results(db_session):
+    repository = DatabaseECGRepository(db_session)
+    repository.save(make_ecg("a", {"I": [1, -1]}))
+    ecg = repository.get("a")
+
+    repository.save_insights(ecg, {"zero_crossings": (1, {"I": 1}), "peak": (1, 1)})
+    assert repository.get_insight_versions("a") == {"zero_crossings": 1, "peak": 1}
+
+    repository.save_insights(ecg, {"peak": (2, None)}, outdated=["peak"])
+    assert repository.get_insight_versions("a") == {"zero_crossings": 1, "peak": 2}
+    assert repository.get_insight_versions("missing") == {}
+
+
+def test_save_insights_updates_leads_once(db_session, statements):
+    repository = DatabaseECGRepository(db_session)
+    repository.save(make_ecg("a", {"I": [1, -1], "II": [2, 2]}))
+    ecg = repository.get("a")
+    for lead in ecg.leads:
+        lead.zero_crossings = 1
+    statements.clear()
+
+    repository.save_insights(ecg, {"zero_crossings": (2, [1, 1])})
+    # The bulk UPDATE of the leads is not flushed again on commit
+    assert [statement.split()[0] for statement in statements] == ["UPDATE", "INSERT"]
+
+
+def test_list_for_user(db_session, statements):
+    repository = DatabaseECGRepository(db_session)
+    ecgs = [make_ecg(f"ecg-{i}", {"I": [1, -1]}) for i in range(5)]
+    for i, ecg in enumerate(ecgs):
+        ecg.date = datetime(2024, 1, 1 + i // 2)
+    ecgs.append(make_ecg("other", {}))
+    ecgs[-1].user_id = 2
+    repository.save_many(ecgs)
+
+    first = repository.list_for_user(1, 3)
+    assert [ecg.ecg_id for ecg in first] == ["ecg-4", "ecg-3", "ecg-2"]
+    # ECGs of the same date are paginated by primary key
+    last = first[-1]
+    second = repository.list_for_user(1, 3, after=(last.date, last.id))
+    assert [ecg.ecg_id for ecg in second] == ["ecg-1", "ecg-0"]
+
+    filtered = repository.list_for_user(
+        1, 10, date_from=datetime(2024, 1, 2), date_to=datetime(2024, 1, 3)
+    )
+    assert [ecg.ecg_id for ecg in filtered] == ["ecg-3", "ecg-2"]
+
+    statements.clear()
+    listed = repository.list_for_user(1, 1, with_insights=True)
+    assert [lead.name for lead in listed[0].leads] == ["I"]
+    assert len(statements) == 2
+    assert "signal" not in statements[1]
+
+
+def test_list_for_user_uses_index(db_session):
+    query = str(
+        db_session.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT id FROM ecgs WHERE user_id = 1 "
+                "AND (date, id) < ('2024-01-01', 5) ORDER BY date DESC, id DESC"
+            )
+        ).all()
+    )
+    assert "ix_ecgs_user_id_date_id" in query
+    assert "TEMP B-TREE" not in query
@@ -0,0 +1,95 @@
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from adapters.api.dependencies import PLACEHOLDER_SECRET_KEY, get_token_service
+from adapters.database.engine import create_database_engine
+from adapters.database.models import SchemaVersion
+from adapters.database.schema import SCHEMA_VERSION, ensure_schema, schema_version
+from core.config import config
+from main import create_app
+
+
+def test_ensure_schema(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path}/schema.db")
+
+    assert ensure_schema(engine)
+    # Only the marker is read once the schema is up to date
+    assert not ensure_schema(engine)
+
+    with engine.connect() as connection:
+        assert schema_version(connection) == SCHEMA_VERSION
+        assert connection.scalar(text("SELECT count(*) FROM schema_version")) == 2
+        assert {"users", "ecgs", "leads", "insights", "insight_jobs"} <= set(
+            inspect(connection).get_table_names()
+        )
+
+
+def test_ensure_schema_concurrently(tmp_path):
+    url = f"sqlite:///{tmp_path}/schema.db"
+
+    with ThreadPoolExecutor(4) as executor:
+        migrated = list(
+            executor.map(lambda _: ensure_schema(create_database_engine(url)), range(4))
+        )
+
+    assert migrated.count(True) == 1
+
+
+def test_ensure_schema_legacy_database(tmp_path):
+    """
+    Databases created before the marker get the missing tables and indexes
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE ecgs (id INTEGER PRIMARY KEY, ecg_id VARCHAR UNIQUE "
+                "NOT NULL, date DATETIME, user_id INTEGER NOT NULL)"
+            )
+        )
+        connection.execute(
+            text("INSERT INTO ecgs VALUES (1, 'ecg', '2024-01-01 00:00:00', 1)")
+        )
+        connection.execute(
+            text(
+                "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR "
+                "UNIQUE NOT NULL, hashed_password VARCHAR NOT NULL, role VARCHAR)"
+            )
+        )
+        connection.execute(text("INSERT INTO users VALUES (1, 'user', 'hash', 'USER')"))
+
+    assert ensure_schema(engine)
+
+    with engine.connect() as connection:
+        indexes = {index["name"] for index in inspect(connection).get_indexes("ecgs")}
+        assert "ix_ecgs_user_id_date_id" in indexes
+        assert inspect(connection).has_table("insights")
+        assert connection.scalar(text("SELECT ecg_id FROM ecgs")) == "ecg"
+        assert connection.scalar(text("SELECT token_version FROM users")) == 0
+
+
+def test_create_app_lifespan(tmp_path, monkeypatch):
+    engine = create_database_engine(f"sqlite:///{tmp_path}/app.db")
+    monkeypatch.setattr("main.get_engine", lru_cache(lambda: engine))
+
+    app = create_app()
+    with engine.connect() as connection:
+        assert not inspect(connection).has_table(SchemaVersion.__tablename__)
+
+    with TestClient(app):
+        with engine.connect() as connection:
+            assert schema_version(connection) == SCHEMA_VERSION
+
+
+@pytest.mark.parametrize("secret_key", [None, PLACEHOLDER_SECRET_KEY])
+def test_create_app_requires_secret_key(secret_key, tmp_path, monkeypatch):
+    engine = create_database_engine(f"sqlite:///{tmp_path}/app.db")
+    monkeypatch.setattr("main.get_engine", lru_cache(lambda: engine))
+    monkeypatch.setattr(config, "AUTH_SECRET_KEY", secret_key)
+    get_token_service.cache_clear()
+
+    with pytest.raises(RuntimeError, match="AUTH_SECRET_KEY"):
+        with TestClient(create_app()):
+            pass
@@ -0,0 +1,86 @@
+import time
+import pytest
+from adapters.tasks.tasks import (
+    BackgroundTaskQueueFull,
+    ProcessPoolBackgroundTask,
+    SynchronousBackgroundTask,
+)
+from adapters.tasks.jobs import init_worker
+from core.config import config
+
+
+def square(value):
+    return value * value
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+def database_url():
+    return config.DATABASE_URL
+
+
+@pytest.fixture
+def process_pool():
+    pool = ProcessPoolBackgroundTask(max_workers=1, max_queue_size=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_process_pool_runs_task(process_pool):
+    future = process_pool.add_task(square, 4)
+
+    assert future.result(timeout=10) == 16
+
+
+def test_process_pool_applies_parent_settings(tmp_path):
+    # Spawned workers read the environment again, not the changed settings
+    url = f"sqlite:///{tmp_path}/worker.db"
+    pool = ProcessPoolBackgroundTask(
+        max_workers=1,
+        max_queue_size=1,
+        initializer=init_worker,
+        initargs=({"DATABASE_URL": url},),
+    )
+
+    assert pool.add_task(database_url).result(timeout=10) == url
+    pool.shutdown()
+
+
+def test_process_pool_rejects_tasks_when_full(process_pool):
+    future = process_pool.add_task(sleep, 0.5)
+
+    assert not process_pool.can_accept()
+    with pytest.raises(BackgroundTaskQueueFull):
+        process_pool.add_task(square, 2)
+
+    future.result(timeout=10)
+    assert process_pool.queue_depth == 0
+    assert process_pool.can_accept()
+
+
+def test_process_pool_reserves_slots(process_pool):
+    with process_pool.reserve() as reserved:
+        # The slot is taken before the task is added
+        with pytest.raises(BackgroundTaskQueueFull):
+            process_pool.add_task(square, 2)
+        future = reserved.add_task(square, 3)
+
+    assert future.result(timeout=10) == 9
+    with pytest.raises(BackgroundTaskQueueFull):
+        with process_pool.reserve(2):
+            pass
+
+
+def test_process_pool_releases_unused_reservation(process_pool):
+    with pytest.raises(RuntimeError):
+        with process_pool.reserve():
+            raise RuntimeError("Not saved")
+
+    assert process_pool.queue_depth == 0
+    assert process_pool.can_accept()
+
+
+def test_synchronous_background_task():
+    assert SynchronousBackgroundTask().add_task(square, 3) == 9
@@ -0,0 +1,80 @@
+import pytest
+from fastapi import HTTPException
+from adapters.database.models import User, UserRole
+from services.token_service import ACCESS_TOKEN, REFRESH_TOKEN, TokenService
+
+
+@pytest.fixture
+def token_service():
+    return TokenService(
+        secret_key="secret", access_ttl_seconds=60, refresh_ttl_seconds=3600
+    )
+
+
+@pytest.fixture
+def user():
+    return User(id=1, username="testuser", role=UserRole.ADMIN)
+
+
+def test_authenticate_token(token_service, user):
+    token = token_service.create_token(user, ACCESS_TOKEN)
+
+    authenticated_user = token_service.authenticate_token(token)
+
+    assert authenticated_user.id == user.id
+    assert authenticated_user.username == user.username
+    assert authenticated_user.role == UserRole.ADMIN
+
+
+def test_create_token_pair(token_service, user):
+    tokens = token_service.create_token_pair(user)
+
+    assert tokens["token_type"] == "bearer"
+    assert tokens["expires_in"] == 60
+    claims = token_service.verify_token(tokens["refresh_token"], REFRESH_TOKEN)
+    assert claims["sub"] == user.username
+
+
+def test_refresh_token_is_not_an_access_token(token_service, user):
+    token = token_service.create_token(user, REFRESH_TOKEN)
+
+    with pytest.raises(HTTPException) as exc_info:
+        token_service.authenticate_token(token)
+
+    assert exc_info.value.status_code == 401
+
+
+def test_expired_token(token_service, user, monkeypatch):
+    token = token_service.create_token(user, ACCESS_TOKEN)
+
+    monkeypatch.setattr("time.time", lambda: float("inf"))
+
+    with pytest.raises(HTTPException):
+        token_service.verify_token(token)
+
+
+@pytest.mark.parametrize("token", ["", "a.b", "a.b.c", "not a token"])
+def test_malformed_token(token_service, token):
+    with pytest.raises(HTTPException):
+        token_service.verify_token(token)
+
+
+def test_token_signed_with_other_key(token_service, user):
+    other_service = TokenService(
+        secret_key="other", access_ttl_seconds=60, refresh_ttl_seconds=3600
+    )
+    token = other_service.create_token(user, ACCESS_TOKEN)
+
+    with pytest.raises(HTTPException):
+        token_service.verify_token(token)
+
+
+def test_tampered_token(token_service, user):
+    header, payload, signature = token_service.create_token(user, ACCESS_TOKEN).split(
+        "."
+    )
+    other_user = User(id=2, username="other", role=UserRole.ADMIN)
+    other_payload = token_service.create_token(other_user, ACCESS_TOKEN).split(".")[1]
+
+    with pytest.raises(HTTPException):
+        token_service.verify_token(f"{header}.{other_payload}.{signature}")
@@ -0,0 +1,137 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from adapters.database.codecs import get_codec
+from adapters.database.models import Base, ECG, InsightJob, JobStatus, Lead
+from adapters.database.repository import DatabaseJobRepository
+from adapters.tasks.tasks import QueueBackgroundTask
+from adapters.tasks.worker import InsightWorker
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db_session(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def worker(session_factory):
+    return InsightWorker(session_factory, batch_size=10, retry_backoff_seconds=0)
+
+
+def add_ecg(db_session, ecg_id, signal=(1, -1, 2)):
+    codec = get_codec("binary")
+    db_session.add(
+        ECG(
+            ecg_id=ecg_id,
+            date=datetime.now(),
+            user_id=1,
+            leads=[Lead(name="I", signal=codec.encode(signal))],
+        )
+    )
+    db_session.commit()
+
+
+def get_job(db_session, ecg_id):
+    db_session.expire_all()
+    return db_session.query(InsightJob).filter(InsightJob.ecg_id == ecg_id).one()
+
+
+def test_queue_background_task_enqueues_job(db_session):
+    add_ecg(db_session, "ecg")
+
+    QueueBackgroundTask(DatabaseJobRepository(db_session)).add_task(None, "ecg")
+
+    assert get_job(db_session, "ecg").status == JobStatus.PENDING
+
+
+def test_worker_computes_insights(db_session, worker):
+    add_ecg(db_session, "ecg")
+    DatabaseJobRepository(db_session).enqueue(["ecg"])
+
+    assert worker.run_batch() == 1
+    assert worker.run_batch() == 0
+
+    job = get_job(db_session, "ecg")
+    assert job.status == JobStatus.DONE
+    assert job.attempts == 1
+    assert db_session.query(Lead).one().zero_crossings == 2
+
+
+def test_worker_retries_and_gives_up(db_session, worker):
+    # The ECG does not exist, so the job fails on every attempt
+    DatabaseJobRepository(db_session).enqueue(["missing"])
+
+    for attempt in range(1, worker.max_attempts):
+        worker.run_batch()
+        job = get_job(db_session, "missing")
+        assert job.status == JobStatus.PENDING
+        assert job.attempts == attempt
+        assert job.last_error
+
+    worker.run_batch()
+    assert get_job(db_session, "missing").status == JobStatus.FAILED
+    assert worker.run_batch() == 0
+
+
+def test_claim_skips_jobs_in_backoff_and_leased(db_session):
+    repository = DatabaseJobRepository(db_session)
+    repository.enqueue(["a", "b"])
+
+    job_a, job_b = db_session.query(InsightJob).order_by(InsightJob.id).all()
+    job_a.run_after = datetime.now() + timedelta(minutes=1)
+    db_session.commit()
+
+    assert [job.ecg_id for job in repository.claim(10, lease_seconds=60)] == ["b"]
+    # "b" is leased and "a" is waiting for its retry
+    assert repository.claim(10, lease_seconds=60) == []
+
+
+def test_claim_reclaims_expired_leases(db_session):
+    repository = DatabaseJobRepository(db_session)
+    repository.enqueue(["ecg"])
+
+    repository.claim(10, lease_seconds=-1)
+    jobs = repository.claim(10, lease_seconds=60)
+
+    assert [job.ecg_id for job in jobs] == ["ecg"]
+    assert jobs[0].attempts == 2
+
+
+def test_recover_enqueues_ecgs_without_insights(db_session, worker):
+    add_ecg(db_session, "lost")
+    add_ecg(db_session, "queued")
+    DatabaseJobRepository(db_session).enqueue(["queued"])
+
+    assert worker.recover() == 1
+    assert get_job(db_session, "lost").status == JobStatus.PENDING
+    assert worker.recover() == 0
+
+    worker.run(once=True)
+    assert db_session.query(Lead).filter(Lead.zero_crossings.is_(None)).count() == 0
+
+
+def test_recover_enqueues_ecgs_with_outdated_insights(db_session, worker):
+    add_ecg(db_session, "ecg")
+    worker.recover()
+    worker.run(once=True)
+    assert worker.recover() == 0
+
+    repository = DatabaseJobRepository(db_session)
+    assert repository.enqueue_missing_insights({"zero_crossings": 2}) == 1
+    assert repository.enqueue_missing_insights({"zero_crossings": 2}) == 0
+    assert repository.enqueue_missing_insights({}) == 0
@@ -0,0 +1,24 @@
+import argparse
+import logging
+from adapters.database.orm import get_engine, get_sessionmaker
+from adapters.database.schema import ensure_schema
+from adapters.tasks.worker import InsightWorker
+from core.config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the insight job worker")
+    parser.add_argument("--batch-size", type=int, default=config.JOB_BATCH_SIZE)
+    parser.add_argument(
+        "--once", action="store_true", help="Stop when the queue is empty"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ensure_schema(get_engine())
+
+    InsightWorker(get_sessionmaker(), batch_size=args.batch_size).run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()